@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Per call cost of the generated scalar controller against controllerSS
+# of a lab in the ROS callback path, where getForces gets
+# [phi, theta, psi]. Run from this directory as
+#   python bench_codegen.py [lab]
+# with lab11 (dirty derivatives, the default) or lab13 (observer).
+lab = sys.argv[1] if len(sys.argv) > 1 else 'lab11'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), lab))
+import param as P
+from signal_generator import Signals
+from controllerSS import controllerSS
+from dynamics import WhirlybirdDynamics
+from codegen import ssController
+
+t_end = 40.0       # Closed loop run length, s
+n_timing = 20000   # Calls timed for each controller
+
+start = time.time()
+GeneratedSSController = ssController(P)
+print('%s ssController: %.1f ms' % (lab, 1000*(time.time() - start)))
+
+# Accuracy: both controllers see the same measurements, the
+# generated controller closes the loop.
+sig_gen = Signals()
+ref = controllerSS()
+gen = GeneratedSSController()
+dynam = WhirlybirdDynamics()
+err = 0.0
+for i in range(int(round(t_end/P.Ts))):
+    ref_input = sig_gen.getRefInputs(i*P.Ts)
+    states = dynam.Outputs()[0:3]
+    u = gen.getForces(ref_input,states)
+    err = max(err, np.abs(np.subtract(u, ref.getForces(ref_input,states))).max())
+    dynam.propagateDynamics([x*P.km for x in u])
+print('max |generated - controllerSS| PWM over %g s: %.2e' % (t_end, err))
+
+for name, cls in (('controllerSS', controllerSS), ('generated', GeneratedSSController)):
+    ctrl = cls()
+    start = time.time()
+    for i in range(n_timing):
+        ctrl.getForces(ref_input,states)
+    print('%-12s %.2f us per call' % (name, 1e6*(time.time() - start)/n_timing))
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Closed loop agreement and per vehicle cost of PDControllerBank against
+# the PD controllers of lab7 or lab8, on the lab's own references. Run
+# from this directory as
+#   python bench_controller_bank.py [lab]
+# with lab8 (the default) or lab7.
+lab = sys.argv[1] if len(sys.argv) > 1 else 'lab8'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), lab))
+import param as P
+from signal_generator import Signals
+from controllerPD import controllerPD
+from controller_bank import PDControllerBank
+from dynamics import WhirlybirdDynamics
+
+t_end = 40.0         # Closed loop run length, s
+num_vehicles = 200   # Controllers in the timed run
+n_timing = 200       # Calls timed
+
+
+def convertForces(u):
+    # PWM of the force and torque of the lab controller, as in main.py
+    ul = 1.0/(P.km*2.0)*(u[0] + u[1]/P.d)
+    ur = 1.0/(P.km*2.0)*(u[0] - u[1]/P.d)
+    return [min(max(ul, 0.0), 1.0), min(max(ur, 0.0), 1.0)]
+
+
+# Accuracy: both see the same states, the lab controller closes the loop
+sig_gen = Signals()
+ref = controllerPD()
+bank = PDControllerBank(1, pwm_max=1.0, loops=lab)
+dynam = WhirlybirdDynamics()
+err = 0.0
+for i in range(int(round(t_end/P.Ts))):
+    ref_input = sig_gen.getRefInputs(i*P.Ts)
+    states = dynam.Outputs()
+    u = convertForces(ref.getForces(ref_input, states))
+    err = max(err, np.abs(bank.getForces(ref_input, np.array([states])) - u).max())
+    dynam.propagateDynamics([x*P.km for x in u])
+print('%s: max |PDControllerBank - controllerPD| PWM over %g s: %.2e' % (lab, t_end, err))
+
+states = np.tile(dynam.Outputs(), (num_vehicles, 1))
+ctrls = [controllerPD() for i in range(num_vehicles)]
+rows = states.tolist()
+start = time.time()
+for i in range(n_timing):
+    for ctrl, row in zip(ctrls, rows):
+        convertForces(ctrl.getForces(ref_input, row))
+t_loop = time.time() - start
+bank = PDControllerBank(num_vehicles, pwm_max=1.0, loops=lab)
+start = time.time()
+for i in range(n_timing):
+    bank.getForces(ref_input, states)
+t_bank = time.time() - start
+print('%d vehicles: controllerPD %.2f us, bank %.2f us per vehicle and call'
+      % (num_vehicles, 1e6*t_loop/(n_timing*num_vehicles),
+         1e6*t_bank/(n_timing*num_vehicles)))
@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+import numpy as np
+
+# Tracking of large pitch steps with the fixed gains of param.py, designed
+# at theta0, against gains, trim force and operating point scheduled on
+# the reference pitch, and for lab13 the observers too. Run from this
+# directory as
+#   python bench_gain_schedule.py [lab]
+# with lab11 (the default) or lab13.
+lab = sys.argv[1] if len(sys.argv) > 1 else 'lab11'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), lab))
+import param as P
+from signal_generator import Signals, mySignal
+from controllerSS import controllerSS
+from gain_schedule import gainSchedule
+from uncertainty import closedLoopRun
+
+t_end = 60.0            # Closed loop run length, s
+amplitudes = (25, 40, 45)   # Pitch step amplitudes, deg
+n_timing = 20000        # Lookups timed
+
+start = time.time()
+schedule = gainSchedule(P)
+print('gainSchedule: %.1f ms (%d pitches)' % (1000*(time.time() - start), len(schedule.theta)))
+
+start = time.time()
+for i in range(n_timing):
+    schedule.lookup(0.3)
+print('lookup: %.2f us' % (1e6*(time.time() - start)/n_timing))
+
+for amplitude in amplitudes:
+    class PitchSteps(Signals):
+        def __init__(self):
+            self.handle = [mySignal(amplitude*np.pi/180,0.02),   # Theta_r
+                           mySignal(-25*np.pi/180,0.01)]         # Psi_r
+    for scheduled in (False, True):
+        P.gain_scheduling = scheduled
+        m = closedLoopRun(controllerSS, PitchSteps, None, t_end)
+        print('%2d deg %-9s theta rms %.4f max %.4f  psi rms %.4f  saturated %.3f'
+              % (amplitude, 'scheduled' if scheduled else 'fixed', m['theta_rms'],
+                 m['theta_max'], m['psi_rms'], m['saturation']))
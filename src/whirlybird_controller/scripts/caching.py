@@ -0,0 +1,110 @@
+from collections import OrderedDict
+import errno
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+
+class LRUCache:
+    ''' A dictionary that holds at most maxsize entries. When it is full,
+        the least recently used entry is dropped.'''
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data[key] = value   # Move to the most recently used end
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = value
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+
+def quantize(values, resolution):
+    # Rounds values to a multiple of resolution and returns a tuple of
+    # integers that can be used as part of a cache key.
+    return tuple(int(round(v/resolution)) for v in np.ravel(values))
+
+
+def parameterHash(*values):
+    # Hex digest of values, which can be nested lists, tuples, dicts,
+    # strings, numbers and arrays. Floats are hashed by repr, so the
+    # digest only changes when a value does.
+    h = hashlib.sha1()
+    def feed(v):
+        if isinstance(v, dict):
+            h.update(b'{')
+            for k in sorted(v):
+                feed(k)
+                feed(v[k])
+            h.update(b'}')
+        elif isinstance(v, (list, tuple)):
+            h.update(b'[')
+            for x in v:
+                feed(x)
+            h.update(b']')
+        elif isinstance(v, np.ndarray) or isinstance(v, np.generic):
+            a = np.asarray(v)
+            if np.iscomplexobj(a):
+                h.update(b'complex')
+                a = np.hstack((a.real.ravel(), a.imag.ravel()))
+            a = np.asarray(a, dtype=float)
+            h.update(repr(a.shape).encode('ascii'))
+            h.update(' '.join(repr(float(x)) for x in a.ravel()).encode('ascii'))
+        elif isinstance(v, float):
+            h.update(repr(v).encode('ascii'))
+        else:
+            h.update(str(v).encode('utf-8'))
+        h.update(b';')
+    for v in values:
+        feed(v)
+    return h.hexdigest()
+
+
+def cacheDirectory(name):
+    # Directory for the disk cache name. It is under $WHIRLYBIRD_CACHE,
+    # or ~/.cache/whirlybird, and is created if needed.
+    root = os.environ.get('WHIRLYBIRD_CACHE',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'whirlybird'))
+    path = os.path.join(root, name)
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    return path
+
+
+def writeAtomic(path, data):
+    # Writes the bytes data to path through a temporary file and a
+    # rename, so readers never see a partly written file.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(tmp, path)
+    except Exception:
+        os.remove(tmp)
+        raise
@@ -0,0 +1,164 @@
+import os
+import numpy as np
+from caching import parameterHash, cacheDirectory, writeAtomic
+from linear_dynamics import discreteObserver
+
+# Bump when the generated code changes, so cached files are not reused
+GENERATOR_VERSION = 1
+
+# Largest PWM command sent to the motors
+PWM_MAX = 0.6
+
+_classes = {}
+
+
+def ssController(P, observer=None, pwm_max=PWM_MAX):
+    # Returns a controller class with the interface of controllerSS whose
+    # getForces is unrolled scalar code for the gains and models in the
+    # param module P. With observer=False the rates come from dirty
+    # derivatives as in lab11, with observer=True from the exact discrete
+    # observers as in lab13. By default the observer is used when P has
+    # observer gains. The generated source is cached on disk under its
+    # gains hash and only regenerated when a gain or model changes.
+    if observer is None:
+        observer = hasattr(P,'L_lon')
+    values = _designValues(P, observer, pwm_max)
+    key = parameterHash(GENERATOR_VERSION, observer, values)
+    cls = _classes.get(key)
+    if cls is None:
+        path = os.path.join(cacheDirectory('codegen'), 'ss_%s.py' % key)
+        if not os.path.exists(path):
+            source = ssControllerSource(values, observer, key)
+            writeAtomic(path, source.encode('utf-8'))
+        with open(path) as f:
+            code = compile(f.read(), path, 'exec')
+        namespace = {}
+        exec(code, namespace)
+        cls = _classes[key] = namespace['GeneratedSSController']
+    return cls
+
+
+def _designValues(P, observer, pwm_max):
+    # Everything the generated code depends on, as floats and arrays
+    values = {'K_lon': np.ravel(P.K_lon), 'ki_lon': float(P.ki_lon),
+              'K_lat': np.ravel(P.K_lat), 'ki_lat': float(P.ki_lat),
+              'x0_lon': np.ravel(P.x0_lon), 'x0_lat': np.ravel(P.x0_lat),
+              'F0': float(P.F0), 'T0': float(P.T0), 'Ts': float(P.Ts),
+              'km': float(P.km), 'd': float(P.d), 'pwm_max': float(pwm_max),
+              'theta0': float(P.theta0), 'phi0': float(P.phi0),
+              'psi0': float(P.psi0)}
+    if observer:
+        M, c = discreteObserver(P.A_lon, P.B_lon, P.C_lon, P.L_lon,
+                                P.x0_lon, P.F0, P.Ts)
+        values['M_lon'], values['c_lon'] = M, c
+        M, c = discreteObserver(P.A_lat, P.B_lat, P.C_lat, P.L_lat,
+                                P.x0_lat, P.T0, P.Ts)
+        values['M_lat'], values['c_lat'] = M, c
+    else:
+        values['sigma'] = float(P.sigma)
+    return values
+
+
+def _sum(const, terms):
+    # Python expression for const + sum of coefficient*name, without
+    # the terms whose coefficient is zero
+    expr = [repr(float(const))]
+    for coeff, name in terms:
+        coeff = float(coeff)
+        if coeff > 0:
+            expr.append('+ %r*%s' % (coeff, name))
+        elif coeff < 0:
+            expr.append('- %r*%s' % (-coeff, name))
+    return ' '.join(expr)
+
+
+def ssControllerSource(values, observer, key=''):
+    # Source of the GeneratedSSController class for the design values
+    # returned by _designValues.
+    v = values
+    if observer:
+        state = ['xl0','xl1','xa0','xa1','xa2','xa3','F_d1','T_d1']
+        init = [v['theta0'], 0.0, v['phi0'], v['psi0'], 0.0, 0.0, 0.0, 0.0]
+        x_lon = ['xl0','xl1']
+        x_lat = ['xa0','xa1','xa2','xa3']
+    else:
+        state = ['phidot','thetadot','psidot','phi_d1','theta_d1','psi_d1']
+        init = [0.0, 0.0, 0.0, v['phi0'], v['theta0'], v['psi0']]
+        x_lon = ['theta','thetadot']
+        x_lat = ['phi','psi','phidot','psidot']
+    state += ['int_lon','int_lat','e_theta_d1','e_psi_d1']
+    init += [0.0, 0.0, 0.0, 0.0]
+
+    lines = []
+    if observer:
+        # Lon observer inputs [F_d1, theta], lat observer [T_d1, psi, phi]
+        for xhat, M, c, inputs in ((x_lon, v['M_lon'], v['c_lon'], ['F_d1','theta']),
+                                   (x_lat, v['M_lat'], v['c_lat'], ['T_d1','psi','phi'])):
+            names = xhat + inputs
+            exprs = [_sum(c[i], zip(M[i], names)) for i in range(len(xhat))]
+            lines.append('%s = (%s)' % (', '.join(xhat), ',\n            '.join(exprs)))
+        lines.append('e_theta = theta_r - xl0')
+        lines.append('e_psi = psi_r - xa1')
+    else:
+        a1 = (2*v['sigma'] - v['Ts'])/(2*v['sigma'] + v['Ts'])
+        a2 = 2/(2*v['sigma'] + v['Ts'])
+        lines.append('e_theta = theta_r - theta')
+        lines.append('e_psi = psi_r - psi')
+        for rate, angle in (('phidot','phi'), ('thetadot','theta'), ('psidot','psi')):
+            lines.append('%s = %r*%s + %r*(%s - %s_d1)' % (rate, a1, rate, a2, angle, angle))
+        lines.append('phi_d1 = phi')
+        lines.append('theta_d1 = theta')
+        lines.append('psi_d1 = psi')
+    h = v['Ts']/2.0
+    lines.append('int_lon += %r*(e_theta + e_theta_d1)' % h)
+    lines.append('int_lat += %r*(e_psi + e_psi_d1)' % h)
+    lines.append('e_theta_d1 = e_theta')
+    lines.append('e_psi_d1 = e_psi')
+
+    # F = F0 - K_lon*(x_lon - x0_lon) - ki_lon*int_lon, and T likewise
+    F0 = v['F0'] + np.dot(v['K_lon'], v['x0_lon'])
+    T0 = v['T0'] + np.dot(v['K_lat'], v['x0_lat'])
+    lines.append('F = %s' % _sum(F0, zip(np.append(-v['K_lon'], -v['ki_lon']),
+                                         x_lon + ['int_lon'])))
+    lines.append('T = %s' % _sum(T0, zip(np.append(-v['K_lat'], -v['ki_lat']),
+                                         x_lat + ['int_lat'])))
+    if observer:
+        lines.append('F_d1 = F')
+        lines.append('T_d1 = T')
+
+    # Convert to PWM and saturate
+    cF = 1.0/(v['km']*2.0)
+    cT = cF/v['d']
+    lines.append('ul = %r*F + %r*T' % (cF, cT))
+    lines.append('ur = %r*F - %r*T' % (cF, cT))
+    for u in ('ul','ur'):
+        lines.append('if %s > %r:\n    %s = %r\nelif %s < 0.0:\n    %s = 0.0'
+                     % (u, v['pwm_max'], u, v['pwm_max'], u, u))
+
+    body = '\n'.join(lines).replace('\n', '\n        ')
+    source = ['# Generated by codegen.py for gains hash %s. Do not edit.' % key,
+              '',
+              'class GeneratedSSController:',
+              "    ''' Unrolled state feedback controller%s.'''"
+              % (' with observers' if observer else ''),
+              '',
+              '    def __init__(self):',
+              '        self.state = (%s)' % ', '.join(repr(float(x)) for x in init),
+              '',
+              '    def getForces(self, y_r, y):',
+              '        theta_r = y_r[0]',
+              '        psi_r = y_r[1]',
+              '        phi = y[0]',
+              '        theta = y[1]',
+              '        psi = y[2]',
+              '        (%s) = self.state' % ', '.join(state),
+              '        ' + body,
+              '        self.state = (%s)' % ', '.join(state),
+              '        return [ul, ur]',
+              '']
+    if observer:
+        source += ['    def getObsStates(self):',
+                   '        s = self.state',
+                   '        return [[[s[2]],[s[3]],[s[4]],[s[5]]], [[s[0]],[s[1]]]]',
+                   '']
+    return '\n'.join(source)
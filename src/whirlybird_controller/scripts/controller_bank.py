@@ -0,0 +1,298 @@
+import numpy as np
+import param as P
+from linear_dynamics import discreteObserver
+from trim import trimTable, labParameters
+
+# Largest PWM command sent to the motors
+PWM_MAX = 0.6
+
+# Loop structures of PDControllerBank, by the lab they come from
+LOOP_SETS = ('lab10', 'lab8', 'lab7')
+
+
+def _gain(gains, name, N, default=0.0):
+    # Gain name from gains, else from param.py, else default. Returns a
+    # float, or an (N,) array when the gain differs between controllers.
+    value = np.asarray(gains.get(name, getattr(P, name, default)), dtype=float)
+    if value.ndim == 0:
+        return float(value)
+    if value.shape != (N,):
+        raise ValueError('gain %s must be a scalar or have shape (%d,)' % (name, N))
+    return value
+
+
+def _gainRows(gains, name, N, n):
+    # State feedback gain name as an (N,n) array, one row per controller
+    value = np.asarray(gains.get(name, getattr(P, name, np.zeros(n))), dtype=float)
+    value = value.reshape(-1, n)
+    if value.shape[0] not in (1, N):
+        raise ValueError('gain %s must have shape (%d,) or (%d,%d)' % (name, n, N, n))
+    return np.ascontiguousarray(np.broadcast_to(value, (N,n)))
+
+
+class ControllerBank:
+    ''' Common part of the controller banks. A bank holds the state of N
+        controllers in arrays and computes the PWM commands of all of
+        them in one call to getForces, which returns an (N,2) array of
+        [ul, ur]. The gains can be shared or given per controller.'''
+
+    def __init__(self, N, pwm_max=PWM_MAX):
+        self.N = N
+        self.pwm_max = pwm_max
+        self.u = np.empty((N,2))
+        self.saturated = np.zeros(N, dtype=bool)
+
+    # Converts force and torque into the left and right PWM commands.
+    # F and tau are (N,) arrays. The result is written to self.u.
+    def convertForces(self, F, tau):
+        tau_d = tau/P.d
+        np.add(F, tau_d, out=self.u[:,0])
+        np.subtract(F, tau_d, out=self.u[:,1])
+        self.u *= 1.0/(P.km*2.0)
+        return self.saturatePWM(self.u)
+
+    # Saturates the PWM commands, in place, to the range 0-pwm_max.
+    # self.saturated marks the controllers whose commands were outside
+    # the range 0-1.
+    def saturatePWM(self, u):
+        np.logical_or((u < 0).any(axis=1), (u > 1).any(axis=1), out=self.saturated)
+        np.clip(u, 0.0, self.pwm_max, out=u)
+        return u
+
+    # Splits the reference into theta_r and psi_r, scalars when one pair
+    # [theta_r, psi_r] is shared by all controllers, else (N,) arrays.
+    def _refs(self, y_r):
+        y_r = np.asarray(y_r, dtype=float)
+        if y_r.ndim == 1:
+            return y_r[0], y_r[1]
+        return y_r[:,0], y_r[:,1]
+
+
+class PDControllerBank(ControllerBank):
+    ''' N copies of the cascaded PID controller of lab10/controllerPD:
+        pitch sets the force on top of the trim force, and yaw sets the
+        roll reference of the inner roll loop. Derivatives come from
+        dirty differentiators and the integrators only run while the
+        differentiator is small and the last command was not saturated.
+        A loop with a divisor (th_divisor, s_divisor, p_divisor in
+        param.py) runs every divisor-th call and holds its output in
+        between, like PIDBank.
+
+        loops picks the loop structure of another lab instead:
+          'lab8' - the PD controllers of lab8/controllerPD, with the same
+                   cascade but the rates taken from the measured states,
+                   no integrators, and the feedforward force of a level
+                   rotor instead of the trim force
+          'lab7' - only the pitch loop of lab8, with zero torque, as in
+                   lab7/controllerPD'''
+
+    def __init__(self, N, gains=None, pwm_max=PWM_MAX, windup_limit=0.05, loops='lab10'):
+        # gains optionally overrides th_kp, th_kd, th_ki, s_kp, s_kd,
+        # s_ki, p_kp, p_kd, p_ki of param.py. Integral gains that
+        # param.py does not have are zero, and so are the yaw and roll
+        # gains of lab7.
+        if loops not in LOOP_SETS:
+            raise ValueError('loops must be one of %s' % ', '.join(LOOP_SETS))
+        ControllerBank.__init__(self, N, pwm_max)
+        self.loops = loops
+        gains = {} if gains is None else gains
+        self.kp = [_gain(gains, a + '_kp', N) for a in ('th','s','p')]
+        self.kd = [_gain(gains, a + '_kd', N) for a in ('th','s','p')]
+        self.ki = [_gain(gains, a + '_ki', N) for a in ('th','s','p')]
+        self.windup_limit = windup_limit
+        self.divisor = [int(getattr(P, a + '_divisor', 1)) for a in ('th','s','p')]
+        self.Ts = [P.Ts*k for k in self.divisor]
+        if loops == 'lab10':
+            self.a1 = [(2*P.sigma - Ts)/(2*P.sigma + Ts) for Ts in self.Ts]
+            self.a2 = [2/(2*P.sigma + Ts) for Ts in self.Ts]
+            self.trim = trimTable(params=labParameters(P))
+        else:
+            # Fe = Fe_gain*cos(theta)
+            self.Fe_gain = (P.m1*P.l1 - P.m2*P.l2)*P.g/P.l1
+            self._no_torque = np.zeros(N)
+        self.tick = 0
+
+        # Rows are the theta, psi and phi loops
+        self.differentiator = np.zeros((3,N))
+        self.integrator = np.zeros((3,N))
+        self.error_d1 = np.zeros((3,N))
+        self.output = np.zeros((3,N))
+        self.y_d1 = np.empty((3,N))
+        self.y_d1[0] = P.theta0
+        self.y_d1[1] = P.psi0
+        self.y_d1[2] = P.phi0
+
+    def _loop(self, i, y_r, y):
+        # One PID loop of all controllers. i is the row of the loop.
+        if self.tick % self.divisor[i] != 0:
+            return self.output[i]
+        error = y_r - y
+        diff = self.differentiator[i]
+        diff *= self.a1[i]
+        diff += self.a2[i]*(y - self.y_d1[i])
+        active = (np.abs(diff) < self.windup_limit) & ~self.saturated
+        self.integrator[i] += active*((self.Ts[i]/2.0)*(error + self.error_d1[i]))
+        self.error_d1[i] = error
+        self.y_d1[i] = y
+        self.output[i] = self.kp[i]*error - self.kd[i]*diff + self.ki[i]*self.integrator[i]
+        return self.output[i]
+
+    def _rateLoop(self, i, y_r, y, ydot):
+        # One PD loop of all controllers on the measured rate ydot, as in
+        # lab7 and lab8
+        if self.tick % self.divisor[i] != 0:
+            return self.output[i]
+        self.output[i] = self.kp[i]*(y_r - y) - self.kd[i]*ydot
+        return self.output[i]
+
+    def getForces(self, y_r, y):
+        # y_r is the reference [theta_r, psi_r], shared or (N,2). For
+        # lab7 it can also be [theta_r] or (N,1).
+        # y is the (N,6) array of states.
+        if self.loops == 'lab7':
+            # The lab7 signals only give theta_r, which is all it uses
+            y_r = np.asarray(y_r, dtype=float)
+            theta_r = y_r[0] if y_r.ndim == 1 else y_r[:,0]
+        else:
+            theta_r, psi_r = self._refs(y_r)
+        theta = y[:,1]
+        if self.loops != 'lab10':
+            F = self.Fe_gain*np.cos(theta) + self._rateLoop(0, theta_r, theta, y[:,4])
+            if self.loops == 'lab8':
+                phi_r = self._rateLoop(1, psi_r, y[:,2], y[:,5])
+                T = self._rateLoop(2, phi_r, y[:,0], y[:,3])
+            else:
+                T = self._no_torque
+            self.tick += 1
+            return self.convertForces(F, T)
+        phi_r = self._loop(1, psi_r, y[:,2])
+        F = self.trim.force(theta) + self._loop(0, theta_r, theta)
+        T = self._loop(2, phi_r, y[:,0])
+        self.tick += 1
+        return self.convertForces(F, T)
+
+
+class SSControllerBank(ControllerBank):
+    ''' N copies of the lon/lat state feedback controllers with integrators
+        of lab11 and lab13. With observer=False the rates come from dirty
+        differentiators, as in lab11/controllerSS. With observer=True they
+        come from the exact discrete observers of lab13/controllerSS,
+        which need L_lon and L_lat.'''
+
+    def __init__(self, N, gains=None, observer=None, pwm_max=PWM_MAX):
+        # gains optionally overrides K_lon, ki_lon, K_lat, ki_lat, and
+        # for the observer L_lon and L_lat, of param.py. K and ki can be
+        # given per controller, L is shared. By default the observer is
+        # used if param.py has observer gains.
+        ControllerBank.__init__(self, N, pwm_max)
+        gains = {} if gains is None else gains
+        if observer is None:
+            observer = hasattr(P,'L_lon')
+        self.observer = observer
+        self.K_lon = _gainRows(gains, 'K_lon', N, 2)
+        self.K_lat = _gainRows(gains, 'K_lat', N, 4)
+        self.ki_lon = _gain(gains, 'ki_lon', N)
+        self.ki_lat = _gain(gains, 'ki_lat', N)
+        self.x0_lon = np.ravel(P.x0_lon).astype(float)
+        self.x0_lat = np.ravel(P.x0_lat).astype(float)
+
+        self.integrator_lon = np.zeros(N)
+        self.integrator_lat = np.zeros(N)
+        self.error_theta_d1 = np.zeros(N)
+        self.error_psi_d1 = np.zeros(N)
+        self.x_lon = np.empty((N,2))
+        self.x_lat = np.empty((N,4))
+        self._dx_lon = np.empty((N,2))
+        self._dx_lat = np.empty((N,4))
+
+        if observer:
+            self._initObservers(gains)
+        else:
+            self.a1 = (2*P.sigma - P.Ts)/(2*P.sigma + P.Ts)
+            self.a2 = 2/(2*P.sigma + P.Ts)
+            self.x_lon[:] = [P.theta0, 0.0]
+            self.x_lat[:] = [P.phi0, P.psi0, 0.0, 0.0]
+
+    def _initObservers(self, gains):
+        # Same discretization as lab13/controllerSS: with v = [xhat; u; y]
+        # each observer is xhat[k+1] = v*M.T + c for all rows at once.
+        N = self.N
+        self.F_d1 = np.zeros(N)
+        self.T_d1 = np.zeros(N)
+        models = ((P.A_lon, P.B_lon, P.C_lon, gains.get('L_lon', P.L_lon), self.x0_lon, P.F0),
+                  (P.A_lat, P.B_lat, P.C_lat, gains.get('L_lat', P.L_lat), self.x0_lat, P.T0))
+        self._MT = []
+        self._c = []
+        for model in models:
+            M, c = discreteObserver(*(model + (P.Ts,)))
+            self._MT.append(np.ascontiguousarray(M.T))
+            self._c.append(c)
+        self.v_lon = np.zeros((N,2+1+1))
+        self.v_lat = np.zeros((N,4+1+2))
+        self.v_lon[:,0:2] = [P.theta0, 0.0]
+        self.v_lat[:,0:4] = [P.phi0, P.psi0, 0.0, 0.0]
+
+    def _updateObservers(self, y):
+        v = self.v_lon
+        v[:,2] = self.F_d1
+        v[:,3] = y[:,1]
+        np.dot(v, self._MT[0], out=self.x_lon)
+        self.x_lon += self._c[0]
+        v[:,0:2] = self.x_lon
+
+        v = self.v_lat
+        v[:,4] = self.T_d1
+        v[:,5] = y[:,2]
+        v[:,6] = y[:,0]
+        np.dot(v, self._MT[1], out=self.x_lat)
+        self.x_lat += self._c[1]
+        v[:,0:4] = self.x_lat
+
+    def _updateDifferentiators(self, y):
+        # x_lon = [theta, thetadot], x_lat = [phi, psi, phidot, psidot],
+        # rates from dirty derivatives of the measured angles
+        x_lon = self.x_lon
+        x_lat = self.x_lat
+        x_lon[:,1] *= self.a1
+        x_lon[:,1] += self.a2*(y[:,1] - x_lon[:,0])
+        x_lat[:,2:4] *= self.a1
+        x_lat[:,2] += self.a2*(y[:,0] - x_lat[:,0])
+        x_lat[:,3] += self.a2*(y[:,2] - x_lat[:,1])
+        x_lon[:,0] = y[:,1]
+        x_lat[:,0] = y[:,0]
+        x_lat[:,1] = y[:,2]
+
+    def getForces(self, y_r, y):
+        # y_r is the reference [theta_r, psi_r], shared or (N,2).
+        # y is the (N,6) array of states.
+        theta_r, psi_r = self._refs(y_r)
+        if self.observer:
+            self._updateObservers(y)
+            error_theta = theta_r - self.x_lon[:,0]
+            error_psi = psi_r - self.x_lat[:,1]
+        else:
+            self._updateDifferentiators(y)
+            error_theta = theta_r - y[:,1]
+            error_psi = psi_r - y[:,2]
+
+        self.integrator_lon += (P.Ts/2.0)*(error_theta + self.error_theta_d1)
+        self.integrator_lat += (P.Ts/2.0)*(error_psi + self.error_psi_d1)
+        self.error_theta_d1 = error_theta
+        self.error_psi_d1 = error_psi
+
+        # State feedback, one row of K per controller
+        np.subtract(self.x_lon, self.x0_lon, out=self._dx_lon)
+        np.subtract(self.x_lat, self.x0_lat, out=self._dx_lat)
+        F = P.F0 - np.einsum('ij,ij->i', self.K_lon, self._dx_lon) \
+            - self.ki_lon*self.integrator_lon
+        T = P.T0 - np.einsum('ij,ij->i', self.K_lat, self._dx_lat) \
+            - self.ki_lat*self.integrator_lat
+        if self.observer:
+            self.F_d1 = F
+            self.T_d1 = T
+        return self.convertForces(F, T)
+
+    # Observer or differentiator states of all controllers, (N,2) lon
+    # and (N,4) lat
+    def getObsStates(self):
+        return self.x_lat, self.x_lon
@@ -1,95 +1,539 @@
+import math
 import numpy as np
-import param as P
+from integrators import DormandPrince
 
+try:
+    import param as P
+except ImportError:
+    # Imported from a lab package, as rosMain does, where the lab's
+    # param.py is not a top-level module. The physical parameters then
+    # have to be given as params.
+    P = None
+
+# Physical parameters used by the equations of motion. Any of them
+# can be overridden per vehicle in WhirlybirdDynamicsBatch.
+PHYSICAL_PARAMETERS = ('l1','l2','m1','m2','d','Jx','Jy','Jz','g')
+
+# Ways of solving M*qddot = Q - C - dP for the accelerations.
+#   'closed_form' - explicit solution of the 3x3 system (default)
+#   'linalg'      - numerical solve of the stacked mass matrices
+SOLVERS = ('closed_form','linalg')
+
+# Ways of handling the pitch stop at +-theta_max.
+#   'clamp' - clip theta after each step and keep thetadot (default)
+#   'event' - find the time the stop is reached, apply an impact rule
+#             and hold pitch on the stop while the forces push into it
+PITCH_STOPS = ('clamp','event')
+
+# Rebound speed below which a vehicle comes to rest on the stop, rad/s
+REST_SPEED = 1e-3
+
+
+def physicalParameters(params=None):
+    # The physical parameters of param.py as floats. Entries of the
+    # optional dict params are used instead where given.
+    params = {} if params is None else params
+    return dict((name, float(params[name] if name in params else getattr(P,name)))
+                for name in PHYSICAL_PARAMETERS)
+
+
+def closedFormConstants(p):
+    # Groups of physical parameters that do not depend on the state.
+    # p maps the names in PHYSICAL_PARAMETERS to scalars or arrays.
+    return {'Jx': p['Jx'],
+            'ml2': p['m1']*p['l1']*p['l1'] + p['m2']*p['l2']*p['l2'],
+            'Jy': p['Jy'],
+            'Jz': p['Jz'],
+            'dJ': p['Jz'] - p['Jy'],
+            'grav': (p['m1']*p['l1'] - p['m2']*p['l2'])*p['g'],
+            'l1': p['l1'],
+            'd': p['d']}
+
+
+def accelerations(k,cp,sp,ct,st,phidot,thetadot,psidot,fl,fr,pinned=False):
+    # Closed form solution of M*[phiddot,thetaddot,psiddot] = Q - C - dP.
+    # k holds the constants from closedFormConstants. Only arithmetic is
+    # used, so the arguments can be floats or arrays of the same shape.
+    # If pinned is True, pitch is held on the stop and thetaddot is zero.
+    Jx = k['Jx']
+    dJ = k['dJ']
+    cc = cp*cp
+    ss = sp*sp
+    spcp = sp*cp
+    stct = st*ct
+    c2p = cc - ss
+    Iy = k['ml2'] + k['Jy']*ss + k['Jz']*cc
+
+    # Mass matrix entries. M[0][0] is Jx, M[0][1] is zero, M[0][2] is
+    # -Jx*st and M[2][2] is Iy*ct*ct + Jx*st*st.
+    m11 = k['ml2'] + k['Jy']*cc + k['Jz']*ss
+    m12 = -dJ*spcp*ct
+
+    # Right hand side Q - C - dP
+    r0 = k['d']*(fl - fr) \
+        + thetadot*thetadot*dJ*spcp - phidot*phidot*dJ*spcp*ct*ct \
+        + thetadot*psidot*ct*(Jx - dJ*c2p)
+    r1 = k['l1']*(fl + fr)*cp \
+        - phidot*phidot*stct*(Iy - Jx) \
+        + 2*phidot*thetadot*dJ*stct + phidot*psidot*ct*(dJ*c2p - Jx) \
+        - k['grav']*ct
+    r2 = k['l1']*(fl + fr)*ct*sp + k['d']*(fr - fl)*st \
+        - thetadot*thetadot*dJ*spcp*st + phidot*thetadot*ct*(Jx + dJ*c2p) \
+        + 2*phidot*psidot*dJ*ct*ct*spcp + 2*thetadot*psidot*stct*(Iy - Jx)
+
+    # The first row gives phiddot = r0/Jx + st*psiddot. Substituting it in
+    # the third row cancels the Jx*st*st term of M[2][2] and leaves a 2x2
+    # system in thetaddot and psiddot.
+    m22 = Iy*ct*ct
+    if pinned:
+        # The second row only gives the reaction of the stop.
+        psiddot = (r2 + st*r0)/m22
+        return r0/Jx + st*psiddot, 0.0, psiddot
+    det = m11*m22 - m12*m12
+    thetaddot = (m22*r1 - m12*(r2 + st*r0))/det
+    psiddot = (m11*(r2 + st*r0) - m12*r1)/det
+    phiddot = r0/Jx + st*psiddot
+    return phiddot, thetaddot, psiddot
+
+
+def scalarDerivatives(k,x,fl,fr,pinned=False):
+    # Derivatives of one vehicle whose state x is a list of floats.
+    # numpy call overhead dominates at this size, so math is used.
+    phiddot, thetaddot, psiddot = accelerations(k,
+        math.cos(x[0]), math.sin(x[0]), math.cos(x[1]), math.sin(x[1]),
+        x[3], x[4], x[5], fl, fr, pinned)
+    return [x[3], x[4], x[5], phiddot, thetaddot, psiddot]
+
+
+def scalarRK4(k,x,fl,fr,h,pinned=False):
+    # One RK4 step of length h for a state given as a list of floats
+    k1 = scalarDerivatives(k, x, fl, fr, pinned)
+    k2 = scalarDerivatives(k, [a + h/2*b for a, b in zip(x,k1)], fl, fr, pinned)
+    k3 = scalarDerivatives(k, [a + h/2*b for a, b in zip(x,k2)], fl, fr, pinned)
+    k4 = scalarDerivatives(k, [a + h*b for a, b in zip(x,k3)], fl, fr, pinned)
+    return [a + h/6*(b1 + 2*b2 + 2*b3 + b4)
+            for a, b1, b2, b3, b4 in zip(x,k1,k2,k3,k4)]
+
+
+def pitchStopStep(k,x,fl,fr,h,limit,restitution,pinned):
+    # Advances one vehicle by h with the pitch stop treated as an event.
+    # The time the stop is reached is found by root finding on the RK4
+    # solution, thetadot is reversed and scaled by restitution, and the
+    # rest of the step is integrated from there. A vehicle that comes to
+    # rest on the stop stays pinned until the forces pull it away.
+    # Returns the new state and whether pitch is pinned on the stop.
+    t = 0.0
+    for impact in range(10):   # Bounds the work of a chattering contact
+        if pinned:
+            x = scalarRK4(k, x, fl, fr, h - t, True)
+            free = scalarDerivatives(k, x, fl, fr)[4]
+            return x, free*x[1] > 0.0
+
+        x_new = scalarRK4(k, x, fl, fr, h - t)
+        if abs(x_new[1]) <= limit:
+            return x_new, False
+
+        # Illinois method on g(tau) = |theta(tau)| - limit, where theta(tau)
+        # is the RK4 step of length tau.
+        side = math.copysign(limit, x_new[1])
+        a, ga = 0.0, x[1]*side/limit - limit
+        b, gb = h - t, x_new[1]*side/limit - limit
+        tau, x_event = b, x_new
+        if ga >= 0.0:
+            # Already on the stop and moving into it
+            tau, x_event = 0.0, list(x)
+        for i in range(50):
+            if ga >= 0.0 or b - a < 1e-12:
+                break
+            tau = b - gb*(b - a)/(gb - ga)
+            x_event = scalarRK4(k, x, fl, fr, tau)
+            g = x_event[1]*side/limit - limit
+            if abs(g) < 1e-12:
+                break
+            if g > 0.0:
+                b, gb = tau, g
+                ga = ga/2.0
+            else:
+                a, ga = tau, g
+                gb = gb/2.0
+
+        # Impact
+        t += tau
+        x = x_event
+        x[1] = side
+        x[4] = -restitution*x[4]
+        if abs(x[4]) < REST_SPEED:
+            x[4] = 0.0
+            pinned = scalarDerivatives(k, x, fl, fr)[4]*side > 0.0
+        if h - t <= 0.0:
+            return x, pinned
+
+    # Still bouncing after the last impact allowed: the rest of the step
+    # is spent pinned on the stop, so the state keeps up with the clock
+    x[4] = 0.0
+    x = scalarRK4(k, x, fl, fr, h - t, True)
+    free = scalarDerivatives(k, x, fl, fr)[4]
+    return x, free*x[1] > 0.0
+
+
+class WhirlybirdDynamicsBatch:
+    ''' Propagates N whirlybirds at once. The states are held in an
+        (N,6) array, one row per vehicle, ordered
+        [phi, theta, psi, phidot, thetadot, psidot]. Every call to
+        propagateDynamics advances all N vehicles by P.Ts.'''
+
+    def __init__(self, N=1, state0=None, params=None, solver='closed_form',
+                 pitch_stop='clamp', restitution=0.0):
+        # N is the number of vehicles.
+        # state0 is either one 6 element initial state shared by all
+        # vehicles or an (N,6) array of initial states.
+        # params is an optional dict that maps names in
+        # PHYSICAL_PARAMETERS to a scalar or a length N array.
+        # solver is one of SOLVERS.
+        # pitch_stop is one of PITCH_STOPS. restitution is the fraction of
+        # thetadot kept, with its sign reversed, when the stop is hit.
+        if solver not in SOLVERS:
+            raise ValueError('solver must be one of %s' % (SOLVERS,))
+        if pitch_stop not in PITCH_STOPS:
+            raise ValueError('pitch_stop must be one of %s' % (PITCH_STOPS,))
+        self.N = N
+        self.solver = solver
+        self.pitch_stop = pitch_stop
+        self.restitution = restitution
+        self.pinned = np.zeros(N, dtype=bool)   # Pitch resting on the stop
+        if state0 is None:
+            state0 = [P.phi0, P.theta0, P.psi0,
+                      P.phidot0, P.thetadot0, P.psidot0]
+        self.state = np.empty((N,6))
+        self.state[:] = state0
+        self.integrator = None    # Created by propagateInterval
+
+        # Scratch buffers for the RK4 stages, reused by every step
+        self._k = np.empty((4,N,6))
+        self._x = np.empty((N,6))
+        self.setParameters(params)
+
+    def setParameters(self, params=None):
+        # Parameters that are not given fall back to the values in param.py.
+        if params is None:
+            params = {}
+        self.p = {}
+        for name in PHYSICAL_PARAMETERS:
+            value = np.asarray(params.get(name, getattr(P,name)), dtype=float)
+            if value.ndim != 0 and value.shape != (self.N,):
+                raise ValueError('parameter %s must be a scalar or have shape (%d,)'
+                                 % (name, self.N))
+            self.p[name] = float(value) if value.ndim == 0 else value
+        self.k = closedFormConstants(self.p)
+        # Pitch stop. Param files without theta_max leave pitch unlimited.
+        self.theta_limit = getattr(P,'theta_max',np.inf)*np.pi/180
+
+    def propagateDynamics(self, u):
+        # P.Ts is the time step between function calls.
+        # u contains the left and right forces, either one pair shared by
+        # all vehicles or an (N,2) array with one pair per vehicle.
+        self._step(np.broadcast_to(np.asarray(u, dtype=float), (self.N,2)))
+
+    def propagateN(self, u_schedule, n_steps, record_every=1, out=None):
+        # Propagates n_steps steps of P.Ts without building lists or
+        # matrices per step. u_schedule holds the left and right forces of
+        # every step, either (n_steps,2) shared by all vehicles or
+        # (n_steps,N,2). The state after every record_every-th step is
+        # written to out, an (n_steps//record_every,N,6) array that is
+        # allocated if not given. Returns out.
+        u_schedule = np.asarray(u_schedule, dtype=float)
+        if u_schedule.shape == (n_steps,2):
+            u_schedule = np.broadcast_to(u_schedule[:,np.newaxis,:], (n_steps,self.N,2))
+        elif u_schedule.shape != (n_steps,self.N,2):
+            raise ValueError('u_schedule must have shape (%d,2) or (%d,%d,2)'
+                             % (n_steps, n_steps, self.N))
+        n_records = n_steps//record_every
+        if out is None:
+            out = np.empty((n_records,self.N,6))
+        elif out.shape != (n_records,self.N,6):
+            raise ValueError('out must have shape (%d,%d,6)' % (n_records, self.N))
+
+        record = 0
+        for i in range(n_records*record_every):
+            self._step(u_schedule[i])
+            if (i + 1) % record_every == 0:
+                out[record] = self.state
+                record += 1
+        for i in range(n_records*record_every, n_steps):
+            self._step(u_schedule[i])
+        return out
+
+    def _step(self, u):
+        # RK4 integration into the scratch buffers. u is an (N,2) array.
+        h = P.Ts
+        k1, k2, k3, k4 = self._k
+        x = self._x
+        self.Derivatives(self.state, u, out=k1)
+        np.multiply(k1, h/2, out=x)
+        x += self.state
+        self.Derivatives(x, u, out=k2)
+        np.multiply(k2, h/2, out=x)
+        x += self.state
+        self.Derivatives(x, u, out=k3)
+        np.multiply(k3, h, out=x)
+        x += self.state
+        self.Derivatives(x, u, out=k4)
+
+        # dx = h/6*(k1 + 2*k2 + 2*k3 + k4), accumulated in k1
+        k2 += k3
+        k2 *= 2
+        k1 += k2
+        k1 += k4
+        k1 *= h/6
+        dx = k1
+        if self.pitch_stop == 'clamp':
+            self.state += dx
+            np.clip(self.state[:,1], -self.theta_limit, self.theta_limit,
+                    out=self.state[:,1])
+            return
+
+        # Only the vehicles that reach or rest on the stop are redone
+        # one at a time.
+        events = np.flatnonzero(self.pinned |
+            (np.abs(self.state[:,1] + dx[:,1]) > self.theta_limit))
+        redone = [pitchStopStep(self._vehicleConstants(i), self.state[i].tolist(),
+                                u[i,0], u[i,1], P.Ts, self.theta_limit,
+                                self.restitution, self.pinned[i])
+                  for i in events]
+        self.state += dx
+        for i, (x, pinned) in zip(events, redone):
+            self.state[i] = x
+            self.pinned[i] = pinned
+
+    def _vehicleConstants(self, i):
+        # Closed form constants of vehicle i as floats
+        return dict((name, value if np.ndim(value) == 0 else float(value[i]))
+                    for name, value in self.k.items())
+
+    def propagateInterval(self, u, duration, t_eval=None, rtol=1e-6, atol=1e-9):
+        # Holds u constant for duration seconds and integrates with the
+        # adaptive Dormand-Prince 5(4) method instead of fixed RK4 steps.
+        # t_eval is an optional list of times in [0,duration], e.g. the
+        # sample times of a plot, where the states are returned by dense
+        # output as a (len(t_eval),N,6) array. The pitch stop is clamped at
+        # the end of the interval.
+        if self.pitch_stop != 'clamp':
+            raise ValueError("propagateInterval only supports pitch_stop='clamp'")
+        u = np.broadcast_to(np.asarray(u, dtype=float), (self.N,2))
+        if self.integrator is None or (self.integrator.rtol, self.integrator.atol) != (rtol, atol):
+            self.integrator = DormandPrince(rtol, atol)
+        self.state[:], X = self.integrator.integrate(
+            lambda x: self.Derivatives(x, u), self.state, duration, t_eval)
+        np.clip(self.state[:,1], -self.theta_limit, self.theta_limit,
+                out=self.state[:,1])
+        return X
+
+    # Return the derivatives of the continuous states of every vehicle.
+    # If out is given, the derivatives are written to it.
+    def Derivatives(self, state, u, out=None):
+        if self.solver == 'linalg':
+            return self._derivativesLinalg(state, u, out)
+
+        xdot = np.empty(state.shape) if out is None else out
+        xdot[:,0:3] = state[:,3:6]
+        xdot[:,3], xdot[:,4], xdot[:,5] = accelerations(self.k,
+            np.cos(state[:,0]), np.sin(state[:,0]),
+            np.cos(state[:,1]), np.sin(state[:,1]),
+            state[:,3], state[:,4], state[:,5], u[:,0], u[:,1])
+        return xdot
+
+    # Same as Derivatives, but solves the mass matrix numerically
+    def _derivativesLinalg(self, state, u, out=None):
+        p = self.p
+        Jx = p['Jx']
+        Jy = p['Jy']
+        Jz = p['Jz']
+        ml2 = p['m1']*p['l1']*p['l1'] + p['m2']*p['l2']*p['l2']
+
+        phidot = state[:,3]
+        thetadot = state[:,4]
+        psidot = state[:,5]
+        fl = u[:,0]
+        fr = u[:,1]
+
+        cp = np.cos(state[:,0])
+        sp = np.sin(state[:,0])
+        ct = np.cos(state[:,1])
+        st = np.sin(state[:,1])
+
+        # The equations of motion, stacked along the first axis.
+        M = np.zeros((state.shape[0],3,3))
+        M[:,0,0] = Jx
+        M[:,0,2] = -Jx*st
+        M[:,1,1] = ml2 + Jy*cp*cp + Jz*sp*sp
+        M[:,1,2] = (Jy - Jz)*sp*cp*ct
+        M[:,2,0] = M[:,0,2]
+        M[:,2,1] = M[:,1,2]
+        M[:,2,2] = (ml2 + Jy*sp*sp + Jz*cp*cp)*ct*ct + Jx*st*st
+
+        rhs = np.empty((state.shape[0],3))
+        rhs[:,0] = p['d']*(fl - fr) \
+            - (-thetadot*thetadot*(Jz - Jy)*sp*cp + phidot*phidot*(Jz - Jy)*sp*cp*ct*ct
+               - thetadot*psidot*ct*(Jx - (Jz - Jy)*(cp*cp - sp*sp)))
+        rhs[:,1] = p['l1']*(fl + fr)*cp \
+            - (phidot*phidot*st*ct*(-Jx + ml2 + Jy*sp*sp + Jz*cp*cp)
+               - 2*phidot*thetadot*(Jz - Jy)*st*ct - phidot*psidot*ct*(-Jx + (Jz - Jy)*(cp*cp - sp*sp))) \
+            - (p['m1']*p['l1'] - p['m2']*p['l2'])*p['g']*ct
+        rhs[:,2] = p['l1']*(fl + fr)*ct*sp + p['d']*(fr - fl)*st \
+            - (thetadot*thetadot*(Jz - Jy)*sp*cp*st - phidot*thetadot*ct*(Jx + (Jz - Jy)*(cp*cp - sp*sp))
+               - 2*phidot*psidot*(Jz - Jy)*ct*ct*sp*cp + 2*thetadot*psidot*st*ct*(Jx - ml2 - Jy*sp*sp - Jz*cp*cp))
+
+        xdot = np.empty(state.shape) if out is None else out
+        xdot[:,0:3] = state[:,3:6]
+        xdot[:,3:6] = np.linalg.solve(M, rhs[:,:,np.newaxis])[:,:,0]
+        return xdot
+
+    # Returns all current states as an (N,6) array
+    def States(self):
+        return self.state
 
 
 class WhirlybirdDynamics:
+    ''' Single vehicle view over a WhirlybirdDynamicsBatch of size one.
+        self.state is a 6x1 matrix that shares memory with the batch.'''
 
-    def __init__(self):
+    def __init__(self, solver='closed_form', pitch_stop='clamp', restitution=0.0,
+                 params=None):
+        # params is an optional dict of scalars that override physical
+        # parameters of param.py, as in WhirlybirdDynamicsBatch.
+        self.batch = WhirlybirdDynamicsBatch(1, params=params, solver=solver,
+            pitch_stop=pitch_stop, restitution=restitution)
 
         # Initial state conditions
-        self.state = np.matrix([[P.phi0],
-                                [P.theta0],
-                                [P.psi0],
-                                [P.phidot0],
-                                [P.thetadot0],
-                                [P.psidot0]])
+        self.state = np.asmatrix(self.batch.state.reshape(6,1))
 
     def propagateDynamics(self,u):
         # P.Ts is the time step between function calls.
         # u contains the force and/or torque input(s).
+        if self.batch.solver != 'closed_form':
+            self.batch.propagateDynamics([u[0],u[1]])
+            return
 
-        # RK4 integration
-        k1 = self.Derivatives(self.state, u)
-        k2 = self.Derivatives(self.state + P.Ts/2*k1, u)
-        k3 = self.Derivatives(self.state + P.Ts/2*k2, u)
-        k4 = self.Derivatives(self.state + P.Ts*k3, u)
-        self.state += P.Ts/6 * (k1 + 2*k2 + 2*k3 + k4)
-        if self.state[1] > P.theta_max*np.pi/180:
-            self.state[1] = P.theta_max*np.pi/180
-        if self.state[1] < -P.theta_max*np.pi/180:
-            self.state[1] = -P.theta_max*np.pi/180
+        # For one vehicle, numpy call overhead dominates, so RK4 is done
+        # on floats and the result is written back to the batch row.
+        batch = self.batch
+        fl = float(u[0])
+        fr = float(u[1])
+        x = batch.state[0].tolist()
+        pinned = batch.pinned[0]
+        if not pinned:
+            x_new = scalarRK4(batch.k, x, fl, fr, P.Ts)
+        if batch.pitch_stop == 'clamp':
+            x_new[1] = min(max(x_new[1], -batch.theta_limit), batch.theta_limit)
+        elif pinned or abs(x_new[1]) > batch.theta_limit:
+            x_new, batch.pinned[0] = pitchStopStep(batch.k, x, fl, fr, P.Ts,
+                batch.theta_limit, batch.restitution, pinned)
+        batch.state[0] = x_new
+
+    def propagateN(self, u_schedule, n_steps, record_every=1, out=None):
+        # Propagates n_steps steps of P.Ts. u_schedule is an (n_steps,2)
+        # array of left and right forces. The state after every
+        # record_every-th step is written to out, an
+        # (n_steps//record_every,6) array that is allocated if not given.
+        # Returns out.
+        u_schedule = np.asarray(u_schedule, dtype=float)
+        if u_schedule.shape != (n_steps,2):
+            raise ValueError('u_schedule must have shape (%d,2)' % n_steps)
+        n_records = n_steps//record_every
+        if out is None:
+            out = np.empty((n_records,6))
+        elif out.shape != (n_records,6):
+            raise ValueError('out must have shape (%d,6)' % n_records)
+
+        batch = self.batch
+        if batch.solver != 'closed_form' or batch.pitch_stop != 'clamp':
+            batch.propagateN(u_schedule, n_steps, record_every, out[:,np.newaxis,:])
+            return out
+
+        # Scalar path. RK4 as in scalarRK4, with the state and the stages
+        # held in float locals, so that no list is built per step. The
+        # state is only written back at the end.
+        k = batch.k
+        limit = batch.theta_limit
+        h = P.Ts
+        h2 = h/2
+        h6 = h/6
+        cos = math.cos
+        sin = math.sin
+        p, t, s, pd, td, sd = batch.state[0].tolist()
+        n_recorded = n_records*record_every
+        fls = u_schedule[:,0].tolist()
+        frs = u_schedule[:,1].tolist()
+        for i in range(n_steps):
+            fl = fls[i]
+            fr = frs[i]
+            a1p, a1t, a1s = accelerations(k, cos(p), sin(p), cos(t), sin(t),
+                                          pd, td, sd, fl, fr)
+            p2 = p + h2*pd
+            t2 = t + h2*td
+            pd2 = pd + h2*a1p
+            td2 = td + h2*a1t
+            sd2 = sd + h2*a1s
+            a2p, a2t, a2s = accelerations(k, cos(p2), sin(p2), cos(t2), sin(t2),
+                                          pd2, td2, sd2, fl, fr)
+            p3 = p + h2*pd2
+            t3 = t + h2*td2
+            pd3 = pd + h2*a2p
+            td3 = td + h2*a2t
+            sd3 = sd + h2*a2s
+            a3p, a3t, a3s = accelerations(k, cos(p3), sin(p3), cos(t3), sin(t3),
+                                          pd3, td3, sd3, fl, fr)
+            p4 = p + h*pd3
+            t4 = t + h*td3
+            pd4 = pd + h*a3p
+            td4 = td + h*a3t
+            sd4 = sd + h*a3s
+            a4p, a4t, a4s = accelerations(k, cos(p4), sin(p4), cos(t4), sin(t4),
+                                          pd4, td4, sd4, fl, fr)
+            p += h6*(pd + 2*pd2 + 2*pd3 + pd4)
+            t += h6*(td + 2*td2 + 2*td3 + td4)
+            s += h6*(sd + 2*sd2 + 2*sd3 + sd4)
+            pd += h6*(a1p + 2*a2p + 2*a3p + a4p)
+            td += h6*(a1t + 2*a2t + 2*a3t + a4t)
+            sd += h6*(a1s + 2*a2s + 2*a3s + a4s)
+            t = min(max(t, -limit), limit)
+            if (i + 1) % record_every == 0 and i < n_recorded:
+                row = out[(i + 1)//record_every - 1]
+                row[0] = p
+                row[1] = t
+                row[2] = s
+                row[3] = pd
+                row[4] = td
+                row[5] = sd
+        batch.state[0] = [p, t, s, pd, td, sd]
+        return out
+
+    def propagateInterval(self, u, duration, t_eval=None, rtol=1e-6, atol=1e-9):
+        # Adaptive step propagation over duration seconds with u held
+        # constant. Returns the states at the times in t_eval as a
+        # (len(t_eval),6) array, or None.
+        X = self.batch.propagateInterval([u[0],u[1]], duration, t_eval, rtol, atol)
+        return None if X is None else X[:,0,:]
 
 
     # Return the derivatives of the continuous states
     def Derivatives(self,state,u):
+        if self.batch.solver == 'closed_form':
+            xdot = scalarDerivatives(self.batch.k, [float(x) for x in np.ravel(state)],
+                                     float(u[0]), float(u[1]))
+            return np.matrix(xdot).T
 
-        # States and forces
-        phi = state.item(0)
-        theta = state.item(1)
-        psi = state.item(2)
-        phidot = state.item(3)
-        thetadot = state.item(4)
-        psidot = state.item(5)
-        fl = u[0]
-        fr = u[1]
-
-        # ctheta and stheta are used multiple times. They are
-        # precomputed and stored in another variable to increase
-        # efficiency.
-        cp = np.cos(phi)
-        sp = np.sin(phi)
-        ct = np.cos(theta)
-        st = np.sin(theta)
-
-        # The equations of motion.
-        M = np.matrix([[P.Jx, 0, -P.Jx*st],
-                       [0, P.m1*P.l1*P.l1+P.m2*P.l2*P.l2+P.Jy*cp*cp+P.Jz*sp*sp, (P.Jy-P.Jz)*sp*cp*ct],
-                       [-P.Jx*st, (P.Jy-P.Jz)*sp*cp*ct, (P.m1*P.l1*P.l1+P.m2*P.l2*P.l2+P.Jy*sp*sp+P.Jz*cp*cp)*ct*ct+P.Jx*st*st]])
-
-        C  = ([[-thetadot*thetadot*(P.Jz - P.Jy)*sp*cp + phidot*phidot*(P.Jz - P.Jy)*sp*cp*ct*ct \
-				- thetadot*psidot*ct*(P.Jx - (P.Jz - P.Jy)*(cp*cp - sp*sp))],
-		        [phidot*phidot*st*ct*(-P.Jx + P.m1*P.l1*P.l1 + P.m2*P.l2*P.l2 + P.Jy*sp*sp + P.Jz*cp*cp) \
-				- 2*phidot*thetadot*(P.Jz - P.Jy)*st*ct - phidot*psidot*ct*(-P.Jx + (P.Jz - P.Jy)*(cp*cp - sp*sp))],
-		        [thetadot*thetadot*(P.Jz - P.Jy)*sp*cp*st - phidot*thetadot*ct*(P.Jx + (P.Jz - P.Jy)*(cp*cp - sp*sp)) \
-				- 2*phidot*psidot*(P.Jz - P.Jy)*ct*ct*sp*cp + 2*thetadot*psidot*st*ct*(P.Jx - P.m1*P.l1*P.l1 - P.m2*P.l2*P.l2 - P.Jy*sp*sp - P.Jz*cp*cp)]])
-
-        dP = np.matrix([[0],
-                        [(P.m1*P.l1-P.m2*P.l2)*P.g*ct],
-                        [0]])
-
-        Q = np.matrix([[P.d*(fl-fr)],
-                        [P.l1*(fl+fr)*cp],
-                        [P.l1*(fl+fr)*ct*sp+P.d*(fr-fl)*st]])
-
-        tmp = np.linalg.inv(M)*(Q - C -dP)
-
-
-        phiddot = tmp.item(0)
-        thetaddot = tmp.item(1)
-        psiddot = tmp.item(2)
-
-        xdot = np.matrix([[phidot],[thetadot],[psidot],[phiddot],[thetaddot],[psiddot]])
-
-        return xdot
+        x = np.asarray(state, dtype=float).reshape(1,6)
+        xdot = self.batch.Derivatives(x, np.array([[u[0],u[1]]], dtype=float))
+        return np.asmatrix(xdot.reshape(6,1))
 
 
     # Returns the observable states
     def Outputs(self):
         # Return them in a list and not a matrix
-        return self.state[0:6].T.tolist()[0]
+        return self.batch.state[0].tolist()
 
     # Returns all current states
     def States(self):
         # Return them in a list and not a matrix
-        return self.state.T.tolist()[0]
+        return self.batch.state[0].tolist()
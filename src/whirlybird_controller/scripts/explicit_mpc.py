@@ -0,0 +1,204 @@
+import io
+import os
+import numpy as np
+from caching import parameterHash, cacheDirectory, writeAtomic
+
+# Bump when the construction changes, so cached laws are not reused
+EXPLICIT_VERSION = 1
+
+# Slack of the region inequalities and of the QP optimality conditions
+_EPS = 1e-9
+
+
+def solveBoxQP(H, q, lo, hi, max_iter=100):
+    # Exact solution of min U'HU/2 + q'U subject to lo <= U <= hi by a
+    # primal active set method. Returns (U, s) with s[i] = -1 where U[i]
+    # is at lo, 1 where it is at hi and 0 where it is free, or (None,
+    # None) if the active set did not settle within max_iter changes.
+    U = np.clip(-np.linalg.solve(H, q), lo, hi)
+    s = np.where(U <= lo, -1, np.where(U >= hi, 1, 0))
+    for it in range(max_iter):
+        free = s == 0
+        U = np.where(s < 0, lo, np.where(s > 0, hi, 0.0))
+        if free.any():
+            fixed = ~free
+            U[free] = -np.linalg.solve(H[np.ix_(free,free)],
+                                       q[free] + H[np.ix_(free,fixed)].dot(U[fixed]))
+        below = free & (U < lo - _EPS)
+        above = free & (U > hi + _EPS)
+        if below.any() or above.any():
+            s[below] = -1
+            s[above] = 1
+            continue
+        # Release the bound whose multiplier has the wrong sign the most
+        g = H.dot(U) + q
+        wrong = np.where(s < 0, -g, np.where(s > 0, g, 0.0))
+        i = np.argmax(wrong)
+        if wrong[i] <= _EPS:
+            return U, s
+        s[i] = 0
+    return None, None
+
+
+def activeSetRegion(H, F, lo, hi, s):
+    # Region {x: G*x <= w} of the states whose QP optimum has the active
+    # set s, and the first input there, u0 = k*x + k0. The optimum of
+    # min U'HU/2 + (F*x)'U subject to lo <= U <= hi is affine in x for a
+    # fixed active set; the region is where its free inputs are within
+    # their bounds and the multipliers of its active bounds have the
+    # right sign.
+    free = s == 0
+    fixed = ~free
+    b = np.where(s < 0, lo, hi)[fixed]
+    n = F.shape[1]
+    M = np.zeros((len(s), n))
+    m = np.zeros(len(s))
+    m[fixed] = b
+    if free.any():
+        Hff = H[np.ix_(free,free)]
+        M[free] = -np.linalg.solve(Hff, F[free])
+        m[free] = -np.linalg.solve(Hff, H[np.ix_(free,fixed)].dot(b))
+    # Gradient of the cost, the multipliers on the active bounds
+    Lam = H.dot(M) + F
+    lam = H.dot(m)
+    rows = [M[free], -M[free], -Lam[s < 0], Lam[s > 0]]
+    rhs = [hi[free] - m[free], m[free] - lo[free], lam[s < 0], -lam[s > 0]]
+    return np.vstack(rows), np.concatenate(rhs), M[0], m[0]
+
+
+class ExplicitMPC:
+    ''' Explicit form of a single input MPC with input bounds: the
+        piecewise affine law u0(x) over the polytopic regions of the
+        active sets of its condensed QP
+            min U'HU/2 + (F*x)'U  subject to lo <= U <= hi
+        Region r is G[start[r]:start[r+1]]*x <= w[start[r]:start[r+1]],
+        where u0 = k[r]*x + k0[r].
+
+        Regions are searched through a uniform grid of cells over the
+        state box domain: each cell lists the regions met by the
+        construction samples in it and in its neighbours. A state that is
+        in none of them is looked up in all regions, and a state that is
+        in no region (outside the explored domain) is solved online.'''
+
+    def __init__(self, data):
+        # data is the dict of arrays made by build or loaded from disk
+        for name, value in data.items():
+            setattr(self, name, value)
+        self.cells = [int(c) for c in self.cells]
+        self._scale = (np.array(self.cells) - 1e-9)/(self.domain_hi - self.domain_lo)
+        self._stride = np.cumprod([1] + self.cells[:0:-1])[::-1]
+        self._n_regions = len(self.k0)
+        self._G = [self.G[self.start[r]:self.start[r+1]] for r in range(self._n_regions)]
+        self._w = [self.w[self.start[r]:self.start[r+1]] for r in range(self._n_regions)]
+        self._k = [self.k[r] for r in range(self._n_regions)]
+        self._candidates = [self.cell_regions[self.cell_start[c]:self.cell_start[c+1]].tolist()
+                            for c in range(len(self.cell_start) - 1)]
+        self.misses = 0
+
+    def region(self, x):
+        # Index of the region containing x, or -1
+        x = np.asarray(x, dtype=float)
+        c = np.floor((x - self.domain_lo)*self._scale).astype(int)
+        c = np.minimum(np.maximum(c, 0), np.array(self.cells) - 1)
+        candidates = self._candidates[int(c.dot(self._stride))]
+        for r in candidates:
+            if (self._G[r].dot(x) <= self._w[r]).all():
+                return r
+        for r in range(self._n_regions):
+            if (self._G[r].dot(x) <= self._w[r]).all():
+                return r
+        return -1
+
+    def control(self, x):
+        # First input of the MPC at the state x
+        r = self.region(x)
+        if r >= 0:
+            return float(self._k[r].dot(x) + self.k0[r])
+        self.misses += 1
+        U, s = solveBoxQP(self.H, self.F.dot(x), self.lo, self.hi)
+        return float(U[0])
+
+
+def build(H, F, lo, hi, domain_lo, domain_hi, samples=25, cells=12):
+    # Data of an ExplicitMPC. The active sets are found by solving the QP
+    # on a uniform grid of samples per axis over the state box
+    # [domain_lo, domain_hi]; each new active set becomes a region.
+    H = np.asarray(H, dtype=float)
+    F = np.asarray(F, dtype=float)
+    lo = np.resize(np.asarray(lo, dtype=float), H.shape[0])
+    hi = np.resize(np.asarray(hi, dtype=float), H.shape[0])
+    domain_lo = np.asarray(domain_lo, dtype=float)
+    domain_hi = np.asarray(domain_hi, dtype=float)
+    n = F.shape[1]
+    cells = np.resize(np.asarray(cells, dtype=int), n)
+
+    axes = [np.linspace(a, b, samples) for a, b in zip(domain_lo, domain_hi)]
+    points = np.array(np.meshgrid(*axes, indexing='ij')).reshape(n, -1).T
+    scale = (cells - 1e-9)/(domain_hi - domain_lo)
+    stride = np.cumprod(np.append(1, cells[:0:-1]))[::-1]
+
+    index = {}
+    G, w, start, k, k0 = [], [], [0], [], []
+    counts = [dict() for c in range(int(np.prod(cells)))]
+    for x in points:
+        U, s = solveBoxQP(H, F.dot(x), lo, hi)
+        if U is None:
+            continue
+        key = s.tobytes()
+        r = index.get(key)
+        if r is None:
+            r = index[key] = len(k0)
+            Gr, wr, kr, k0r = activeSetRegion(H, F, lo, hi, s)
+            G.append(Gr)
+            w.append(wr + _EPS)
+            start.append(start[-1] + len(wr))
+            k.append(kr)
+            k0.append(k0r)
+        c = np.minimum(np.floor((x - domain_lo)*scale).astype(int), cells - 1)
+        cell = counts[int(c.dot(stride))]
+        cell[r] = cell.get(r, 0) + 1
+
+    # Candidates of a cell: its own regions, most frequent first, then
+    # those of the neighbouring cells, which catch regions that meet the
+    # cell between samples
+    cell_regions = []
+    cell_start = [0]
+    offsets = np.array(np.meshgrid(*[[-1,0,1]]*n, indexing='ij')).reshape(n, -1).T
+    for i, cell in enumerate(counts):
+        own = sorted(cell, key=lambda r: -cell[r])
+        c = np.array(np.unravel_index(i, cells))
+        near = set()
+        for o in offsets:
+            j = c + o
+            if (j >= 0).all() and (j < cells).all():
+                near.update(counts[int(j.dot(stride))])
+        cell_regions += own + sorted(near.difference(own))
+        cell_start.append(len(cell_regions))
+    return {'G': np.vstack(G), 'w': np.concatenate(w), 'start': np.array(start),
+            'k': np.array(k), 'k0': np.array(k0),
+            'cell_regions': np.array(cell_regions, dtype=int),
+            'cell_start': np.array(cell_start), 'cells': cells,
+            'domain_lo': domain_lo, 'domain_hi': domain_hi,
+            'H': H, 'F': F, 'lo': lo, 'hi': hi}
+
+
+def explicitMPC(A, B, Q, R, N, Ts, u_min, u_max, domain_lo, domain_hi,
+                samples=25, cells=12):
+    # ExplicitMPC of the CondensedMPC of the single input model A, B
+    # with the weights Q, R and the input bounds, over the state box
+    # [domain_lo, domain_hi]. It is built once per design and then
+    # loaded from the disk cache, which only needs numpy.
+    key = parameterHash(EXPLICIT_VERSION, A, B, Q, R, N, float(Ts), u_min, u_max,
+                        domain_lo, domain_hi, samples, cells)
+    path = os.path.join(cacheDirectory('explicit_mpc'), '%s.npz' % key)
+    if os.path.exists(path):
+        with np.load(path) as f:
+            data = dict((name, f[name]) for name in f.files)
+    else:
+        from mpc import CondensedMPC
+        qp = CondensedMPC(A, B, Q, R, N, Ts, u_min, u_max)
+        data = build(qp.H, qp.F, u_min, u_max, domain_lo, domain_hi, samples, cells)
+        buf = io.BytesIO()
+        np.savez(buf, **data)
+        writeAtomic(path, buf.getvalue())
+    return ExplicitMPC(data)
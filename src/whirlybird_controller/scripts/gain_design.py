@@ -0,0 +1,142 @@
+import multiprocessing
+import numpy as np
+from caching import LRUCache
+
+# Pole placement and LQR design for the lon and lat models without
+# python-control. scipy is imported by the functions that need it, so
+# that importing this module is cheap.
+
+
+def augmented(A, B, Cr):
+    # Model augmented with the integrator of the tracking error of Cr*x:
+    #   A1 = [[A, 0], [-Cr, 0]], B1 = [[B], [0]]
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    Cr = np.asarray(Cr, dtype=float)
+    n = A.shape[0]
+    m = Cr.shape[0]
+    A1 = np.zeros((n+m,n+m))
+    A1[:n,:n] = A
+    A1[n:,:n] = -Cr
+    B1 = np.zeros((n+m,B.shape[1]))
+    B1[:n,:] = B
+    return A1, B1
+
+
+def stateFeedback(A, B, Cr, poles):
+    # Gains K (1 x n) and ki of u = -K*x - ki*integrator that place the
+    # poles of the integrator augmented model. Raises ValueError if the
+    # augmented model is not controllable.
+    from scipy.signal import place_poles
+    A1, B1 = augmented(A, B, Cr)
+    n = A1.shape[0]
+    ctrb = np.hstack([np.linalg.matrix_power(A1, i).dot(B1) for i in range(n)])
+    if np.linalg.matrix_rank(ctrb) != n:
+        raise ValueError('the augmented model is not controllable')
+    K1 = place_poles(A1, B1, poles).gain_matrix
+    n_x = np.shape(A)[0]
+    return K1[:,0:n_x], float(K1[0,n_x])
+
+
+def observer(A, C, poles):
+    # Observer gain L that places the poles of A - L*C. Raises ValueError
+    # if the model is not observable.
+    from scipy.signal import place_poles
+    A = np.asarray(A, dtype=float)
+    C = np.asarray(C, dtype=float)
+    n = A.shape[0]
+    obsv = np.vstack([C.dot(np.linalg.matrix_power(A, i)) for i in range(n)])
+    if np.linalg.matrix_rank(obsv) != n:
+        raise ValueError('the model is not observable')
+    return place_poles(A.T, C.T, poles).gain_matrix.T
+
+
+# Riccati solutions by (A, B, Q, R, Ts). Tuning sessions design many
+# times over the same models and weights.
+_riccati = LRUCache(maxsize=1024)
+
+
+def _riccatiKey(A, B, Q, R, Ts):
+    # Arrays as contiguous float matrices, and their cache key
+    A, B, Q, R = [np.ascontiguousarray(np.atleast_2d(M), dtype=float)
+                  for M in (A, B, Q, R)]
+    key = tuple((M.shape, M.tobytes()) for M in (A, B, Q, R))
+    return (A, B, Q, R), key + (None if Ts is None else float(Ts),)
+
+
+def riccati(A, B, Q, R, Ts=None):
+    # Stabilizing solution X of the continuous algebraic Riccati equation
+    # of xdot = A*x + B*u, or with the sample time Ts of the discrete
+    # equation of its zero order hold discretization. Solutions are
+    # memoized and returned read-only.
+    (A, B, Q, R), key = _riccatiKey(A, B, Q, R, Ts)
+    X = _riccati.get(key)
+    if X is None:
+        from scipy.linalg import solve_continuous_are, solve_discrete_are
+        if Ts is None:
+            X = solve_continuous_are(A, B, Q, R)
+        else:
+            from linear_dynamics import zohDiscretize
+            Ad, Bd = zohDiscretize(A, B, Ts)
+            X = solve_discrete_are(Ad, Bd, Q, R)
+        X.setflags(write=False)
+        _riccati.put(key, X)
+    return X
+
+
+def lqr(A, B, Q, R, Ts=None):
+    # Gain K of u = -K*x that minimizes the integral of x'Qx + u'Ru, or
+    # with the sample time Ts the sum over the zero order hold
+    # discretization
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    R = np.atleast_2d(np.asarray(R, dtype=float))
+    X = riccati(A, B, Q, R, Ts)
+    if Ts is None:
+        return np.linalg.solve(R, B.T.dot(X))
+    from linear_dynamics import zohDiscretize
+    Ad, Bd = zohDiscretize(A, B, Ts)
+    BX = Bd.T.dot(X)
+    return np.linalg.solve(R + BX.dot(Bd), BX.dot(Ad))
+
+
+def lqi(A, B, Cr, Q, R, Ts=None):
+    # LQR of the integrator augmented model. Q weights the states and
+    # the integrator, in that order. Returns (K, ki) like stateFeedback.
+    A1, B1 = augmented(A, B, Cr)
+    K1 = lqr(A1, B1, Q, R, Ts)
+    n_x = np.shape(A)[0]
+    return K1[:,0:n_x], float(K1[0,n_x])
+
+
+def _riccatiJob(args):
+    # Pool worker. Module level so it can be pickled.
+    return riccati(*args)
+
+
+def lqiGrid(A, B, Cr, Qs, Rs, Ts=None, processes=None):
+    # lqi designs for every pair of the weights Qs and Rs, in the order
+    # [(Q0,R0), (Q0,R1), ..., (Q1,R0), ...]. The Riccati equations not
+    # solved before are spread over a process pool (processes=1 solves
+    # them in this process) and added to the memo, so repeated pairs
+    # and later grids over the same weights are not solved again.
+    A1, B1 = augmented(A, B, Cr)
+    jobs = {}
+    for Q in Qs:
+        for R in Rs:
+            args, key = _riccatiKey(A1, B1, Q, R, Ts)
+            if key not in jobs and _riccati.get(key) is None:
+                jobs[key] = args + (Ts,)
+    if processes == 1 or len(jobs) < 2:
+        solutions = [_riccatiJob(args) for args in jobs.values()]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            solutions = pool.map(_riccatiJob, list(jobs.values()))
+        finally:
+            pool.close()
+            pool.join()
+    for key, X in zip(jobs.keys(), solutions):
+        X.setflags(write=False)
+        _riccati.put(key, X)
+    return [lqi(A, B, Cr, Q, R, Ts) for Q in Qs for R in Rs]
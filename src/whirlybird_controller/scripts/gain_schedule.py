@@ -0,0 +1,154 @@
+import io
+import multiprocessing
+import os
+import numpy as np
+from caching import parameterHash, cacheDirectory, writeAtomic
+from dynamics import physicalParameters
+from gain_design import stateFeedback, observer
+from linear_dynamics import discreteObserver
+from linearize import lonLatModels
+from trim import trim, labParameters
+
+# Bump when the design changes, so cached tables are not reused
+SCHEDULE_VERSION = 3
+
+# Layout of one row of the table: name, shape
+LAYOUT = (('K_lon', (1,2)), ('ki_lon', ()), ('K_lat', (1,4)), ('ki_lat', ()),
+          ('L_lon', (2,1)), ('L_lat', (4,2)), ('F_trim', ()))
+
+_schedules = {}
+
+
+def designSpec(P, params=None):
+    # Everything the design at one pitch depends on, taken from the param
+    # module P: the physical parameters, the pole locations, the output
+    # matrices and, if P designs an observer, its poles. params optionally
+    # overrides physical parameters of P.
+    p = labParameters(P)
+    p.update(params or {})
+    spec = {'params': physicalParameters(p),
+            'des_poles_lon': np.asarray(P.des_poles_lon),
+            'des_poles_lat': np.asarray(P.des_poles_lat),
+            'C_lon': np.asarray(P.C_lon, dtype=float),
+            'C_lat': np.asarray(P.C_lat, dtype=float),
+            'Cr_lat': np.asarray(getattr(P,'Cr_lat',P.C_lat), dtype=float)}
+    if hasattr(P,'obs_des_poles_lon'):
+        spec['obs_des_poles_lon'] = np.asarray(P.obs_des_poles_lon)
+        spec['obs_des_poles_lat'] = np.asarray(P.obs_des_poles_lat)
+    return spec
+
+
+def designAt(theta, spec):
+    # Gains of the lon and lat controllers, and observers, designed on the
+    # linearization of the full model at level trim with pitch theta.
+    # Returns one row of the table in the order of LAYOUT. Observer gains
+    # are zero if spec has no observer poles.
+    p = spec['params']
+    fl, fr, phi = trim(theta, params=p)
+    x = [0.0, theta, 0.0, 0.0, 0.0, 0.0]
+    A_lon, B_lon, A_lat, B_lat = lonLatModels(x, [fl, fr], params=p)
+    K_lon, ki_lon = stateFeedback(A_lon, B_lon, spec['C_lon'], spec['des_poles_lon'])
+    K_lat, ki_lat = stateFeedback(A_lat, B_lat, spec['Cr_lat'], spec['des_poles_lat'])
+    L_lon = np.zeros((2,1))
+    L_lat = np.zeros((4,2))
+    if 'obs_des_poles_lon' in spec:
+        L_lon = observer(A_lon, spec['C_lon'], spec['obs_des_poles_lon'])
+        L_lat = observer(A_lat, spec['C_lat'], spec['obs_des_poles_lat'])
+    return np.hstack((np.ravel(K_lon), ki_lon, np.ravel(K_lat), ki_lat,
+                      np.ravel(L_lon), np.ravel(L_lat), fl + fr))
+
+
+def _designRow(args):
+    # Pool worker. Module level so it can be pickled.
+    return designAt(*args)
+
+
+class GainSchedule:
+    ''' Controller and observer gains designed on a uniform pitch grid.
+        The table has one row per grid point in the order of LAYOUT. A
+        lookup finds the two neighbouring rows from the pitch directly
+        and interpolates linearly between them.'''
+
+    def __init__(self, theta, table):
+        self.theta = np.asarray(theta, dtype=float)
+        self.table = np.asarray(table, dtype=float)
+        self._theta_min = float(self.theta[0])
+        self._inv_step = (len(self.theta) - 1)/float(self.theta[-1] - self.theta[0])
+        self._last = len(self.theta) - 1
+        self._row = np.empty(self.table.shape[1])
+
+        # Views of one row by name, shaped as in LAYOUT
+        self.views = {}
+        start = 0
+        for name, shape in LAYOUT:
+            size = int(np.prod(shape))
+            view = self._row[start:start+size]
+            self.views[name] = view.reshape(shape) if shape else view
+            start += size
+
+    def lookup(self, theta):
+        # Interpolated row at pitch theta. Pitches outside the grid use the
+        # nearest end of the table. Returns a dict that maps the names of
+        # LAYOUT to views of an internal buffer, which the next lookup
+        # overwrites. Scalars are 1 element arrays.
+        s = (theta - self._theta_min)*self._inv_step
+        if s <= 0.0:
+            self._row[:] = self.table[0]
+        elif s >= self._last:
+            self._row[:] = self.table[self._last]
+        else:
+            i = int(s)
+            w = s - i
+            np.multiply(self.table[i], 1.0 - w, out=self._row)
+            self._row += w*self.table[i+1]
+        return self.views
+
+
+def gainSchedule(P, num=29, processes=None, params=None):
+    # GainSchedule over num pitches spanning +-theta_max of the param
+    # module P. The grid points are designed in parallel on a process pool
+    # (processes=1 designs in this process). The table is cached on disk
+    # under a hash of the design inputs, and in memory.
+    spec = designSpec(P, params)
+    theta_max = getattr(P,'theta_max',70.0)*np.pi/180
+    theta = np.linspace(-theta_max, theta_max, num)
+    key = parameterHash(SCHEDULE_VERSION, spec, theta)
+    schedule = _schedules.get(key)
+    if schedule is not None:
+        return schedule
+
+    path = os.path.join(cacheDirectory('gain_schedule'), '%s.npy' % key)
+    if os.path.exists(path):
+        table = np.load(path)
+    else:
+        jobs = [(th, spec) for th in theta]
+        if processes == 1:
+            table = np.array([_designRow(job) for job in jobs])
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                table = np.array(pool.map(_designRow, jobs))
+            finally:
+                pool.close()
+                pool.join()
+        data = io.BytesIO()
+        np.save(data, table)
+        writeAtomic(path, data.getvalue())
+    schedule = _schedules[key] = GainSchedule(theta, table)
+    return schedule
+
+
+def scheduledObservers(P, theta, L_lon, L_lat, params=None):
+    # Exact discrete lon and lat observers, as discreteObserver, of the
+    # full model linearized at level trim with pitch theta, with the
+    # observer gains L_lon and L_lat, e.g. from GainSchedule.lookup.
+    # The lon operating point is [theta, 0] and the trim force. Returns
+    # ((M_lon, c_lon), (M_lat, c_lat)).
+    p = labParameters(P)
+    p.update(params or {})
+    p = physicalParameters(p)
+    fl, fr, phi = trim(theta, params=p)
+    x = [0.0, theta, 0.0, 0.0, 0.0, 0.0]
+    A_lon, B_lon, A_lat, B_lat = lonLatModels(x, [fl, fr], params=p)
+    return (discreteObserver(A_lon, B_lon, P.C_lon, L_lon, [theta, 0.0], fl + fr, P.Ts),
+            discreteObserver(A_lat, B_lat, P.C_lat, L_lat, P.x0_lat, p['d']*(fl - fr), P.Ts))
@@ -0,0 +1,70 @@
+import io
+import os
+import numpy as np
+from caching import parameterHash, cacheDirectory, writeAtomic
+
+# Bump when the design changes, so stored gains are not reused
+STORE_VERSION = 1
+
+# Designed gains of the state space controllers, stored on disk under a
+# hash of everything the design depends on. Loading stored gains only
+# needs numpy; the design, and with it scipy, only runs when an input
+# changes.
+
+
+def ssDesignInputs(P, observer=None):
+    # Design inputs of the param module P, or of a namespace with the
+    # same names: the lon and lat models, the output matrices and the
+    # desired poles. The models already hold the physical parameters.
+    # With observer=None the observer inputs are taken if P has
+    # observer poles.
+    if observer is None:
+        observer = hasattr(P,'obs_des_poles_lon')
+    inputs = {'A_lon': P.A_lon, 'B_lon': P.B_lon, 'C_lon': P.C_lon,
+              'A_lat': P.A_lat, 'B_lat': P.B_lat,
+              'Cr_lat': getattr(P,'Cr_lat',P.C_lat),
+              'des_poles_lon': P.des_poles_lon,
+              'des_poles_lat': P.des_poles_lat}
+    if observer:
+        inputs['C_lat'] = P.C_lat
+        inputs['obs_des_poles_lon'] = P.obs_des_poles_lon
+        inputs['obs_des_poles_lat'] = P.obs_des_poles_lat
+    return dict((name, np.asarray(value)) for name, value in inputs.items())
+
+
+def designSSGains(inputs):
+    # K_lon, ki_lon, K_lat, ki_lat and, if inputs has observer poles,
+    # L_lon and L_lat for the inputs of ssDesignInputs
+    from gain_design import stateFeedback, observer
+    v = inputs
+    gains = {}
+    gains['K_lon'], gains['ki_lon'] = stateFeedback(v['A_lon'], v['B_lon'], v['C_lon'],
+                                                    v['des_poles_lon'])
+    gains['K_lat'], gains['ki_lat'] = stateFeedback(v['A_lat'], v['B_lat'], v['Cr_lat'],
+                                                    v['des_poles_lat'])
+    if 'obs_des_poles_lon' in v:
+        gains['L_lon'] = observer(v['A_lon'], v['C_lon'], v['obs_des_poles_lon'])
+        gains['L_lat'] = observer(v['A_lat'], v['C_lat'], v['obs_des_poles_lat'])
+    return gains
+
+
+def storedGains(inputs, design=designSSGains, name='ss'):
+    # Gains design(inputs) from the store, designed and stored first if
+    # there are none for these inputs. Returns a dict of arrays, with
+    # the K and L gains as matrices and ki as floats like param.py.
+    key = parameterHash(STORE_VERSION, name, inputs)
+    path = os.path.join(cacheDirectory('gains'), '%s_%s.npz' % (name, key))
+    if os.path.exists(path):
+        with np.load(path) as data:
+            gains = dict((k, data[k]) for k in data.files)
+    else:
+        gains = design(inputs)
+        data = io.BytesIO()
+        np.savez(data, **gains)
+        writeAtomic(path, data.getvalue())
+    for k in gains:
+        if k.startswith('ki'):
+            gains[k] = float(gains[k])
+        else:
+            gains[k] = np.matrix(gains[k])
+    return gains
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Dormand-Prince 5(4) Butcher tableau. The 7th stage is evaluated at the
+# new state, so it is reused as the first stage of the next step (FSAL).
+DP_C = np.array([0.0, 1.0/5, 3.0/10, 4.0/5, 8.0/9, 1.0, 1.0])
+DP_A = [[],
+        [1.0/5],
+        [3.0/40, 9.0/40],
+        [44.0/45, -56.0/15, 32.0/9],
+        [19372.0/6561, -25360.0/2187, 64448.0/6561, -212.0/729],
+        [9017.0/3168, -355.0/33, 46732.0/5247, 49.0/176, -5103.0/18656],
+        [35.0/384, 0.0, 500.0/1113, 125.0/192, -2187.0/6784, 11.0/84]]
+
+# 5th order weights and the difference to the embedded 4th order weights
+DP_B = np.array([35.0/384, 0.0, 500.0/1113, 125.0/192, -2187.0/6784, 11.0/84, 0.0])
+DP_E = np.array([71.0/57600, 0.0, -71.0/16695, 71.0/1920, -17253.0/339200,
+                 22.0/525, -1.0/40])
+
+# Dense output (4th order continuous extension). The weights at the
+# fraction s of a step are DP_P.dot([s, s**2, s**3, s**4]).
+DP_P = np.array([
+    [1.0, -8048581381.0/2820520608, 8663915743.0/2820520608, -12715105075.0/11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200.0/32700410799, -68118460800.0/10900136933, 87487479700.0/32700410799],
+    [0.0, -1754552775.0/470086768, 14199869525.0/1410260304, -10690763975.0/1880347072],
+    [0.0, 127303824393.0/49829197408, -318862633887.0/49829197408, 701980252875.0/199316789632],
+    [0.0, -282668133.0/205662961, 2019193451.0/616988883, -1453857185.0/822651844],
+    [0.0, 40617522.0/29380423, -110615467.0/29380423, 69997945.0/29380423]])
+
+
+class DormandPrince:
+    ''' Embedded Runge-Kutta 5(4) integrator with step size control and
+        dense output. The step size is kept between calls to integrate,
+        so a simulation that calls it once per controller sample does not
+        restart from a small step every time.'''
+
+    def __init__(self, rtol=1e-6, atol=1e-9, h_max=np.inf):
+        self.rtol = rtol      # Relative error tolerance
+        self.atol = atol      # Absolute error tolerance
+        self.h_max = h_max    # Largest allowed step, s
+        self.h = None         # Last accepted step, s
+        self.nfev = 0         # Number of derivative evaluations
+        self.naccept = 0      # Number of accepted steps
+        self.nreject = 0      # Number of rejected steps
+
+    def integrate(self, f, x0, duration, t_eval=None):
+        # Integrates dx/dt = f(x) from 0 to duration starting at x0.
+        # t_eval is an optional increasing list of times in [0,duration]
+        # where the state is wanted. Returns the final state and an array
+        # with one state per entry of t_eval (None if t_eval is None).
+        x = np.array(x0, dtype=float)
+        t_eval = [] if t_eval is None else list(t_eval)
+        X = np.empty((len(t_eval),) + x.shape) if t_eval else None
+        i_eval = 0
+        while i_eval < len(t_eval) and t_eval[i_eval] <= 0.0:
+            X[i_eval] = x
+            i_eval += 1
+
+        K = np.empty((7,) + x.shape)
+        K[0] = f(x)
+        self.nfev += 1
+        h = self.h if self.h is not None else self._initialStep(x, K[0], duration)
+        t = 0.0
+        while t < duration:
+            h = min(h, self.h_max)
+            last = t + h >= duration
+            if last:
+                h = duration - t
+
+            # Stages
+            for s in range(1,7):
+                dx = DP_A[s][0]*K[0]
+                for j in range(1,s):
+                    dx = dx + DP_A[s][j]*K[j]
+                K[s] = f(x + h*dx)
+            self.nfev += 6
+            x_new = x + h*np.tensordot(DP_B, K, axes=1)
+
+            # Error control on the scaled RMS norm
+            scale = self.atol + self.rtol*np.maximum(np.abs(x), np.abs(x_new))
+            err = np.sqrt(np.mean((h*np.tensordot(DP_E, K, axes=1)/scale)**2))
+            factor = 10.0 if err == 0.0 else min(10.0, max(0.2, 0.9*err**-0.2))
+            if err > 1.0:
+                self.nreject += 1
+                h = h*factor
+                continue
+            self.naccept += 1
+
+            # Dense output at the requested times inside this step
+            while i_eval < len(t_eval) and t_eval[i_eval] <= t + h:
+                s = (t_eval[i_eval] - t)/h
+                b = DP_P.dot([s, s*s, s*s*s, s*s*s*s])
+                X[i_eval] = x + h*np.tensordot(b, K, axes=1)
+                i_eval += 1
+
+            t = duration if last else t + h
+            x = x_new
+            K[0] = K[6]
+            # Keep the step found by the controller, not the one shortened
+            # to land on duration, for the next call.
+            if not last or factor < 1.0:
+                self.h = h*factor
+            h = h*factor
+
+        while i_eval < len(t_eval):
+            X[i_eval] = x
+            i_eval += 1
+        return x, X
+
+    def _initialStep(self, x, xdot, duration):
+        # Step that moves the scaled state by roughly 1 percent.
+        scale = self.atol + self.rtol*np.abs(x)
+        d0 = np.sqrt(np.mean((x/scale)**2))
+        d1 = np.sqrt(np.mean((xdot/scale)**2))
+        h = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01*d0/d1
+        return min(h, duration, self.h_max)
+
+
+def rk4Step(f, x, h):
+    # One classical Runge-Kutta step of dx/dt = f(x)
+    k1 = f(x)
+    k2 = f(x + h/2*k1)
+    k3 = f(x + h/2*k2)
+    k4 = f(x + h*k3)
+    return x + h/6 * (k1 + 2*k2 + 2*k3 + k4)
@@ -74,3 +74,7 @@ p_kd = 2*p_zeta*p_wn/c0
 p_ki = 0.00
 print ('kp phi', p_kp)
 print ('kd phi', p_kd)
+
+# The inner phi loop is 10 times faster than the outer psi loop, so the
+# psi loop only runs every s_divisor-th sample
+s_divisor = 10
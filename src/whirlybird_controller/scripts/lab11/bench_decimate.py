@@ -0,0 +1,50 @@
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import param as P
+from sim_plot import plotGenerator
+
+# Drawing the lab11 plots of an hour long run logged every Ts, about a
+# million samples per line, with every sample and with the decimated
+# views. Spikes of the force plot stand in for saturation; the check is
+# that each has a peak drawn within a pixel column of it. The plots are
+# drawn off screen.
+t_end = 3600.0      # Run length, s
+n_spikes = 20       # Force spikes
+redraws = 10        # Redraws timed, evenly over the last minute
+timer = getattr(time, 'perf_counter', time.time)
+
+n = int(t_end/P.Ts)
+rng = np.random.RandomState(0)
+t = np.arange(n)*P.Ts
+theta = 0.2*np.sin(0.05*t) + 0.01*rng.randn(n)
+force = 0.3 + 0.02*rng.randn(n)
+spikes = np.sort(rng.choice(n, n_spikes, replace=False))
+force[spikes] = 1.0
+
+for decimate in (None, 'minmax', 'lttb'):
+    plotGen = plotGenerator(decimate=decimate)
+    start = timer()
+    for i in range(n - 60*int(1/P.Ts)):
+        plotGen.updateDataHistory(t[i], [[0.0, theta[i]], [theta[i]], [theta[i]], [force[i]]])
+    append = timer() - start
+    update = []
+    draw = []
+    for i in range(i + 1, n):
+        plotGen.updateDataHistory(t[i], [[0.0, theta[i]], [theta[i]], [theta[i]], [force[i]]])
+        if (n - 1 - i) % (60*int(1/P.Ts)//redraws) == 0:
+            start = timer()
+            plotGen.update_plots()
+            update.append(timer() - start)
+            start = timer()
+            plotGen.fig.canvas.draw()
+            draw.append(timer() - start)
+    x, y = plotGen.handle[3].line[0].get_data()
+    column = t_end/plotGen.handle[3].ax.get_window_extent().width
+    peaks = x[y == 1.0]
+    shown = sum(np.abs(peaks - s).min() <= column for s in t[spikes])
+    print('%-7s %d samples, %d points drawn per line, %d of %d spikes drawn'
+          % (decimate, n, len(x), shown, n_spikes))
+    print('        append %.1f us/sample, update_plots ms p50 %.1f, draw ms p50 %.1f'
+          % (1e6*append/i, 1000*np.median(update), 1000*np.median(draw)))
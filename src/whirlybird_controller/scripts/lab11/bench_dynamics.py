@@ -0,0 +1,58 @@
+import sys
+import timeit
+import numpy as np
+import param as P
+
+# The dynamics file is kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from dynamics import WhirlybirdDynamics, WhirlybirdDynamicsBatch
+
+tolerance = 1e-12   # Max allowed difference between the solvers
+num_states = 10000  # Number of random states to compare
+num_steps = 2000    # Number of steps for the timing runs
+
+# Random states inside the flight envelope and random inputs
+rng = np.random.RandomState(0)
+theta_lim = P.theta_max*np.pi/180
+states = np.column_stack((rng.uniform(-np.pi/2,np.pi/2,num_states),
+                          rng.uniform(-theta_lim,theta_lim,num_states),
+                          rng.uniform(-np.pi,np.pi,num_states),
+                          rng.uniform(-3,3,(num_states,3))))
+u = rng.uniform(0,P.km,(num_states,2))
+
+# Accelerations of both solvers must agree
+closed = WhirlybirdDynamicsBatch(num_states, solver='closed_form')
+linalg = WhirlybirdDynamicsBatch(num_states, solver='linalg')
+error = np.abs(closed.Derivatives(states,u) - linalg.Derivatives(states,u)).max()
+print('max |closed_form - linalg| = %g' % error)
+assert error < tolerance, 'closed form accelerations differ from np.linalg'
+
+# The scalar path of the single vehicle class must agree as well
+single = WhirlybirdDynamics(solver='closed_form')
+for i in range(100):
+    xdot = single.Derivatives(np.matrix(states[i]).T, u[i])
+    assert np.abs(xdot.A1 - linalg.Derivatives(states[i:i+1],u[i:i+1])[0]).max() < tolerance
+
+# Time single vehicle propagation with both solvers
+for solver in ['linalg','closed_form']:
+    dynam = WhirlybirdDynamics(solver=solver)
+    t = timeit.timeit(lambda: dynam.propagateDynamics([0.3,0.3]), number=num_steps)
+    print('%-12s single vehicle: %7.1f us/step' % (solver, 1e6*t/num_steps))
+
+# Time batched propagation with both solvers
+for solver in ['linalg','closed_form']:
+    batch = WhirlybirdDynamicsBatch(1000, solver=solver)
+    t = timeit.timeit(lambda: batch.propagateDynamics([0.3,0.3]), number=num_steps//10)
+    print('%-12s 1000 vehicles:  %7.1f us/vehicle-step' % (solver, 1e6*t/(num_steps//10)/1000))
+
+# Pitch stop handling, away from the stop and resting on it
+F_up = 0.65*P.F0   # Enough force to drive pitch into the stop
+for pitch_stop in ['clamp','event']:
+    dynam = WhirlybirdDynamics(pitch_stop=pitch_stop)
+    t_free = timeit.timeit(lambda: dynam.propagateDynamics([P.F0/2,P.F0/2]), number=num_steps)
+    for i in range(1000):
+        dynam.propagateDynamics([F_up,F_up])
+    t_stop = timeit.timeit(lambda: dynam.propagateDynamics([F_up,F_up]), number=num_steps)
+    print('%-12s pitch stop: %7.1f us/step free, %7.1f us/step on the stop, thetadot %.3f'
+          % (pitch_stop, 1e6*t_free/num_steps, 1e6*t_stop/num_steps, dynam.States()[4]))
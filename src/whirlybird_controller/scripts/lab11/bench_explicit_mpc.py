@@ -0,0 +1,64 @@
+import sys
+import time
+import numpy as np
+import param as P
+from signal_generator import Signals
+from controllerSS import controllerSS
+
+# The dynamics files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from explicit_mpc import explicitMPC, solveBoxQP
+from uncertainty import closedLoopRun
+
+# Explicit MPC of the lon model: construction and cache load time, number
+# of regions, agreement with the online QP, lookup latency against
+# controllerSS.getForces, and closed loop tracking with the explicit
+# force law in controllerSS.
+t_end = 60.0       # Closed loop run length, s
+n_check = 2000     # Random states checked against the online QP
+n_timing = 20000   # Calls timed
+timer = getattr(time, 'perf_counter', time.time)
+
+args = (P.A1_lon,P.B1_lon,P.empc_Q,P.empc_R,P.empc_N,P.empc_divisor*P.Ts,
+        -P.F0,2*0.6*P.km-P.F0,np.negative(P.empc_domain),P.empc_domain)
+start = timer()
+empc = explicitMPC(*args)
+print('explicitMPC: %.1f ms, %d regions, %d inequalities'
+      % (1000*(timer() - start), len(empc.k0), len(empc.w)))
+start = timer()
+empc = explicitMPC(*args)
+print('explicitMPC again: %.1f ms' % (1000*(timer() - start)))
+
+rng = np.random.RandomState(0)
+states = rng.uniform(-1, 1, (n_check, 3))*P.empc_domain
+err = 0.0
+for x in states:
+    U, s = solveBoxQP(empc.H, empc.F.dot(x), empc.lo, empc.hi)
+    err = max(err, abs(empc.control(x) - U[0]))
+print('max |explicit - online QP| force over %d states: %.2e N, %d solved online'
+      % (n_check, err, empc.misses))
+
+latency = np.zeros(n_timing)
+for i in range(n_timing):
+    x = states[i % n_check]
+    start = timer()
+    empc.control(x)
+    latency[i] = timer() - start
+print('explicit lookup, us: p50 %.1f  p99 %.1f  max %.1f'
+      % tuple(1e6*np.percentile(latency, [50, 99, 100])))
+
+ctrl = controllerSS()
+for i in range(n_timing):
+    start = timer()
+    ctrl.getForces([0.1, 0.1], [0.0, 0.0, 0.0])
+    latency[i] = timer() - start
+print('controllerSS.getForces, us: p50 %.1f  p99 %.1f  max %.1f'
+      % tuple(1e6*np.percentile(latency, [50, 99, 100])))
+
+for explicit in (False, True):
+    P.explicit_mpc_lon = explicit
+    m = closedLoopRun(controllerSS, Signals, None, t_end)
+    print('%-12s theta rms %.4f  max %.4f  saturated %.3f'
+          % ('explicit' if explicit else 'state space', m['theta_rms'],
+             m['theta_max'], m['saturation']))
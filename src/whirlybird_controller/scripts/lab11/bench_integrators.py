@@ -0,0 +1,65 @@
+import sys
+import time
+import numpy as np
+import param as P
+
+# The dynamics file is kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from dynamics import WhirlybirdDynamicsBatch
+from integrators import rk4Step
+
+# Work-precision comparison of fixed step RK4 and adaptive Dormand-Prince
+# 5(4). The inputs are held for t_hold seconds at a time, like a slow
+# square wave reference, and the states are recorded at every P.Ts.
+num_holds = 4          # Number of input changes
+samples_per_hold = 300  # Samples of P.Ts between input changes
+t_hold = samples_per_hold*P.Ts   # Time each input is held, s
+
+# Equal left/right forces around the equilibrium force F0. The open loop
+# whirlybird is unstable, so only pitch is excited and the +,-,-,+ sign
+# pattern brings it back near level by the end of the run.
+F_trim = P.F0/2.0
+signs = [1,-1,-1,1]
+schedule = [[F_trim*(1 + 0.01*signs[i%4])]*2 for i in range(num_holds)]
+t_eval = [P.Ts*i for i in range(1,samples_per_hold+1)]
+
+
+def run_adaptive(rtol, atol):
+    dynam = WhirlybirdDynamicsBatch(1)
+    history = []
+    for u in schedule:
+        history.append(dynam.propagateInterval(u, t_hold, t_eval, rtol, atol)[:,0,:])
+    return np.concatenate(history), dynam.integrator.nfev
+
+
+def run_rk4(substeps):
+    # substeps RK4 steps per P.Ts
+    dynam = WhirlybirdDynamicsBatch(1)
+    h = P.Ts/substeps
+    history = []
+    for u in schedule:
+        u = np.array([u])
+        f = lambda x: dynam.Derivatives(x, u)
+        for i in range(samples_per_hold):
+            for j in range(substeps):
+                dynam.state[:] = rk4Step(f, dynam.state, h)
+            history.append(dynam.state[0].copy())
+    return np.array(history), 4*substeps*samples_per_hold*len(schedule)
+
+
+reference = run_adaptive(1e-12, 1e-14)[0]
+
+print('%-10s %-12s %10s %10s %12s' % ('method','setting','nfev','wall(s)','max error'))
+for substeps in [4,2,1]:
+    start = time.time()
+    X, nfev = run_rk4(substeps)
+    wall = time.time() - start
+    print('%-10s %-12s %10d %10.3f %12.3e' % ('rk4','h=Ts/%d' % substeps, nfev, wall,
+                                              np.abs(X - reference).max()))
+for rtol in [1e-4,1e-6,1e-8,1e-10]:
+    start = time.time()
+    X, nfev = run_adaptive(rtol, rtol*1e-3)
+    wall = time.time() - start
+    print('%-10s %-12s %10d %10.3f %12.3e' % ('dopri5','rtol=%g' % rtol, nfev, wall,
+                                              np.abs(X - reference).max()))
@@ -0,0 +1,53 @@
+import sys
+import time
+import numpy as np
+import param as P
+from signal_generator import Signals
+from controllerSS import controllerSS
+from controllerMPC import controllerMPC
+
+# The dynamics files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from dynamics import WhirlybirdDynamics
+from uncertainty import closedLoopRun
+
+# Latency of controllerMPC.getForces per tick in closed loop, against the
+# control period Ts, and its tracking against controllerSS.
+t_end = 60.0        # Closed loop run length, s
+timer = getattr(time, 'perf_counter', time.time)
+
+start = timer()
+ctrl = controllerMPC()
+print('controllerMPC: %.1f ms to build, %d QP variables' % (1000*(timer() - start), ctrl.mpc.U.size))
+
+sig_gen = Signals()
+dynam = WhirlybirdDynamics()
+n_ticks = int(round(t_end/P.Ts))
+latency = np.zeros(n_ticks)
+iterations = []
+for i in range(n_ticks):
+    ref_input = sig_gen.getRefInputs(i*P.Ts)
+    states = dynam.Outputs()[0:3]
+    start = timer()
+    u = ctrl.getForces(ref_input,states)
+    latency[i] = timer() - start
+    if i % P.mpc_divisor == 0:
+        iterations.append(ctrl.mpc.iterations)
+    dynam.propagateDynamics([x*P.km for x in u])
+
+iterations = np.array(iterations)
+solves = latency[::P.mpc_divisor]*1e6
+print('QP solves: %d, %.0f%% with active constraints, iterations mean %.1f max %d (cap %d)'
+      % (len(solves), 100.0*np.mean(iterations > 0), iterations.mean(),
+         iterations.max(), ctrl.mpc.max_iter))
+print('latency of solve ticks, us: p50 %.0f  p90 %.0f  p99 %.0f  p99.9 %.0f  max %.0f'
+      % tuple(np.percentile(solves, [50, 90, 99, 99.9, 100])))
+print('latency of other ticks, us: p50 %.1f  max %.1f'
+      % (np.median(np.delete(latency, np.s_[::P.mpc_divisor]))*1e6, latency.max()*1e6))
+print('ticks over Ts = %.1f ms: %d of %d' % (P.Ts*1e3, np.sum(latency > P.Ts), n_ticks))
+
+for controller in (controllerSS, controllerMPC):
+    m = closedLoopRun(controller, Signals, None, t_end)
+    print('%-13s theta rms %.4f  psi rms %.4f  saturated %.3f'
+          % (controller.__name__, m['theta_rms'], m['psi_rms'], m['saturation']))
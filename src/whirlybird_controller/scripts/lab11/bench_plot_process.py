@@ -0,0 +1,91 @@
+import os
+import sys
+import time
+import multiprocessing
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+os.environ['MPLBACKEND'] = 'Agg'
+import matplotlib.pyplot as plt
+import param as P
+from signal_generator import Signals
+from sim_plot import plotGenerator
+from controllerSS import controllerSS
+
+# The dynamics files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from dynamics import WhirlybirdDynamics
+from plot_process import PlotProcess, TelemetryRing
+
+# The main.py loop with the plots updated live every t_elapse, in the
+# simulation process and in a PlotProcess viewer, then a writer process
+# filling a TelemetryRing as fast as it can under a reader that lags, to
+# check that the writer never waits and the reader only loses samples.
+t_end = 80.0        # Simulated run length, s
+t_elapse = 0.1      # Simulated time between plot updates, s
+n_stress = 1000000  # Samples written by the stress writer
+timer = getattr(time, 'perf_counter', time.time)
+
+def simulate(plotGen, live):
+    sig_gen = Signals()
+    ctrl = controllerSS()
+    dynam = WhirlybirdDynamics()
+    n_ticks = int(round(t_elapse/P.Ts))
+    latency = []
+    start = timer()
+    for i in range(int(round(t_end/t_elapse))):
+        t = i*n_ticks*P.Ts
+        ref_input = sig_gen.getRefInputs(t)
+        for k in range(n_ticks):
+            states = dynam.Outputs()
+            u = ctrl.getForces(ref_input,states)
+            dynam.propagateDynamics([x*P.km for x in u])
+        new_data = [[ref_input[0],states[1]], [states[0]], [ref_input[1],states[2]], [u[0], u[1]]]
+        update = timer()
+        plotGen.updateDataHistory(t, new_data)
+        if live:
+            plotGen.update_plots()
+            plt.pause(0.0001)
+        latency.append(timer() - update)
+    return timer() - start, 1e6*np.array(latency)
+
+for name in ('in process', 'PlotProcess'):
+    plotGen = PlotProcess() if name == 'PlotProcess' else plotGenerator()
+    wall, latency = simulate(plotGen, name == 'in process')
+    print('%-11s %.0f s simulated in %.1f s, plotting us per update: p50 %.0f  max %.0f'
+          % (name, t_end, wall, np.median(latency), latency.max()))
+    if name == 'PlotProcess':
+        plotGen.close()
+        plotGen.process.wait()
+
+def writer(path):
+    ring = TelemetryRing(path)
+    for i in range(n_stress):
+        ring.write(i, [i, -i, 2*i])
+    ring.close()
+
+path = '/dev/shm/bench_ring' if os.path.isdir('/dev/shm') else 'bench_ring'
+reader = TelemetryRing(path, [1, 2], capacity=4096)
+process = multiprocessing.Process(target=writer, args=(path,))
+start = timer()
+process.start()
+got = 0
+ok = True
+last = -1.0
+while True:
+    closed = reader.closed
+    t, values = reader.read()
+    ok = ok and (np.diff(t) > 0).all() and (t > last).all() if len(t) else ok
+    ok = ok and (values == [t, -t, 2*t]).all()
+    last = t[-1] if len(t) else last
+    got += len(t)
+    if closed:
+        break
+    time.sleep(0.005)
+process.join()
+wall = timer() - start
+os.unlink(path)
+print('ring: %d samples written in %.1f s (%.1f us each), %d read, %d dropped, '
+      'all read samples whole and in order: %s'
+      % (n_stress, wall, 1e6*wall/n_stress, got, reader.dropped, ok))
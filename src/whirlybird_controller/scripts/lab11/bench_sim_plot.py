@@ -0,0 +1,35 @@
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import param as P
+from sim_plot import plotGenerator
+
+# Cost of plotGenerator.updateDataHistory per sample and of update_plots
+# per redraw as the run grows, with the whole run kept and with a fixed
+# history_length. The plots are drawn off screen.
+t_end = 600.0         # Run length, s
+redraw_every = 1000   # Samples between timed redraws
+timer = getattr(time, 'perf_counter', time.time)
+
+for history_length in (None, 2000):
+    plotGen = plotGenerator(history_length)
+    n = int(t_end/P.Ts)
+    append = 0.0
+    print('history_length %s' % history_length)
+    for i in range(n):
+        t = i*P.Ts
+        new_data = [[0.1, np.sin(t)], [0.0, np.cos(t)], [0.2, 0.1*t], [1.0]]
+        start = timer()
+        plotGen.updateDataHistory(t, new_data)
+        append += timer() - start
+        if (i + 1) % (n//5) == 0:
+            start = timer()
+            plotGen.update_plots()
+            update = timer() - start
+            start = timer()
+            plotGen.fig.canvas.draw()
+            draw = timer() - start
+            print('  %6d samples: update_plots %.2f ms, draw %.1f ms'
+                  % (i + 1, 1000*update, 1000*draw))
+    print('  updateDataHistory %.1f us per sample' % (1e6*append/n))
@@ -0,0 +1,62 @@
+import sys
+import time
+import numpy as np
+import param as P
+from signal_generator import Signals
+from controllerSS import controllerSS
+
+# The dynamics files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from dynamics import WhirlybirdDynamics, WhirlybirdDynamicsBatch
+from linear_dynamics import LinearWhirlybirdDynamics, LinearWhirlybirdDynamicsBatch
+
+# Speed and linearization error of the ZOH linear surrogate against the
+# nonlinear model.
+t_end = 20.0         # Closed loop run length, s
+num_vehicles = 1000  # Vehicles in the batched open loop run
+num_batch_steps = 300
+
+n_steps = int(round(t_end/P.Ts))
+
+
+def closed_loop(dynam):
+    # Runs the lab11 controller against dynam, like main.py
+    sig_gen = Signals()
+    ctrl = controllerSS()
+    history = np.empty((n_steps,6))
+    start = time.time()
+    for i in range(n_steps):
+        ref_input = sig_gen.getRefInputs(i*P.Ts)
+        states = dynam.Outputs()
+        u = ctrl.getForces(ref_input,states)
+        dynam.propagateDynamics([x*P.km for x in u])
+        history[i] = dynam.States()
+    return history, time.time() - start
+
+
+X_nl, t_nl = closed_loop(WhirlybirdDynamics())
+X_lin, t_lin = closed_loop(LinearWhirlybirdDynamics(P))
+deg = 180/np.pi
+print('closed loop, %g s at Ts = %g' % (t_end, P.Ts))
+print('  nonlinear: %.3f s, linear: %.3f s' % (t_nl, t_lin))
+print('  max |linear - nonlinear|: phi %.3f deg, theta %.3f deg, psi %.3f deg'
+      % tuple(deg*np.abs(X_lin - X_nl).max(axis=0)[0:3]))
+
+# Open loop batch: small random force perturbations about trim
+rng = np.random.RandomState(0)
+F_trim = P.F0/2.0
+u = F_trim*(1 + 0.002*rng.randn(num_batch_steps,num_vehicles,2))
+nl = WhirlybirdDynamicsBatch(num_vehicles)
+lin = LinearWhirlybirdDynamicsBatch(P, num_vehicles)
+start = time.time()
+X_nl = nl.propagateN(u, num_batch_steps)
+t_nl = time.time() - start
+start = time.time()
+X_lin = lin.propagateN(u, num_batch_steps)
+t_lin = time.time() - start
+print('open loop, %d vehicles x %d steps' % (num_vehicles, num_batch_steps))
+print('  nonlinear: %.3f s, linear: %.3f s, speedup %.1fx'
+      % (t_nl, t_lin, t_nl/t_lin))
+print('  max |linear - nonlinear|: phi %.4f deg, theta %.4f deg, psi %.4f deg'
+      % tuple(deg*np.abs(X_lin - X_nl).max(axis=(0,1))[0:3]))
@@ -0,0 +1,103 @@
+import sys
+import numpy as np
+import param as P
+
+# The MPC and trim files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from mpc import CondensedMPC
+from trim import trimTable, labParameters
+
+class controllerMPC:
+  ''' Linear MPC over the lon and lat models of param.py with the PWM
+      commands as inputs, so the limits 0 <= u <= maxPWM are constraints
+      of the QP instead of a saturation after it, and with a soft bound
+      |theta| <= theta_max on the predicted pitch. The model states are
+      the pitch and yaw errors, the rates and the error integrals:
+          [e_theta, thetadot, I_theta, phi, e_psi, phidot, psidot, I_psi]
+      Rates come from dirty derivatives as in controllerSS. The QP is
+      solved every P.mpc_divisor samples and its first input held in
+      between.'''
+
+  def __init__(self):
+      self.maxPWM = 0.6
+
+      # Continuous model with the PWM deviations from trim as inputs:
+      # F = km*(ul + ur), tau = km*d*(ul - ur)
+      A = np.zeros((8,8))
+      B = np.zeros((8,2))
+      A[0:2,0:2] = P.A_lon
+      A[2,0] = 1.0                     # I_theta' = e_theta
+      A[3:7,3:7] = P.A_lat
+      A[7,4] = 1.0                     # I_psi' = e_psi
+      B[0:2,:] = np.asarray(P.B_lon)*[P.km, P.km]
+      B[3:7,:] = np.asarray(P.B_lat)*[P.km*P.d, -P.km*P.d]
+      C_theta = np.zeros((1,8))
+      C_theta[0,0] = 1.0
+      self.mpc = CondensedMPC(A, B, P.mpc_Q, P.mpc_R, P.mpc_N,
+                              P.mpc_divisor*P.Ts, 0.0, self.maxPWM, C_soft=C_theta,
+                              max_iter=P.mpc_max_iter)
+      self.theta_max = P.theta_max*np.pi/180
+      self.trim = trimTable(params=labParameters(P))
+
+      self.x = np.zeros(8)
+      self.tick = 0
+      self.u = [0.0, 0.0]
+      self.isSaturated = False
+      self.a1 = (2*P.sigma - P.Ts)/(2*P.sigma + P.Ts)
+      self.a2 = 2/(2*P.sigma + P.Ts)
+      self.phidot = 0.0
+      self.thetadot = 0.0
+      self.psidot = 0.0
+      self.phi_d1 = P.phi0
+      self.theta_d1 = P.theta0
+      self.psi_d1 = P.psi0
+      self.e_theta_d1 = 0.0
+      self.e_psi_d1 = 0.0
+
+  def getForces(self,y_r,y):
+      # y_r is the referenced input
+      # y is the current state
+      theta_r = y_r[0]
+      psi_r = y_r[1]
+      phi = y[0]
+      theta = y[1]
+      psi = y[2]
+
+      # Update differentiators and, unless the last command was
+      # saturated, the error integrators
+      self.phidot = self.a1*self.phidot + self.a2*(phi - self.phi_d1)
+      self.thetadot = self.a1*self.thetadot + self.a2*(theta - self.theta_d1)
+      self.psidot = self.a1*self.psidot + self.a2*(psi - self.psi_d1)
+      self.phi_d1 = phi
+      self.theta_d1 = theta
+      self.psi_d1 = psi
+      e_theta = theta - theta_r
+      e_psi = psi - psi_r
+      x = self.x
+      if not self.isSaturated:
+          x[2] += (P.Ts/2.0)*(e_theta + self.e_theta_d1)
+          x[7] += (P.Ts/2.0)*(e_psi + self.e_psi_d1)
+      self.e_theta_d1 = e_theta
+      self.e_psi_d1 = e_psi
+
+      if self.tick % P.mpc_divisor == 0:
+          x[0] = e_theta
+          x[1] = self.thetadot
+          x[3] = phi
+          x[4] = e_psi
+          x[5] = self.phidot
+          x[6] = self.psidot
+
+          # Trim PWM of the reference pitch. The QP bounds are the PWM
+          # limits and theta_max relative to trim and the reference.
+          u_trim = self.trim.force(theta_r)/(2.0*P.km)
+          du = self.mpc.solve(x, -u_trim, self.maxPWM - u_trim,
+                              -self.theta_max - theta_r, self.theta_max - theta_r)
+          ul = u_trim + du[0]
+          ur = u_trim + du[1]
+          self.isSaturated = (ul <= 0.0 or ur <= 0.0 or
+                              ul >= self.maxPWM or ur >= self.maxPWM)
+          self.u = [min(max(ul, 0.0), self.maxPWM), min(max(ur, 0.0), self.maxPWM)]
+      self.tick += 1
+      return self.u
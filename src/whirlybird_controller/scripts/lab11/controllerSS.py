@@ -3,6 +3,10 @@ import sys
 import numpy as np
 import param as P
 
+# The explicit MPC and gain schedule files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+
 class controllerSS:
   ''' This class inherits other controllers in order to organize multiple controllers.'''
 
@@ -67,6 +71,21 @@ class SS_ctrl:
       self.ki_lat = ki_lat                 # Input gain
       self.K_lat = K_lat
 
+      # Explicit MPC law for the force
+      self.empc = None
+      if P.explicit_mpc_lon:
+          from explicit_mpc import explicitMPC
+          F_max = 2*0.6*P.km
+          self.empc = explicitMPC(P.A1_lon,P.B1_lon,P.empc_Q,P.empc_R,P.empc_N,
+                                  P.empc_divisor*P.Ts,-P.F0,F_max-P.F0,
+                                  np.negative(P.empc_domain),P.empc_domain)
+
+      # Gains and trim force looked up at the reference pitch
+      self.schedule = None
+      if P.gain_scheduling:
+          from gain_schedule import gainSchedule
+          self.schedule = gainSchedule(P)
+
   def convertForces(self,u):
   	F = u[0]         # Force, N
   	tau = u[1]       # Torque, Nm
@@ -127,9 +146,26 @@ class SS_ctrl:
       x_lon = np.matrix([[theta],
                         [self.thetadot]])
 
+      K_lon, ki_lon, K_lat, ki_lat = self.K_lon, self.ki_lon, self.K_lat, self.ki_lat
+      F0 = P.F0
+      x0_lon = P.x0_lon
+      if self.schedule is not None:
+          # The gains hold about the trim they were designed at, so the
+          # lon state is fed back about the scheduled pitch. Scheduling on
+          # the measured pitch would cancel the pitch feedback.
+          g = self.schedule.lookup(theta_r)
+          K_lon, ki_lon = g['K_lon'], g['ki_lon'].item(0)
+          K_lat, ki_lat = g['K_lat'], g['ki_lat'].item(0)
+          F0 = g['F_trim'].item(0)
+          x0_lon = np.matrix([[theta_r],
+                              [0.0]])
+
       # Compute the state feedback controller
-      F = P.F0 - self.K_lon*(x_lon - P.x0_lon) - self.ki_lon*self.integrator_lon
-      T = P.T0 - self.K_lat*(x_lat - P.x0_lat) - self.ki_lat*self.integrator_lat
+      F = F0 - K_lon*(x_lon - x0_lon) - ki_lon*self.integrator_lon
+      T = P.T0 - K_lat*(x_lat - P.x0_lat) - ki_lat*self.integrator_lat
+      if self.empc is not None:
+          F = np.matrix(P.F0 + self.empc.control([theta - theta_r, self.thetadot,
+                                                  self.integrator_lon]))
 
     #   print "K_lat terms"
     #   print -self.K_lat
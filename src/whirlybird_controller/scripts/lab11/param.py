@@ -1,6 +1,11 @@
 # Inverted Pendulum Parameter File
+import os
+import sys
 import numpy as np
-import control as cnt
+
+# The gain store is kept in the parent directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gain_store import ssDesignInputs, storedGains
 
 # Physical parameters of the inverted pendulum
 l1 = 0.85    # Length from pivot to whirlybird, m
@@ -124,21 +129,41 @@ des_char_poly_lon = np.convolve([1,th_alpha1,th_alpha0],np.poly(integrator_pole_
 des_poles_lat = np.roots(des_char_poly_lat)
 des_poles_lon = np.roots(des_char_poly_lon)
 
-# Latitudinal Controllability Matrix
-if np.linalg.matrix_rank(cnt.ctrb(A1_lat,B1_lat))!=5:
-	print("The Latitudinal system is not controllable")
-else:
-    K1_lat = cnt.acker(A1_lat,B1_lat,des_poles_lat)
-    K_lat = K1_lat[0,0:4]
-    ki_lat = K1_lat[0,4]
-
-# Longitudinal Controllability Matrix
-if np.linalg.matrix_rank(cnt.ctrb(A1_lon,B1_lon))!=3:
-	print("The Longitudinal system is not controllable")
-else:
-    K1_lon = cnt.acker(A1_lon,B1_lon,des_poles_lon)
-    K_lon = K1_lon[0,0:2]
-    ki_lon = K1_lon[0,2]
+# Gains placing the poles above. They are designed once for these
+# models and poles and then loaded from the gain store, so importing
+# this file does not need scipy or python-control.
+_gains = storedGains(ssDesignInputs(sys.modules[__name__]))
+K_lat = _gains['K_lat']
+ki_lat = _gains['ki_lat']
+K_lon = _gains['K_lon']
+ki_lon = _gains['ki_lon']
+
+####################################################
+#                 MPC (controllerMPC.py)
+####################################################
+# States [e_theta, thetadot, I_theta, phi, e_psi, phidot, psidot, I_psi],
+# inputs the left and right PWM commands
+mpc_Q = np.diag([60.0, 5.0, 40.0, 20.0, 40.0, 0.5, 5.0, 20.0])
+mpc_R = np.diag([10.0, 10.0])
+mpc_divisor = 5      # Samples per MPC step
+mpc_N = 25           # Horizon, MPC steps
+mpc_max_iter = 30    # Largest number of QP iterations per solve
+
+# Explicit MPC of the lon model A1_lon, B1_lon, used for the force of
+# controllerSS if explicit_mpc_lon is true. The input is the force
+# deviation from F0, bounded by the PWM limits; the law is built over
+# the states [theta - theta_r, thetadot, integrator] in the domain box.
+explicit_mpc_lon = False
+empc_Q = np.diag([20.0, 2.0, 10.0])
+empc_R = np.diag([1.0])
+empc_divisor = 15    # Samples per MPC step
+empc_N = 8           # Horizon, MPC steps
+empc_domain = [2*theta_max*np.pi/180, 3.0, 3.0]
+
+# Schedule the gains and trim force on the reference pitch with the
+# table of gain_schedule.py instead of using the gains above. The pitch
+# is fed back about the reference, the trim the gains were designed at.
+gain_scheduling = False
 
 UNCERTAINTY_PARAMETERS = False
 if UNCERTAINTY_PARAMETERS:
@@ -154,7 +179,10 @@ if UNCERTAINTY_PARAMETERS:
 	Jy = 0.0014*(1+2*alpha*np.random.rand()-alpha) # Inertia in y direction, Kg*m^2
 	Jz = 0.0041*(1+2*alpha*np.random.rand()-alpha) # Inertia in z direction, Kg*m^2
 
-print('K_lat: ', K_lat)
-print('ki_lat: ', ki_lat)
-print('K_lon: ', K_lon)
-print('ki_lon: ', ki_lon)
+# Print the gains when this file is imported
+PRINT_GAINS = False
+if PRINT_GAINS:
+	print('K_lat: ', K_lat)
+	print('ki_lat: ', ki_lat)
+	print('K_lon: ', K_lon)
+	print('ki_lon: ', ki_lon)
@@ -0,0 +1,48 @@
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import param as P
+from sim_plot import plotGenerator
+
+# Live plotting of the 14 lab13 plots as main.py would do it, with the
+# plots updated every t_elapse of simulated time and the simulation run in
+# real time: redraw the whole figure each update, or blit with the
+# governor. Reports the time per frame, the frames drawn and how far
+# behind real time the run falls.
+t_end = 60.0      # Simulated run length, s
+t_elapse = 0.1    # Simulated time between plot updates, s
+timer = getattr(time, 'perf_counter', time.time)
+
+def sample(t):
+    s = np.sin(t)
+    c = np.cos(0.3*t)
+    return [[0.1*s, s, c], [s - c], [c, s], [s], [s, c], [c], [s, c], [s],
+            [c, s, 0.1*t], [s], [s, c], [c], [0.3 + 0.1*s, 0.3 - 0.1*s], [0.0]]
+
+for blit in (False, True):
+    plotGen = plotGenerator(blit=blit)
+    plotGen.fig.canvas.draw()
+    t = 0.0
+    frames = []
+    start = timer()
+    while t < t_end:
+        t_temp = t + t_elapse
+        while t < t_temp:
+            t += P.Ts
+        plotGen.updateDataHistory(t, sample(t))
+        time.sleep(t_elapse)
+        frame = timer()
+        if plotGen.update_plots():
+            if not blit:
+                plotGen.fig.canvas.draw()
+            frames.append(timer() - frame)
+    plotGen.update_plots(force=True)
+    wall = timer() - start
+    frames = 1000*np.array(frames)
+    print('%-6s %d frames drawn, %s'
+          % ('blit' if blit else 'redraw', len(frames),
+             '%d in full' % plotGen.renderer.full_draws if blit else 'all in full'))
+    print('       frame ms: p50 %.1f  max %.1f, plotting %.0f%% of the wall time,'
+          ' %.1f s for %.0f s simulated'
+          % (np.median(frames), frames.max(), 100*frames.sum()/1000/wall, wall, t_end))
@@ -0,0 +1,83 @@
+import sys
+import time
+import numpy as np
+import param as P
+from signal_generator import Signals
+from controllerSS import controllerSS, SS_ctrl
+
+# The dynamics files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from dynamics import WhirlybirdDynamics
+
+# Per tick cost and accuracy of the exact discrete observer of SS_ctrl
+# against the 10 forward Euler sub-steps it replaced.
+t_end = 40.0       # Closed loop run length, s
+n_timing = 20000   # Ticks timed for each observer
+
+
+class EulerSS_ctrl(SS_ctrl):
+  ''' SS_ctrl with the observers integrated by N Euler sub-steps.'''
+
+  def SS_loop(self,phi,theta,theta_r,psi,psi_r):
+
+      # Lon Observer
+      N = 10
+      for i in range(N):
+        self.xhat_lon += P.Ts/N*(P.A_lon*(self.xhat_lon-P.x0_lon) + \
+          P.B_lon*(self.F_d1-P.F0)+\
+          self.L_lon*((np.matrix([[theta]]) - P.C_lon*self.xhat_lon)))
+
+      # Lat Observer
+      for i in range(N):
+        self.xhat_lat += P.Ts/N*(P.A_lat*(self.xhat_lat-P.x0_lat) + \
+          P.B_lat*(self.T_d1-P.T0)+\
+          self.L_lat*((np.matrix([[psi],[phi]]) - P.C_lat*self.xhat_lat)))
+
+      error_psi = psi_r - self.xhat_lat.item(1)
+      error_theta = theta_r - self.xhat_lon.item(0)
+      self.integrator_lat += (P.Ts/2.0)*(error_psi+self.error_psi_d1)
+      self.integrator_lon += (P.Ts/2.0)*(error_theta+self.error_theta_d1)
+      self.error_psi_d1 = error_psi
+      self.error_theta_d1 = error_theta
+
+      F = P.F0 - self.K_lon*(self.xhat_lon - P.x0_lon) - self.ki_lon*self.integrator_lon
+      T = P.T0 - self.K_lat*(self.xhat_lat - P.x0_lat) - self.ki_lat*self.integrator_lat
+      self.F_d1 = F.item(0)
+      self.T_d1 = T.item(0)
+      return self.convertForces([F,T])
+
+
+def new_ctrl(cls):
+  ctrl = controllerSS()
+  ctrl.SSCtrl = cls(P.K_lon,P.ki_lon,P.L_lon,P.K_lat,P.ki_lat,P.L_lat,P.phi0,P.theta0,P.psi0)
+  return ctrl
+
+
+# Accuracy: both controllers see the same measurements, the exact
+# observer closes the loop.
+sig_gen = Signals()
+exact = new_ctrl(SS_ctrl)
+euler = new_ctrl(EulerSS_ctrl)
+dynam = WhirlybirdDynamics()
+n_steps = int(round(t_end/P.Ts))
+err = 0.0
+for i in range(n_steps):
+  ref_input = sig_gen.getRefInputs(i*P.Ts)
+  states = dynam.Outputs()
+  u = exact.getForces(ref_input,states)
+  euler.getForces(ref_input,states)
+  xe = np.vstack(exact.getObsStates()[0] + exact.getObsStates()[1])
+  xr = np.vstack(euler.getObsStates()[0] + euler.getObsStates()[1])
+  err = max(err, np.abs(xe - xr).max())
+  dynam.propagateDynamics([x*P.km for x in u])
+print('max |exact - euler| observer estimate over %g s: %.2e' % (t_end, err))
+
+# Per tick cost of the SS loop with each observer
+states = dynam.Outputs()
+for name, cls in (('euler x10', EulerSS_ctrl), ('exact', SS_ctrl)):
+  ctrl = new_ctrl(cls)
+  start = time.time()
+  for i in range(n_timing):
+    ctrl.getForces(ref_input,states)
+  print('%-10s %.1f us per tick' % (name, 1e6*(time.time() - start)/n_timing))
@@ -3,6 +3,13 @@ import sys
 import numpy as np
 import param as P
 
+# The linear dynamics and gain schedule files are kept in the parent
+# directory, so the parent directory path needs to be added.
+sys.path.append('..')
+from caching import LRUCache
+from linear_dynamics import discreteObserver
+from gain_schedule import gainSchedule, scheduledObservers
+
 class controllerSS:
   ''' This class inherits other controllers in order to organize multiple controllers.'''
 
@@ -55,12 +62,24 @@ class controllerSS:
 
 class SS_ctrl:
   def __init__(self,K_lon,ki_lon,L_lon,K_lat,ki_lat,L_lat,phi0,theta0,psi0):
-      self.xhat_lon = np.matrix([[P.theta0],  # h
-                             [0.0]]) # h dot
-      self.xhat_lat = np.matrix([[P.phi0],  # z
-                             [P.psi0],  # theta
-                             [0.0],  # zdot
-                             [0.0]]) # theta dot
+      # Each observer is updated with one product on a preallocated
+      # vector v = [xhat; u_d1; y]. xhat is a view of the first rows of v.
+      self.M_lon, self.c_lon = discreteObserver(P.A_lon,P.B_lon,P.C_lon,L_lon,
+                                                P.x0_lon,P.F0,P.Ts)
+      self.M_lat, self.c_lat = discreteObserver(P.A_lat,P.B_lat,P.C_lat,L_lat,
+                                                P.x0_lat,P.T0,P.Ts)
+      self.v_lon = np.zeros(2+1+1)
+      self.v_lat = np.zeros(4+1+2)
+      self.xhat_lon = self.v_lon[0:2].reshape(2,1)
+      self.xhat_lat = self.v_lat[0:4].reshape(4,1)
+      self.xhat_lon[:,0] = [P.theta0,  # theta
+                            0.0]       # theta dot
+      self.xhat_lat[:,0] = [P.phi0,    # phi
+                            P.psi0,    # psi
+                            0.0,       # phi dot
+                            0.0]       # psi dot
+      self._next_lon = np.empty(2)
+      self._next_lat = np.empty(4)
       self.F_d1 = 0.0
       self.T_d1 = 0.0
       self.integrator_lon = 0.0
@@ -74,6 +93,13 @@ class SS_ctrl:
       self.K_lat = K_lat
       self.L_lat = L_lat
 
+      # Gains, trim force and observers looked up at the reference pitch.
+      # The observers are discretized once per reference pitch.
+      self.schedule = None
+      if P.gain_scheduling:
+          self.schedule = gainSchedule(P)
+          self.observers = LRUCache(maxsize=64)
+
   def convertForces(self,u):
   	F = u[0]         # Force, N
   	tau = u[1]       # Torque, Nm
@@ -96,20 +122,46 @@ class SS_ctrl:
       return [ul,ur]
 
 
+  # Scheduled gains at the reference pitch theta_r. Also switches the
+  # observers to the ones of theta_r.
+  def scheduleAt(self,theta_r):
+      g = self.schedule.lookup(theta_r)
+      observers = self.observers.get(theta_r)
+      if observers is None:
+          observers = self.observers.put(theta_r, scheduledObservers(
+              P,theta_r,g['L_lon'],g['L_lat']))
+      (self.M_lon, self.c_lon), (self.M_lat, self.c_lat) = observers
+      return g
+
   def SS_loop(self,phi,theta,theta_r,psi,psi_r):
 
+      K_lon, ki_lon, K_lat, ki_lat = self.K_lon, self.ki_lon, self.K_lat, self.ki_lat
+      F0 = P.F0
+      x0_lon = P.x0_lon
+      if self.schedule is not None:
+          # As in lab11, the lon state is fed back about the scheduled
+          # pitch, the trim the gains were designed at
+          g = self.scheduleAt(theta_r)
+          K_lon, ki_lon = g['K_lon'], g['ki_lon'].item(0)
+          K_lat, ki_lat = g['K_lat'], g['ki_lat'].item(0)
+          F0 = g['F_trim'].item(0)
+          x0_lon = np.matrix([[theta_r],
+                              [0.0]])
+
       # Lon Observer
-      N = 10
-      for i in range(N):
-        self.xhat_lon += P.Ts/N*(P.A_lon*(self.xhat_lon-P.x0_lon) + \
-          P.B_lon*(self.F_d1-P.F0)+\
-          self.L_lon*((np.matrix([[theta]]) - P.C_lon*self.xhat_lon)))
+      v = self.v_lon
+      v[2] = self.F_d1
+      v[3] = theta
+      np.dot(self.M_lon,v,out=self._next_lon)
+      np.add(self._next_lon,self.c_lon,out=v[0:2])
 
       # Lat Observer
-      for i in range(N):
-        self.xhat_lat += P.Ts/N*(P.A_lat*(self.xhat_lat-P.x0_lat) + \
-          P.B_lat*(self.T_d1-P.T0)+\
-          self.L_lat*((np.matrix([[psi],[phi]]) - P.C_lat*self.xhat_lat)))
+      v = self.v_lat
+      v[4] = self.T_d1
+      v[5] = psi
+      v[6] = phi
+      np.dot(self.M_lat,v,out=self._next_lat)
+      np.add(self._next_lat,self.c_lat,out=v[0:4])
 
       error_psi = psi_r - self.xhat_lat.item(1)
       error_theta = theta_r - self.xhat_lon.item(0)
@@ -122,11 +174,11 @@ class SS_ctrl:
       self.error_theta_d1 = error_theta
 
       # Compute the state feedback controller
-      F = P.F0 - self.K_lon*(self.xhat_lon - P.x0_lon) - self.ki_lon*self.integrator_lon
-      T = P.T0 - self.K_lat*(self.xhat_lat - P.x0_lat) - self.ki_lat*self.integrator_lat
+      F = F0 - K_lon*(self.xhat_lon - x0_lon) - ki_lon*self.integrator_lon
+      T = P.T0 - K_lat*(self.xhat_lat - P.x0_lat) - ki_lat*self.integrator_lat
 
-      self.F_d1 = F
-      self.T_d1 = T
+      self.F_d1 = F.item(0)
+      self.T_d1 = T.item(0)
 
       u = self.convertForces([F,T])
 
@@ -0,0 +1,46 @@
+import sys
+import time
+import param as P
+from signal_generator import Signals
+from controllerSS import controllerSS
+
+# The dynamics files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from uncertainty import monteCarlo, monteCarloBatch
+from controller_bank import SSControllerBank
+
+# Robustness of the lab13 controller to +-alpha errors in the physical
+# parameters. The gains are designed once for the nominal parameters of
+# param.py, and each run uses a different draw of the plant parameters.
+num_runs = 200     # Number of parameter draws
+t_end = 40.0       # End time of each simulation, s
+alpha = 0.2        # Relative parameter uncertainty
+seed = 0           # Seed of the parameter draws
+processes = None   # Worker processes, None uses one per CPU
+
+# If BATCH is true, all runs are simulated at once as array operations
+# with the controller bank instead of on a process pool.
+BATCH = True
+
+if __name__ == '__main__':
+    start = time.time()
+
+    def progress(run, params, metrics):
+        progress.done += 1
+        if progress.done % 20 == 0:
+            print('%d/%d runs, %.1f s' % (progress.done, num_runs, time.time() - start))
+    progress.done = 0
+
+    if BATCH:
+        stats = monteCarloBatch(SSControllerBank, Signals, num_runs, t_end,
+                                alpha, seed)
+    else:
+        stats = monteCarlo(controllerSS, Signals, num_runs, t_end, alpha, seed,
+                           processes, callback=progress)
+    print(stats.summary())
+    run, params = stats.worst['theta_max']
+    print('worst pitch tracking: run %d' % run)
+    for name in sorted(params):
+        print('  %s = %.4g (nominal %.4g)' % (name, params[name], getattr(P,name)))
+    print('%.1f s wall time' % (time.time() - start))
@@ -1,6 +1,10 @@
+import os
+import sys
 import numpy as np
-from scipy.signal import place_poles as place
-import control as cnt
+
+# The gain store is kept in the parent directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from gain_store import ssDesignInputs, storedGains
 
 # Physical parameters of the inverted pendulum
 l1 = 0.85    # Length from pivot to whirlybird, m
@@ -127,22 +131,6 @@ des_char_poly_lon = np.convolve([1,th_alpha1,th_alpha0],np.poly(integrator_pole_
 des_poles_lat = np.roots(des_char_poly_lat)
 des_poles_lon = np.roots(des_char_poly_lon)
 
-# Latitudinal Controllability Matrix
-if np.linalg.matrix_rank(cnt.ctrb(A1_lat,B1_lat))!=5:
-	print("The Latitudinal system is not controllable")
-else:
-    K1_lat = cnt.acker(A1_lat,B1_lat,des_poles_lat)
-    K_lat = K1_lat[0,0:4]
-    ki_lat = K1_lat[0,4]
-
-# Longitudinal Controllability Matrix
-if np.linalg.matrix_rank(cnt.ctrb(A1_lon,B1_lon))!=3:
-	print("The Longitudinal system is not controllable")
-else:
-    K1_lon = cnt.acker(A1_lon,B1_lon,des_poles_lon)
-    K_lon = K1_lon[0,0:2]
-    ki_lon = K1_lon[0,2]
-
 ####################################################
 #                 Observer
 ####################################################
@@ -158,16 +146,25 @@ obs_des_poles_lat = np.roots(obs_des_char_poly_lat)
 obs_des_poles_lon = np.roots(obs_des_char_poly_lon)
 
 
-if np.linalg.matrix_rank(cnt.obsv(A_lat,C_lat))!=4:
-	print('Latitudinal System Not Observable')
-else:
-	L_lat = place(A_lat.T,C_lat.T,obs_des_poles_lat).gain_matrix.T
-
-if np.linalg.matrix_rank(cnt.obsv(A_lon,C_lon))!=2:
-	print('Longitudinal System Not Observable')
-else:
-	L_lon = place(A_lon.T,C_lon.T,obs_des_poles_lon).gain_matrix.T
-
+# Controller and observer gains placing the poles above. They are
+# designed once for these models and poles and then loaded from the
+# gain store, so importing this file does not need scipy or
+# python-control.
+_gains = storedGains(ssDesignInputs(sys.modules[__name__]))
+K_lat = _gains['K_lat']
+ki_lat = _gains['ki_lat']
+K_lon = _gains['K_lon']
+ki_lon = _gains['ki_lon']
+L_lat = _gains['L_lat']
+L_lon = _gains['L_lon']
+
+# Schedule the controller and observer gains, the trim force and the
+# observer models on the reference pitch with the table of
+# gain_schedule.py instead of using the gains above
+gain_scheduling = False
+
+# Perturbs the parameters of a single run. See monte_carlo.py for
+# statistics over many draws.
 UNCERTAINTY_PARAMETERS = False
 if UNCERTAINTY_PARAMETERS:
 	alpha = 0.2
@@ -182,9 +179,12 @@ if UNCERTAINTY_PARAMETERS:
 	Jy = 0.0014*(1+2*alpha*np.random.rand()-alpha) # Inertia in y direction, Kg*m^2
 	Jz = 0.0041*(1+2*alpha*np.random.rand()-alpha) # Inertia in z direction, Kg*m^2
 
-print('K_lat: ', K_lat)
-print('ki_lat: ', ki_lat)
-print('K_lon: ', K_lon)
-print('ki_lon: ', ki_lon)
-print('L_lat: ', L_lat)
-print('L_lon: ', L_lon)
+# Print the gains when this file is imported
+PRINT_GAINS = False
+if PRINT_GAINS:
+	print('K_lat: ', K_lat)
+	print('ki_lat: ', ki_lat)
+	print('K_lon: ', K_lon)
+	print('ki_lon: ', ki_lon)
+	print('L_lat: ', L_lat)
+	print('L_lon: ', L_lon)
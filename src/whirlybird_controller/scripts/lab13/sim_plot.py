@@ -1,7 +1,15 @@
+import sys
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 import numpy as np
 
+# The plot history is kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from plot_history import DataHistory
+from plot_render import BlitRenderer
+from plot_decimate import Decimator
+
 
 class plotGenerator:
     ''' The purpose of this class is to organize multiple plots in one
@@ -19,7 +27,20 @@ class plotGenerator:
     ##################################################################
     #                       CODE TO BE MODIFIED
     ##################################################################
-    def __init__(self):
+    def __init__(self, history_length=None, blit=False, plot_share=0.2,
+                 decimate=None):
+        # history_length: number of samples kept per line. None keeps
+        # the whole run, a number only the latest samples, so that
+        # redraws take the same time however long the run is.
+        # blit: render by blitting the lines over a cached background,
+        # rescaling an axes only when the data leaves its limits, and
+        # spending at most plot_share of the wall time on it. See
+        # BlitRenderer.
+        # decimate: None draws every sample, 'minmax' or 'lttb' a
+        # decimated view at the resolution of the axes. See Decimator.
+        self.history_length = history_length
+        self.decimate = decimate
+
         #SECTION 1
         ##############################################################
         # Number of subplots = num_of_rows*num_of_cols
@@ -31,8 +52,11 @@ class plotGenerator:
         self.fig, self.ax = plt.subplots(self.num_of_rows,
             self.num_of_cols, sharex=True)
 
-        # A list to hold the time history
-        self.time_history = []
+        # The time history
+        self.time_history = DataHistory(1, self.history_length)
+
+        # Renders the plots when blitting
+        self.renderer = BlitRenderer(self.fig, plot_share) if blit else None
 
         # The list type variable will store your plot objects
         self.handle = []
@@ -122,16 +146,23 @@ class plotGenerator:
             """
 
         # Add the new time data
-        self.time_history.append(new_t)
+        self.time_history.append([new_t])
 
         # Update all other data
         for i in range(len(self.handle)):
-            self.handle[i].updateHistory(new_data[i])
-
-    # Renders the data to the plots
-    def update_plots(self):
+            self.handle[i].updateHistory(new_data[i], self.history_length)
+
+    # Renders the data to the plots. When blitting, the plots are also
+    # drawn, and the call returns False if it was skipped to keep to
+    # plot_share; force=True always renders.
+    def update_plots(self, force=False):
+        time_history = self.time_history.data()[0]
+        if self.renderer is not None:
+            return self.renderer.render(time_history, self.handle, force,
+                                        self.decimate)
         for i in range(len(self.handle)):
-            self.handle[i].update_plot(self.time_history)
+            self.handle[i].update_plot(time_history, decimate=self.decimate)
+        return True
 
 
 
@@ -182,7 +213,8 @@ class myPlot:
 
 
         self.legend = legend
-        self.data_history = []        # Will contain the data history
+        self.data_history = None      # Will contain the data history
+        self.decimator = None         # Decimates the data history
         self.ax = ax                  # Axes handle
         self.gain = gain              # The scales the data
         self.colors = colors          # A list of colors.
@@ -206,30 +238,42 @@ class myPlot:
         self.init = True
 
 
-    # Adds the new data to the data history list after
+    # Adds the new data to the data history after
     # scaling it by the gain.
-    def updateHistory(self,new_data):
+    def updateHistory(self,new_data,history_length=None):
         # new_data: a list containing the new data.
         # Ex: new_data = [theta_r, theta]
+        # history_length: samples kept, None keeps them all
+        if self.data_history is None:
+            self.data_history = DataHistory(len(new_data), history_length)
         self.data_history.append([t*self.gain for t in new_data])
 
-    def update_plot(self,time_history):
+    # blit: the lines are animated, drawn by BlitRenderer, which
+    # also sets the axis limits
+    # decimate: None, or the Decimator method of the view drawn
+    def update_plot(self,time_history,blit=False,decimate=None):
+
+        # One row of the history per line object
+        if decimate is None:
+            # Rows of the history are views, so no data is copied
+            data = self.data_history.data()
+            times = [time_history]*len(data)
+        else:
+            if self.decimator is None:
+                self.decimator = Decimator(decimate)
+            times, data = self.decimator.view(time_history,
+                                              self.data_history, self.ax)
 
         # If it is being initialized
         if self.init == True:
 
-            # size contains the number of line objects to create
-            size = len(self.data_history[0])
-
-            for i in range(size):
-                # zip rearranges the list
-                data = zip(*self.data_history)
-
+            for i in range(len(data)):
                 # Instantiate line object and add it to the axes
-                self.line.append(Line2D(time_history,data[i],
+                self.line.append(Line2D(times[i],data[i],
                     color = self.colors[np.mod(i,len(self.colors)-1)],
                     ls = self.line_styles[np.mod(i,len(self.line_styles)-1)],
-                    label = self.legend[i] if self.legend != None else None))
+                    label = self.legend[i] if self.legend != None else None,
+                    animated = blit))
 
                 self.ax.add_line(self.line[i])
 
@@ -238,14 +282,12 @@ class myPlot:
                 plt.legend(handles=self.line)
         else: # Add new data to the plot
 
-            # zip rearranges the list
-            data = zip(*self.data_history)
-
             # Updates the x and y data of each line.
             for i in range(len(self.line)):
-                self.line[i].set_xdata(time_history)
-                self.line[i].set_ydata(data[i])
+                self.line[i].set_data(times[i], data[i])
 
         # Adjusts the axis to fit all of the data.
+        if blit:
+            return
         self.ax.relim()
         self.ax.autoscale()
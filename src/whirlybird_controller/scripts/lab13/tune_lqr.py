@@ -0,0 +1,44 @@
+import sys
+import time
+import numpy as np
+import param as P
+
+# The design files are kept in the parent directory,
+# so the parent directory path needs to be added.
+sys.path.append('..')
+from gain_design import augmented, lqiGrid
+
+# LQI alternative to the pole placement gains of param.py. Designs the
+# lat controller over a grid of state and input weights and lists the
+# fastest designs whose closed loop poles are damped at least zeta_min.
+# Designs that were solved before, in this grid or an earlier one, come
+# from the Riccati memo.
+q_phi = np.logspace(0, 3, 8)      # Weights of the roll error
+q_psi = np.logspace(0, 3, 8)      # Weights of the yaw error
+q_int = [1.0, 10.0, 100.0]        # Weights of the yaw error integral
+r_tau = np.logspace(-1, 1, 5)     # Weights of the torque
+zeta_min = 0.6                    # Smallest acceptable damping
+n_best = 5                        # Designs listed
+processes = None                  # Worker processes, None uses one per CPU
+
+if __name__ == '__main__':
+    start = time.time()
+    Qs = [np.diag([a, b, 0.1, 0.1, c]) for a in q_phi for b in q_psi for c in q_int]
+    Rs = [[[r]] for r in r_tau]
+    designs = lqiGrid(P.A_lat, P.B_lat, P.Cr_lat, Qs, Rs, processes=processes)
+    print('%d designs in %.2f s' % (len(designs), time.time() - start))
+
+    A1, B1 = augmented(P.A_lat, P.B_lat, P.Cr_lat)
+    rows = []
+    for i, (K, ki) in enumerate(designs):
+        poles = np.linalg.eigvals(A1 - B1.dot(np.append(K, ki)[None,:]))
+        zeta = min(-p.real/abs(p) for p in poles)
+        if zeta >= zeta_min:
+            rows.append((max(poles.real), zeta, i, K, ki))
+    rows.sort(key=lambda row: row[0])
+    print('%d designs with damping >= %g' % (len(rows), zeta_min))
+    for slowest, zeta, i, K, ki in rows[:n_best]:
+        Q, R = Qs[i//len(Rs)], Rs[i % len(Rs)]
+        print('Q = diag(%s), R = %g: slowest pole %.2f, damping %.2f'
+              % (', '.join('%g' % q for q in np.diag(Q)), R[0][0], slowest, zeta))
+        print('  K_lat = %s, ki_lat = %.4f' % (np.array2string(np.ravel(K), precision=4), ki))
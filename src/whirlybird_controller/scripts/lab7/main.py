@@ -11,28 +11,26 @@ from controllerPD import controllerPD
 # so the parent directory path needs to be added.
 sys.path.append('..')
 from dynamics import WhirlybirdDynamics
+from plot_process import PlotProcess
+from simulate import simulate, FrameRecorder
 from animation import WhirlybirdAnimation
 
 
-t_start = 0.0   # Start time of simulation
 t_end = 100.0    # End time of simulation
-t_Ts = P.Ts     # Simulation time step
 t_elapse = 0.01  # Simulation time elapsed between each iteration
 t_pause = 0.01  # Pause between each iteration
+live_plot = False # Plot in a viewer process while simulating
 
 
 
 
 
 
-sig_gen = Signals()                   # Instantiate Signals class
-plotGen = plotGenerator()             # Instantiate plotGenerator class
+plotGen = PlotProcess() if live_plot else plotGenerator() # Instantiate plotGenerator class
 ctrl = controllerPD()                 # Instantiate controllerPD class
 # simAnimation = WhirlybirdAnimation()  # Instantiate Animate class
 dynam = WhirlybirdDynamics()          # Instantiate Dynamics class
 
-t = t_start               # Declare time variable to keep track of simulation time elapsed
-
 
 
 # Converts force and torque into the left and
@@ -58,22 +56,9 @@ def saturatePWM(u):
 	ur = 1 if ur > 1 else 0 if ur < 0 else ur
 	return [ul,ur]
 
-while t < t_end:
-
-    # Get referenced inputs from signal generators
-	ref_input = sig_gen.getRefInputs(t)
-
-	# The dynamics of the model will be propagated in time by t_elapse
-	# at intervals of t_Ts.
-	t_temp = t +t_elapse
-	while t < t_temp:
-
-		states = dynam.Outputs()             # Get current states
-		u = ctrl.getForces(ref_input,states) # Calculate the forces
-		u = convertForces(u)                 # Convert force and torque to fl and fr
-		dynam.propagateDynamics([x*P.km for x in u]) # Propagate the dynamics of the model in time
-		t = round(t +t_Ts,2)                 # Update time elapsed
-
+# Called by simulate every t_elapse with the time, the reference and
+# the states and commands of the last step
+def drawFrame(t, ref_input, states, u):
 	# plt.figure(simAnimation.fig.number) # Switch current figure to animation figure
 	# simAnimation.drawSystem(        # Update animation with current user input
 	# 	dynam.Outputs())
@@ -85,9 +70,17 @@ while t < t_end:
 
 	plotGen.updateDataHistory(t, new_data)
 
-plt.figure(plotGen.fig.number)		# Switch current figure to plotGen figure
-plotGen.update_plots()              # Update the plot
-plt.pause(0.00000001)
+# The dynamics of the model are propagated in time at intervals of
+# P.Ts, with the force and torque converted to PWM commands
+simulate(ctrl, P, Signals, t_end, [FrameRecorder(P.Ts, t_elapse, drawFrame)],
+         dynam, t_elapse, convertForces)
+
+if live_plot:
+	plotGen.close()                 # The viewer keeps its window open
+else:
+	plt.figure(plotGen.fig.number)		# Switch current figure to plotGen figure
+	plotGen.update_plots()              # Update the plot
+	plt.pause(0.00000001)
 
 	# time.sleep(t_pause)
 
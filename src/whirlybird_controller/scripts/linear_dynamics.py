@@ -0,0 +1,164 @@
+import numpy as np
+from scipy.linalg import expm
+from linearize import lonLatModels
+from trim import labParameters
+
+# Rows of the lon and lat states in the full state
+# [phi, theta, psi, phidot, thetadot, psidot]
+LON = [1,4]        # theta, thetadot
+LAT = [0,2,3,5]    # phi, psi, phidot, psidot
+
+
+def zohDiscretize(A, B, Ts):
+    # Exact zero order hold discretization of xdot = A*x + B*u:
+    # expm([[A,B],[0,0]]*Ts) = [[Ad,Bd],[0,I]]
+    n, m = np.shape(B)
+    M = np.zeros((n+m,n+m))
+    M[:n,:n] = A
+    M[:n,n:] = B
+    Md = expm(M*Ts)
+    return Md[:n,:n], Md[:n,n:]
+
+
+def discreteObserver(A, B, C, L, x0, u0, Ts):
+    # Exact discretization of the observer
+    #   xhat' = A*(xhat-x0) + B*(u-u0) + L*(y - C*xhat)
+    # with u and y held over Ts. Returns (M, c) such that
+    #   xhat[k+1] = M*[xhat[k]; u[k]; y[k]] + c
+    A, B, C, L = [np.asarray(X, dtype=float) for X in (A, B, C, L)]
+    Ad, BLd = zohDiscretize(A - L.dot(C), np.hstack((B, L)), Ts)
+    Bd = BLd[:,:B.shape[1]]
+    Ld = BLd[:,B.shape[1]:]
+    x0 = np.ravel(x0).astype(float)
+    c = x0 - Ad.dot(x0) - Bd.dot(np.ravel(u0)) - Ld.dot(C.dot(x0))
+    return np.hstack((Ad, BLd)), c
+
+
+class LinearWhirlybirdDynamicsBatch:
+    ''' Surrogate of WhirlybirdDynamicsBatch built from the linearized lon
+        and lat models. The models are discretized once at P.Ts, so each
+        step is one matrix recurrence for all N vehicles. The interface
+        is the same as WhirlybirdDynamicsBatch: the inputs are the left
+        and right forces and the states are held in an (N,6) array.'''
+
+    def __init__(self, P, N=1, state0=None, models=None):
+        # P is the param module of the lab.
+        # models is an optional tuple (A_lon, B_lon, A_lat, B_lat) with F
+        # and tau as inputs. By default the models of P are used, or, if
+        # P has none, the linearization at level trim.
+        self.N = N
+        if state0 is None:
+            state0 = [P.phi0, P.theta0, P.psi0,
+                      P.phidot0, P.thetadot0, P.psidot0]
+        self.state = np.empty((N,6))
+        self.state[:] = state0
+
+        # Trim the models were taken about
+        self.x_trim = np.zeros(6)
+        self.x_trim[1] = P.theta0
+        self.F_trim = (P.m1*P.l1 - P.m2*P.l2)*P.g/P.l1*np.cos(P.theta0)
+        if models is None:
+            if hasattr(P,'A_lon') and hasattr(P,'A_lat'):
+                models = (P.A_lon, P.B_lon, P.A_lat, P.B_lat)
+            else:
+                models = lonLatModels(self.x_trim, [self.F_trim/2, self.F_trim/2],
+                                      params=labParameters(P))
+        A_lon, B_lon, A_lat, B_lat = [np.asarray(M, dtype=float) for M in models]
+
+        # Full 6 state model with the inputs [fl, fr]:
+        # F = fl + fr, tau = d*(fl - fr)
+        A = np.zeros((6,6))
+        B = np.zeros((6,2))
+        A[np.ix_(LON,LON)] = A_lon
+        A[np.ix_(LAT,LAT)] = A_lat
+        B[LON,:] = B_lon*np.array([[1.0, 1.0]])
+        B[LAT,:] = B_lat*np.array([[P.d, -P.d]])
+        self.Ad, self.Bd = zohDiscretize(A, B, P.Ts)
+
+        # Transposes are kept so rows of states can be multiplied in place
+        self._AdT = np.ascontiguousarray(self.Ad.T)
+        self._BdT = np.ascontiguousarray(self.Bd.T)
+        self._dx = np.empty((N,6))
+        self._du = np.empty((N,2))
+        self._bu = np.empty((N,6))
+
+    def propagateDynamics(self, u):
+        # u contains the left and right forces, either one pair shared by
+        # all vehicles or an (N,2) array with one pair per vehicle.
+        self._step(np.broadcast_to(np.asarray(u, dtype=float), (self.N,2)))
+
+    def propagateN(self, u_schedule, n_steps, record_every=1, out=None):
+        # Same as WhirlybirdDynamicsBatch.propagateN
+        u_schedule = np.asarray(u_schedule, dtype=float)
+        if u_schedule.shape == (n_steps,2):
+            u_schedule = np.broadcast_to(u_schedule[:,np.newaxis,:], (n_steps,self.N,2))
+        elif u_schedule.shape != (n_steps,self.N,2):
+            raise ValueError('u_schedule must have shape (%d,2) or (%d,%d,2)'
+                             % (n_steps, n_steps, self.N))
+        n_records = n_steps//record_every
+        if out is None:
+            out = np.empty((n_records,self.N,6))
+        elif out.shape != (n_records,self.N,6) or out.dtype != float:
+            raise ValueError('out must be a float array of shape (%d,%d,6)'
+                             % (n_records, self.N))
+        for i in range(n_steps):
+            self._step(u_schedule[i])
+            if (i + 1) % record_every == 0 and i < n_records*record_every:
+                out[(i + 1)//record_every - 1] = self.state
+        return out
+
+    def _step(self, u):
+        # x[k+1] - x_trim = Ad*(x[k] - x_trim) + Bd*(u[k] - u_trim)
+        np.subtract(self.state, self.x_trim, out=self._dx)
+        np.subtract(u, self.F_trim/2, out=self._du)
+        np.dot(self._dx, self._AdT, out=self.state)
+        np.dot(self._du, self._BdT, out=self._bu)
+        self.state += self._bu
+        self.state += self.x_trim
+
+    # Returns all current states as an (N,6) array
+    def States(self):
+        return self.state
+
+
+class LinearWhirlybirdDynamics:
+    ''' Single vehicle view over a LinearWhirlybirdDynamicsBatch of size
+        one, with the interface of WhirlybirdDynamics.'''
+
+    def __init__(self, P, models=None):
+        self.batch = LinearWhirlybirdDynamicsBatch(P, 1, models=models)
+        self.state = np.asmatrix(self.batch.state.reshape(6,1))
+
+        # With the trim folded in, a step is one product
+        #   x[k+1] = [Ad, Bd, c]*[x[k]; u[k]; 1]
+        # on a preallocated vector whose first rows are copied from x.
+        b = self.batch
+        c = b.x_trim - b.Ad.dot(b.x_trim) - b.Bd.dot([b.F_trim/2, b.F_trim/2])
+        self._M = np.hstack((b.Ad, b.Bd, c[:,np.newaxis]))
+        self._w = np.ones(6+2+1)
+        self._x = b.state[0]
+
+    def propagateDynamics(self,u):
+        w = self._w
+        w[0:6] = self._x
+        w[6] = u[0]
+        w[7] = u[1]
+        np.dot(self._M, w, out=self._x)
+
+    def propagateN(self, u_schedule, n_steps, record_every=1, out=None):
+        # Same as WhirlybirdDynamics.propagateN
+        if out is not None and (out.shape != (n_steps//record_every,6)
+                                or out.dtype != float):
+            raise ValueError('out must be a float array of shape (%d,6)'
+                             % (n_steps//record_every))
+        out = self.batch.propagateN(u_schedule, n_steps, record_every,
+                                    None if out is None else out[:,np.newaxis,:])
+        return out[:,0,:]
+
+    # Returns the observable states
+    def Outputs(self):
+        return self.batch.state[0].tolist()
+
+    # Returns all current states
+    def States(self):
+        return self.batch.state[0].tolist()
@@ -0,0 +1,79 @@
+import numpy as np
+from caching import LRUCache, quantize
+from dynamics import PHYSICAL_PARAMETERS, physicalParameters, closedFormConstants, accelerations
+
+# Operating points closer than RESOLUTION (rad, rad/s, N) share a cache
+# entry. The model is linearized at the quantized point, so a cached
+# result does not depend on which query created it.
+RESOLUTION = 1e-6
+
+# Step of the complex step derivative. Complex step derivatives have no
+# truncation or cancellation error, so any tiny step gives the exact
+# Jacobian to rounding.
+_COMPLEX_STEP = 1e-30
+
+_cache = LRUCache(maxsize=4096)
+
+
+def jacobians(x, u, params=None, resolution=RESOLUTION):
+    # Linearizes xdot = f(x,u) of WhirlybirdDynamics about the state
+    # x = [phi,theta,psi,phidot,thetadot,psidot] and the input u = [fl,fr].
+    # params optionally overrides physical parameters of param.py.
+    # Returns (A,B) with A = df/dx (6x6) and B = df/du (6x2) as read-only
+    # matrices.
+    p = physicalParameters(params)
+    xq = quantize(x, resolution)
+    uq = quantize(u, resolution)
+    key = (tuple(p[name] for name in PHYSICAL_PARAMETERS), resolution, xq, uq)
+    AB = _cache.get(key)
+    if AB is None:
+        AB = _cache.put(key, complexStepJacobians(closedFormConstants(p),
+                                                  np.array(xq + uq)*resolution))
+    return AB
+
+
+def lonLatModels(x, u, params=None, resolution=RESOLUTION):
+    # Longitudinal and lateral models in the form used by param.py:
+    #   lon states [theta, thetadot], input F = fl + fr
+    #   lat states [phi, psi, phidot, psidot], input tau = d*(fl - fr)
+    # Cross coupling between the two, which is zero at level trim, is
+    # left out. Returns (A_lon, B_lon, A_lat, B_lat).
+    A, B = jacobians(x, u, params, resolution)
+    d = physicalParameters(params)['d']
+    B_Ftau = B*np.matrix([[0.5, 0.5/d],
+                          [0.5, -0.5/d]])
+    lon = [1,4]
+    lat = [0,2,3,5]
+    return (A[np.ix_(lon,lon)], B_Ftau[lon,0],
+            A[np.ix_(lat,lat)], B_Ftau[lat,1])
+
+
+def cacheInfo():
+    # Returns (hits, misses, size) of the linearization cache
+    return _cache.hits, _cache.misses, len(_cache)
+
+
+def clearCache():
+    _cache.clear()
+
+
+def complexStepJacobians(k, xu):
+    # Uncached Jacobians at xu = [phi,theta,psi,phidot,thetadot,psidot,fl,fr]
+    # for the closed form constants k.
+    # Complex step differentiation of the closed form accelerations. Row
+    # j of z is the operating point with an imaginary step in variable j,
+    # so all 8 partial derivatives come from one vectorized evaluation.
+    z = np.tile(np.asarray(xu, dtype=complex), (8,1))
+    z[np.arange(8),np.arange(8)] += 1j*_COMPLEX_STEP
+    acc = accelerations(k, np.cos(z[:,0]), np.sin(z[:,0]),
+                        np.cos(z[:,1]), np.sin(z[:,1]),
+                        z[:,3], z[:,4], z[:,5], z[:,6], z[:,7])
+
+    J = np.zeros((6,8))
+    J[0:3,3:6] = np.eye(3)
+    J[3:6,:] = np.imag(np.array(acc))/_COMPLEX_STEP
+    A = np.matrix(J[:,0:6])
+    B = np.matrix(J[:,6:8])
+    A.flags.writeable = False
+    B.flags.writeable = False
+    return A, B
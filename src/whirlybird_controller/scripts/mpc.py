@@ -0,0 +1,168 @@
+import numpy as np
+from gain_design import riccati
+from linear_dynamics import zohDiscretize
+
+
+class CondensedMPC:
+    ''' Linear MPC of xdot = A*x + B*u, sampled with a zero order hold at
+        Ts, over a horizon of N samples. The cost is
+            sum x_k'Q x_k + u_k'R u_k  +  x_N'Pf x_N
+        with Pf the discrete Riccati solution, so without active
+        constraints the controller is the discrete LQR. Inputs are
+        bounded by u_min <= u <= u_max. The outputs y = C_soft*x of the
+        predicted states can be bounded softly, by adding soft_weight
+        times their squared bound violation to the cost.
+
+        The states are eliminated (condensed), so the QP is over the N*m
+        inputs U only, and its matrices do not depend on x or the bounds.
+        They are built once. If the unconstrained solution, which is
+        linear in x, is within the bounds it is the solution. Otherwise
+        the QP is solved by ADMM on the constraints [I; G]*U = z, where
+        G*U are the soft outputs, as in OSQP. The linear system of the U
+        step is the same at every iteration and tick, so its inverse is
+        built once and an iteration is a few small matrix products. Each
+        solve starts from the previous solution shifted by one sample
+        and stops after max_iter iterations, or when the primal and dual
+        residuals are below tol, so the worst case solve time is
+        bounded.'''
+
+    def __init__(self, A, B, Q, R, N, Ts, u_min, u_max, C_soft=None,
+                 soft_weight=1e3, rho=None, max_iter=20, tol=1e-5):
+        Q = np.asarray(Q, dtype=float)
+        R = np.asarray(R, dtype=float)
+        Ad, Bd = zohDiscretize(np.asarray(A, dtype=float), np.asarray(B, dtype=float), Ts)
+        Pf = riccati(A, B, Q, R, Ts)
+        self.n = n = Ad.shape[0]
+        self.m = m = Bd.shape[1]
+        self.N = N
+        self.max_iter = max_iter
+        self.tol = tol
+        self.u_min = np.resize(np.asarray(u_min, dtype=float), m)
+        self.u_max = np.resize(np.asarray(u_max, dtype=float), m)
+
+        # Predicted states [x_1; ...; x_N] = Phi*x_0 + Gamma*U
+        Phi = np.zeros((N*n,n))
+        Gamma = np.zeros((N*n,N*m))
+        Ak = np.eye(n)
+        for k in range(N):
+            AkB = Ak.dot(Bd)
+            for j in range(N-k):
+                Gamma[(k+j)*n:(k+j+1)*n, j*m:(j+1)*m] = AkB
+            Ak = Ad.dot(Ak)
+            Phi[k*n:(k+1)*n] = Ak
+
+        # Condensed cost U'HU/2 + (F*x_0)'U
+        Qbar = np.kron(np.eye(N), Q)
+        Qbar[(N-1)*n:, (N-1)*n:] = Pf
+        QG = Qbar.dot(Gamma)
+        self.H = 2*(Gamma.T.dot(QG) + np.kron(np.eye(N), R))
+        self.F = 2*QG.T.dot(Phi)
+
+        # Constraint rows: the inputs, then the soft outputs
+        # y_k = C_soft*x_k = Gx*x_0 + G*U, k = 1..N
+        self.p = 0
+        A_c = np.eye(N*m)
+        if C_soft is not None:
+            C_soft = np.atleast_2d(np.asarray(C_soft, dtype=float))
+            self.p = C_soft.shape[0]
+            Cbar = np.kron(np.eye(N), C_soft)
+            self.Gx = Cbar.dot(Phi)
+            A_c = np.vstack((A_c, Cbar.dot(Gamma)))
+        self.A_c = A_c
+        self.soft_weight = soft_weight
+
+        # Unconstrained solution U = Kx*x_0, which is the solution of
+        # most ticks
+        self.Kx = -np.linalg.solve(self.H, self.F)
+
+        # Step size of ADMM, by default scaled to the Hessian, and the
+        # inverse of the U step system
+        if rho is None:
+            rho = 0.1*np.sqrt(np.linalg.eigvalsh(self.H)[[0,-1]].prod())
+        self.rho = rho
+        self.K = np.linalg.inv(self.H + rho*A_c.T.dot(A_c))
+        self.rhoK = rho*self.K.dot(A_c.T)
+        self.KF = self.K.dot(self.F)
+
+        # Bounds of the constraint rows, and the solution and ADMM state,
+        # the warm start of the next solve
+        n_c = A_c.shape[0]
+        self._lo = np.empty(n_c)
+        self._hi = np.empty(n_c)
+        self.U = np.zeros(N*m)
+        self.z = np.zeros(n_c)
+        self.w = np.zeros(n_c)
+        self.iterations = 0
+
+    def _shift(self, v):
+        # v with each block of rows advanced one sample, the last
+        # block repeated
+        m = self.m
+        N = self.N
+        s = np.empty_like(v)
+        s[:N*m-m] = v[m:N*m]
+        s[N*m-m:N*m] = v[N*m-m:N*m]
+        if self.p:
+            p = self.p
+            s[N*m:-p] = v[N*m+p:]
+            s[-p:] = v[-p:]
+        return s
+
+    def solve(self, x0, u_min=None, u_max=None, y_min=None, y_max=None):
+        # Inputs over the horizon from the state x0. Bounds given here
+        # replace the constructor bounds for this solve; y_min and y_max
+        # are per output of C_soft, or None for no bound. Scalar bounds
+        # apply to every input or output. Returns the first input;
+        # self.U holds the whole sequence and self.iterations the
+        # iterations used, 0 if no constraint was active.
+        N = self.N
+        n_u = N*self.m
+        x0 = np.ravel(x0)
+        lo = self._lo
+        hi = self._hi
+        lo[:n_u].reshape(N,self.m)[:] = self.u_min if u_min is None else u_min
+        hi[:n_u].reshape(N,self.m)[:] = self.u_max if u_max is None else u_max
+        if self.p:
+            # Output bounds relative to the free response Gx*x0
+            y_free = self.Gx.dot(x0)
+            lo[n_u:].reshape(N,self.p)[:] = -np.inf if y_min is None else y_min
+            hi[n_u:].reshape(N,self.p)[:] = np.inf if y_max is None else y_max
+            lo[n_u:] -= y_free
+            hi[n_u:] -= y_free
+
+        # Without active constraints the solution is linear in x0
+        U = self.Kx.dot(x0)
+        AU = self.A_c.dot(U)
+        if (AU >= lo).all() and (AU <= hi).all():
+            self.U = U
+            self.z = AU
+            self.w[:] = 0.0
+            self.iterations = 0
+            return U[:self.m]
+
+        # ADMM from the last solution shifted by one sample. The
+        # residuals are checked every few iterations, as the check
+        # costs about as much as an iteration.
+        Kq = self.KF.dot(x0)
+        shrink = self.rho/(self.rho + 2*self.soft_weight)
+        z = self._shift(self.z)
+        w = self._shift(self.w)
+        for it in range(self.max_iter):
+            U = self.rhoK.dot(z - w)
+            U -= Kq
+            AU = self.A_c.dot(U)
+            v = AU + w
+            z_last = z
+            z = np.minimum(np.maximum(v, lo), hi)
+            if self.p:
+                # Proximal step of the soft bound penalty
+                z[n_u:] += shrink*(v[n_u:] - z[n_u:])
+            w = v - z
+            if it % 5 == 4 and (np.abs(AU - z).max() < self.tol and
+                                np.abs(z - z_last).max() < self.tol):
+                break
+        self.iterations = it + 1
+        self.z = z
+        self.w = w
+        self.U = np.minimum(np.maximum(U, lo[:n_u]), hi[:n_u])
+        return self.U[:self.m]
@@ -0,0 +1,179 @@
+import numpy as np
+
+try:
+    from math import gcd as _gcd
+except ImportError:
+    from fractions import gcd as _gcd
+
+
+class PIDLoop:
+    ''' Declaration of one loop of a PIDBank.
+        name  - name of the loop, e.g. 'theta'
+        kp, kd, ki - proportional, derivative and integral gains
+        y0    - initial measurement, the differentiator starts from it
+        outer - name of the loop whose output is the reference of this
+                one, or None if the reference is given to update
+        divisor - the loop runs every divisor-th update, at the sample
+                time divisor*Ts, and holds its output in between'''
+
+    def __init__(self, name, kp, kd, ki=0.0, y0=0.0, outer=None, divisor=1):
+        self.name = name
+        self.kp = kp
+        self.kd = kd
+        self.ki = ki
+        self.y0 = y0
+        self.outer = outer
+        self.divisor = divisor
+
+
+class PIDBank:
+    ''' Gains and state of several PID loops held in arrays, one entry
+        per loop. Each loop is
+            u = kp*e - kd*ydot + ki*integral(e)
+        with ydot from a dirty derivative of the measurement y. The
+        integrators only run while |ydot| < windup_limit and the actuators
+        are not saturated. A loop can take the output of another loop as
+        its reference, which makes a cascade. Loops can run at a divisor
+        of the update rate, e.g. a slow outer loop over a fast inner loop.
+        Update k runs the loops whose divisor divides k, and the others
+        hold their outputs.
+
+        For a given set of running loops and integrators the whole bank,
+        cascades included, is linear in w = [state; references;
+        measurements], so an update is one matrix product, restricted to
+        the state of the running loops; an update where no loop runs only
+        returns the held outputs. The matrices are built the first time
+        each set occurs and then reused.'''
+
+    def __init__(self, loops, Ts, sigma, windup_limit=0.05):
+        # loops is a list of PIDLoop. Measurements and outputs are in
+        # the order of loops, references in the order of the loops that
+        # have no outer loop.
+        self.names = [loop.name for loop in loops]
+        self.n = n = len(loops)
+        self.kp = np.array([loop.kp for loop in loops], dtype=float)
+        self.kd = np.array([loop.kd for loop in loops], dtype=float)
+        self.ki = np.array([loop.ki for loop in loops], dtype=float)
+        self.windup_limit = windup_limit
+
+        # Sample time and dirty derivative coefficients of each loop
+        self.divisor = [int(loop.divisor) for loop in loops]
+        self.Ts = Ts*np.array(self.divisor, dtype=float)
+        self.a1 = (2*sigma - self.Ts)/(2*sigma + self.Ts)
+        self.a2 = 2/(2*sigma + self.Ts)
+
+        # Loops that run at each phase of the schedule
+        self.period = 1
+        for k in self.divisor:
+            self.period = self.period*k//_gcd(self.period, k)
+        self._active = [np.array([p % k == 0 for k in self.divisor])
+                        for p in range(self.period)]
+        self._running = [np.flatnonzero(active) for active in self._active]
+        self.tick = 0
+
+        # Outer loop of each loop, and the order the loops are evaluated
+        # in: every outer loop before its inner loops.
+        index = dict((name, i) for i, name in enumerate(self.names))
+        self.outer = []
+        for loop in loops:
+            if loop.outer is not None and loop.outer not in index:
+                raise ValueError('loop %s: unknown outer loop %s' % (loop.name, loop.outer))
+            self.outer.append(None if loop.outer is None else index[loop.outer])
+        depth = [self._depth(i) for i in range(n)]
+        self.order = sorted(range(n), key=lambda i: depth[i])
+        self.external = [i for i in range(n) if self.outer[i] is None]
+
+        # w = [differentiator, integrator, error_d1, y_d1, u, refs, y].
+        # The outputs u are part of the state so they can be held.
+        self.n_state = 5*n
+        self.w = np.zeros(self.n_state + len(self.external) + n)
+        self.differentiator = self.w[0:n]
+        self.integrator = self.w[n:2*n]
+        self.error_d1 = self.w[2*n:3*n]
+        self.y_d1 = self.w[3*n:4*n]
+        self.u = self.w[4*n:5*n]
+        self.refs = self.w[5*n:5*n+len(self.external)]
+        self.y = self.w[5*n+len(self.external):]
+        self.y_d1[:] = [loop.y0 for loop in loops]
+
+        # Rows of the new differentiator values, which set the gate, and
+        # the update matrices, keyed by the running loops and integrators
+        # (rows of the state they change, reduced matrix), and for each
+        # phase the differentiator rows and closed gates of its loops
+        all_loops = np.ones(n, dtype=bool)
+        D = self._rows(all_loops, all_loops)[0:n]
+        self._D = [D[running] for running in self._running]
+        self._closed = [np.zeros(len(running), dtype=bool) for running in self._running]
+        self._M = {}
+
+    def _depth(self, i, seen=()):
+        if self.outer[i] is None:
+            return 0
+        if i in seen:
+            raise ValueError('loop %s is in a cascade cycle' % self.names[i])
+        return self._depth(self.outer[i], seen + (i,)) + 1
+
+    def _rows(self, active, gate):
+        # Builds the matrix that maps w to the new state when the loops
+        # where active is true run, and of those the integrators where
+        # gate is true. The other loops keep their state and output.
+        n = self.n
+        e = np.eye(len(self.w))
+        d, I, E, Y, u = 0, n, 2*n, 3*n, 4*n
+        r = 5*n
+        y = 5*n + len(self.external)
+        M = e[0:self.n_state].copy()
+        for j in self.order:
+            if not active[j]:
+                continue
+            if self.outer[j] is None:
+                ref = e[r + self.external.index(j)]
+            else:
+                ref = M[u + self.outer[j]]
+            error = ref - e[y+j]
+            M[d+j] = self.a1[j]*e[d+j] + self.a2[j]*(e[y+j] - e[Y+j])
+            M[I+j] = e[I+j] + gate[j]*(self.Ts[j]/2.0)*(error + e[E+j])
+            M[E+j] = error
+            M[Y+j] = e[y+j]
+            M[u+j] = self.kp[j]*error - self.kd[j]*M[d+j] + self.ki[j]*M[I+j]
+        return M
+
+    def update(self, refs, y, saturated=False):
+        # refs are the references of the loops without an outer loop and
+        # y the measurements of all loops. saturated freezes the
+        # integrators. Returns the outputs of all loops as an array.
+        self.refs[:] = refs
+        self.y[:] = y
+        phase = self.tick % self.period
+        self.tick += 1
+        running = self._running[phase]
+        if not len(running):
+            return self.u
+        # Gates of the running loops only
+        if saturated:
+            gate = self._closed[phase]
+        else:
+            gate = np.abs(np.dot(self._D[phase], self.w)) < self.windup_limit
+        key = (phase, gate.tobytes())
+        entry = self._M.get(key)
+        if entry is None:
+            entry = self._M[key] = self._reduced(phase, gate)
+        rows, M, out = entry
+        np.dot(M, self.w, out=out)
+        self.w[rows] = out
+        return self.u
+
+    def _reduced(self, phase, gate):
+        # Update of phase with the gates of its running loops, as the
+        # state rows it changes, their matrix and an output buffer
+        n = self.n
+        running = self._running[phase]
+        full_gate = np.zeros(n, dtype=bool)
+        full_gate[running] = gate
+        M = self._rows(self._active[phase], full_gate)
+        rows = np.sort(np.concatenate([running + k*n for k in range(5)]))
+        return rows, np.ascontiguousarray(M[rows]), np.zeros(len(rows))
+
+    # Output of the loop name from the last update
+    def output(self, name):
+        return self.u[self.names.index(name)]
@@ -0,0 +1,141 @@
+import numpy as np
+
+
+def lttb(x, y, n_out):
+    # Indices of n_out of the points (x, y) picked by largest triangle
+    # three buckets: the first and last point, and in each of n_out - 2
+    # buckets of the points between them, the one making the largest
+    # triangle with the point picked in the bucket before and the mean of
+    # the bucket after.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    counts = np.diff(edges)
+    mean_x = (np.add.reduceat(x[:n-1], edges[:-1])/counts).tolist()
+    mean_y = (np.add.reduceat(y[:n-1], edges[:-1])/counts).tolist()
+    mean_x.append(x[n-1])
+    mean_y.append(y[n-1])
+    xs = x.tolist()
+    ys = y.tolist()
+    edges = edges.tolist()
+    picked = [0]
+    a = 0
+    for b in range(n_out - 2):
+        ax_, ay = xs[a], ys[a]
+        cx, cy = mean_x[b+1], mean_y[b+1]
+        best = -1.0
+        for j in range(edges[b], edges[b+1]):
+            area = abs((ax_ - cx)*(ys[j] - ay) - (ax_ - xs[j])*(cy - ay))
+            if area > best:
+                best = area
+                a = j
+        picked.append(a)
+    picked.append(n - 1)
+    return np.array(picked)
+
+
+class Decimator:
+    ''' Decimated view of the lines of a DataHistory, at the resolution of
+        the axes they are drawn on. With method='minmax' each line is cut
+        into bins and drawn through the smallest and largest sample of
+        each bin, so that spikes stay visible, with between one and two
+        bins per pixel column. With method='lttb' those points are then
+        reduced by lttb to one per pixel column.
+
+        Bins are a power of two samples wide. Complete bins are kept
+        between calls, so that a call only bins the samples appended
+        since the last one, and when there are twice as many bins as
+        pixel columns adjacent pairs are merged. The bins of a history
+        with max_len, which drops samples, are redone on every call, as
+        are all bins when the axes width changes.'''
+
+    def __init__(self, method='minmax', min_bins=100):
+        if method not in ('minmax', 'lttb'):
+            raise ValueError('Unknown decimation method %r' % (method,))
+        self.method = method
+        self.min_bins = min_bins  # Bins kept, at least, on a narrow axes
+        self._target = None
+        self._reset(1)
+
+    def _reset(self, size):
+        self.size = size          # Samples per new bin
+        self._done = 0            # Samples in complete bins
+        self._lo = None           # Indices of the min of each bin, per line
+        self._hi = None           # Indices of the max of each bin, per line
+        self._count = 0           # history.count at the last call
+
+    def _bin(self, data, start, stop):
+        # Indices of the min and max of each bin of self.size samples of
+        # data[:, start:stop], whose length is a multiple of self.size
+        k = (stop - start)//self.size
+        seg = data[:,start:stop].reshape(len(data), k, self.size)
+        offset = start + self.size*np.arange(k)
+        return seg.argmin(axis=2) + offset, seg.argmax(axis=2) + offset
+
+    def _merge(self, data, idx, pick):
+        # Merges adjacent pairs of bins, keeping the index of the sample
+        # pick (argmin or argmax) selects in each pair
+        m = idx.shape[1]//2*2
+        pairs = idx[:,:m].reshape(len(idx), m//2, 2)
+        rows = np.arange(len(idx))[:,None,None]
+        second = pick(data[rows,pairs], axis=2) == 1
+        merged = np.where(second, pairs[:,:,1], pairs[:,:,0])
+        return np.hstack((merged, idx[:,m:]))
+
+    def view(self, time_history, history, ax):
+        # Lists of the x and of the y data of each line of history, with
+        # time_history the times of its samples and ax the axes it is
+        # drawn on
+        data = history.data()
+        n = data.shape[1]
+        target = max(int(ax.get_window_extent().width), self.min_bins)
+        if n <= 2*target:
+            self._reset(1)
+            return [time_history]*len(data), list(data)
+
+        if (target != self._target or history.max_len is not None
+                or history.count < self._count or self._lo is None):
+            self._target = target
+            self._reset(int(2**np.ceil(np.log2(float(n)/target))))
+            self._lo = np.empty((len(data), 0), dtype=int)
+            self._hi = np.empty((len(data), 0), dtype=int)
+        self._count = history.count
+
+        # Bin the samples appended since the last call, then merge bins
+        # while there are too many
+        stop = self._done + (n - self._done)//self.size*self.size
+        if stop > self._done:
+            lo, hi = self._bin(data, self._done, stop)
+            self._lo = np.hstack((self._lo, lo))
+            self._hi = np.hstack((self._hi, hi))
+            self._done = stop
+        while self._lo.shape[1] >= 2*target:
+            self._lo = self._merge(data, self._lo, np.argmin)
+            self._hi = self._merge(data, self._hi, np.argmax)
+            self.size *= 2
+
+        # Points of the bins in time order, then the samples not yet in a
+        # complete bin, which are fewer than self.size
+        idx = np.sort(np.dstack((self._lo, self._hi)), axis=2).reshape(len(data), -1)
+        tail = data[:,self._done:]
+        first = np.zeros((len(data), 1), dtype=int)
+        last = np.full((len(data), 1), n - 1, dtype=int)
+        if tail.shape[1]:
+            ends = np.sort(np.column_stack((tail.argmin(axis=1), tail.argmax(axis=1))), axis=1)
+            idx = np.hstack((first, idx, ends + self._done, last))
+        else:
+            idx = np.hstack((first, idx, last))
+
+        xs = []
+        ys = []
+        for row, line in zip(idx, data):
+            x = time_history[row]
+            y = line[row]
+            if self.method == 'lttb':
+                pick = lttb(x, y, target)
+                x = x[pick]
+                y = y[pick]
+            xs.append(x)
+            ys.append(y)
+        return xs, ys
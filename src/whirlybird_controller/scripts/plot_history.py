@@ -0,0 +1,90 @@
+import numpy as np
+
+
+class DataHistory:
+    ''' Samples of width values, appended one at a time, in a preallocated
+        numpy array with one row per value. With max_len=None every sample
+        is kept and the array doubles in size when it is full. Otherwise
+        only the last max_len samples are kept, in a ring buffer that
+        writes each sample twice, max_len apart, so that the kept samples
+        are always one contiguous slice. Either way data() is a view, and
+        an append costs the same however long the run is.'''
+
+    def __init__(self, width, max_len=None, capacity=1024):
+        self.width = width
+        self.max_len = max_len
+        self._buf = np.empty((width, 2*max_len if max_len else capacity))
+        self._start = 0     # Column of the oldest kept sample
+        self.n = 0          # Number of kept samples
+        self.count = 0      # Number of samples ever appended
+        self._seen = 0      # count at the last call of extent
+        self._lo = float('inf')
+        self._hi = float('-inf')
+
+    def append(self, values):
+        # values is a sequence of width numbers, or of width
+        # one-element sequences
+        values = np.ravel(values)
+        self.count += 1
+        if self.max_len is None:
+            if self.n == self._buf.shape[1]:
+                buf = np.empty((self.width, 2*self.n))
+                buf[:,:self.n] = self._buf
+                self._buf = buf
+            self._buf[:,self.n] = values
+            self.n += 1
+        else:
+            L = self.max_len
+            if self.n < L:
+                i = self.n
+                self.n += 1
+            else:
+                i = self._start
+                self._start = (self._start + 1) % L
+            self._buf[:,i] = values
+            self._buf[:,i+L] = values
+
+    def extend(self, values):
+        # values is a width x k array of k samples, oldest first
+        values = np.asarray(values, dtype=float).reshape(self.width, -1)
+        k = values.shape[1]
+        self.count += k
+        if self.max_len is None:
+            if self.n + k > self._buf.shape[1]:
+                buf = np.empty((self.width, max(2*self._buf.shape[1], self.n + k)))
+                buf[:,:self.n] = self._buf[:,:self.n]
+                self._buf = buf
+            self._buf[:,self.n:self.n+k] = values
+            self.n += k
+        else:
+            L = self.max_len
+            if k > L:
+                values = values[:,k-L:]
+                k = L
+            i = (self._start + self.n + np.arange(k)) % L
+            self._buf[:,i] = values
+            self._buf[:,i+L] = values
+            total = self.n + k
+            if total > L:
+                self._start = (self._start + total - L) % L
+            self.n = min(total, L)
+
+    def data(self):
+        # Kept samples, oldest first, as a width x n view. The view is
+        # only valid until the next append.
+        return self._buf[:,self._start:self._start+self.n]
+
+    def extent(self):
+        # Smallest and largest value appended so far, as (lo, hi), updated
+        # from the samples appended since the last call. With max_len,
+        # samples that left the ring before a call are not counted.
+        new = min(self.count - self._seen, self.n)
+        if new:
+            recent = self.data()[:,self.n-new:]
+            self._lo = min(self._lo, float(recent.min()))
+            self._hi = max(self._hi, float(recent.max()))
+        self._seen = self.count
+        return self._lo, self._hi
+
+    def __len__(self):
+        return self.n
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import mmap
+import atexit
+import tempfile
+import subprocess
+import numpy as np
+
+# Bump when the layout of the ring file changes
+RING_VERSION = 1
+
+# int64 fields of the ring file before the number of lines of each plot:
+# version, width, capacity, number of plots, samples written, closed
+_HEADER = 8
+
+
+class TelemetryRing:
+    ''' Ring buffer of telemetry samples [t, values] in a file mapped in
+        memory, written by one process and read by another. The writer
+        never waits: it overwrites the oldest sample, and a reader that is
+        more than capacity samples behind skips ahead, counting the
+        samples it lost in dropped. The number of samples written is
+        updated after each sample, so a reader only sees whole samples,
+        and samples the writer may have overwritten while they were being
+        read are dropped too. The values are the lines of the plots of a
+        plotGenerator, sizes[i] of them in plot i.'''
+
+    def __init__(self, path, sizes=None, capacity=65536):
+        # Creates the ring file at path, or opens it if sizes is None
+        if sizes is not None:
+            width = sum(sizes)
+            with open(path, 'wb') as f:
+                f.truncate(8*(_HEADER + len(sizes) + capacity*(width + 1)))
+        fd = os.open(path, os.O_RDWR)
+        self._mm = mmap.mmap(fd, 0)
+        os.close(fd)
+        head = np.frombuffer(self._mm, dtype=np.int64, count=_HEADER)
+        if sizes is not None:
+            head[:4] = [RING_VERSION, width, capacity, len(sizes)]
+        elif head[0] != RING_VERSION:
+            raise ValueError('%s is not a version %d telemetry ring' % (path, RING_VERSION))
+        n_plots = int(head[3])
+        self._head = np.frombuffer(self._mm, dtype=np.int64, count=_HEADER + n_plots)
+        if sizes is not None:
+            self._head[_HEADER:] = sizes
+        self.sizes = self._head[_HEADER:].tolist()
+        self.width = int(head[1])
+        self.capacity = int(head[2])
+        self._data = np.frombuffer(self._mm, dtype=float,
+                                   count=self.capacity*(self.width + 1),
+                                   offset=8*(_HEADER + n_plots)).reshape(self.capacity, -1)
+        self._count = 0                    # Samples written, or read
+        self.dropped = 0                   # Samples the reader lost
+
+    def write(self, t, values):
+        # Adds the sample at time t with the width values
+        row = self._data[self._count % self.capacity]
+        row[0] = t
+        row[1:] = values
+        self._count += 1
+        self._head[4] = self._count
+
+    def read(self):
+        # The samples written since the last read, as their times and a
+        # width x k array of their values
+        count = int(self._head[4])
+        start = max(self._count, count - self.capacity)
+        rows = self._data[np.arange(start, count) % self.capacity]
+        # Samples up to first may have been overwritten during the copy
+        first = min(int(self._head[4]) - self.capacity + 1, count)
+        if first > start:
+            rows = rows[first-start:]
+            start = first
+        self.dropped += start - self._count
+        self._count = count
+        return rows[:,0], rows[:,1:].T
+
+    def close(self):
+        # Tells the reader that no more samples will come
+        self._head[5] = 1
+
+    @property
+    def closed(self):
+        return bool(self._head[5])
+
+
+class PlotProcess:
+    ''' Stands in for the plotGenerator of a lab's sim_plot.py in main.py,
+        running it in a viewer process instead, so that drawing never holds
+        up the simulation. updateDataHistory only writes the sample to a
+        TelemetryRing; the viewer reads what is new rate times a second
+        into its plotGenerator, made by module.factory(**kwargs) in the
+        current directory, and renders it. A viewer that falls behind
+        renders less often, and past capacity samples it drops the oldest.
+        The viewer starts with the first sample and keeps its window open
+        after close.'''
+
+    def __init__(self, module='sim_plot', factory='plotGenerator',
+                 capacity=65536, rate=20.0, **kwargs):
+        self.module = module
+        self.factory = factory
+        self.capacity = capacity
+        self.rate = rate
+        self.kwargs = kwargs
+        self.ring = None
+        self.process = None
+
+    def updateDataHistory(self, new_t, new_data):
+        # Same arguments as plotGenerator.updateDataHistory
+        values = [np.ravel(d) for d in new_data]
+        if self.ring is None:
+            self._start([len(v) for v in values])
+        self.ring.write(new_t, np.concatenate(values))
+
+    def update_plots(self, force=False):
+        # The viewer renders on its own
+        return True
+
+    def _start(self, sizes):
+        fd, path = tempfile.mkstemp(prefix='whirlybird_plot_', suffix='.ring',
+                                    dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        os.close(fd)
+        self.ring = TelemetryRing(path, sizes, self.capacity)
+        viewer = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        self.process = subprocess.Popen([sys.executable, viewer, path, self.module,
+                                         self.factory, json.dumps(self.kwargs),
+                                         str(self.rate)])
+        atexit.register(self.close)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+
+
+def runViewer(path, module, factory, kwargs, rate):
+    # Viewer process of PlotProcess
+    ring = TelemetryRing(path)
+    os.unlink(path)
+    sys.path.insert(0, os.getcwd())
+    import matplotlib.pyplot as plt
+    plotGen = getattr(__import__(module), factory)(**kwargs)
+    bounds = np.cumsum([0] + ring.sizes)
+    parent = os.getppid()
+    while True:
+        # Read after checking, so that the last samples are plotted
+        closed = ring.closed or os.getppid() != parent
+        t, values = ring.read()
+        if len(t) and len(plotGen.time_history) == 0:
+            # The first sample makes the plot histories
+            plotGen.updateDataHistory(t[0], [values[a:b,0] for a, b in zip(bounds[:-1], bounds[1:])])
+            t = t[1:]
+            values = values[:,1:]
+        if len(t):
+            plotGen.time_history.extend(t)
+            for handle, a, b in zip(plotGen.handle, bounds[:-1], bounds[1:]):
+                handle.data_history.extend(values[a:b]*handle.gain)
+            plotGen.update_plots()
+        if closed:
+            break
+        plt.pause(1.0/rate)
+    plotGen.update_plots(force=True)
+    plt.show()
+
+
+if __name__ == '__main__':
+    runViewer(sys.argv[1], sys.argv[2], sys.argv[3], json.loads(sys.argv[4]),
+              float(sys.argv[5]))
@@ -0,0 +1,100 @@
+import time
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def paddedLimits(lo, hi, margin):
+    # Axis limits around the data range [lo, hi], with margin times the
+    # range added on each side
+    pad = margin*(hi - lo) if hi > lo else 1.0
+    return lo - pad, hi + pad
+
+
+class BlitRenderer:
+    ''' Draws the lines of the plots of a figure by blitting them over a
+        cached image of everything else in it. The figure is only redrawn
+        in full when the data leaves the axes limits, which then grow with
+        a margin, so that on a long run this happens rarely. The y limits
+        of each plot come from the running min/max of its data history and
+        the x limits, shared by all plots, from the time history.
+
+        A governor keeps the rendering within plot_share of the wall time:
+        after a frame that took d seconds, calls in the next d/plot_share
+        seconds are skipped, unless forced.
+
+        The plots are the myPlot objects of sim_plot.py; the renderer uses
+        their ax, line and data_history and update_plot(time, blit=True,
+        decimate), which creates animated lines and sets their data.'''
+
+    def __init__(self, fig, plot_share=0.2, margin=0.1):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.plot_share = plot_share  # Largest share of wall time spent rendering
+        self.margin = margin          # Limit margin, as a share of the data range
+        self.plots = []
+        self.frames = 0               # Frames rendered
+        self.full_draws = 0           # Frames that redrew the whole figure
+        self.skipped = 0              # Calls skipped by the governor
+        self.busy = 0.0               # Time spent rendering, s
+        self._background = None
+        self._next = 0.0
+        self._blit = getattr(self.canvas, 'supports_blit', True)
+        self.canvas.mpl_connect('draw_event', self._onDraw)
+
+    def _onDraw(self, event):
+        # The figure was drawn, by us or by the GUI after a resize: cache
+        # it without the lines and draw the lines on top
+        if self._blit:
+            self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._drawLines()
+
+    def _drawLines(self):
+        for plot in self.plots:
+            for line in plot.line:
+                plot.ax.draw_artist(line)
+
+    def render(self, time_history, plots, force=False, decimate=None):
+        # Updates the plots with the data up to now, decimated by the
+        # decimate method if it is not None. Returns False if the governor
+        # skipped the frame.
+        start = timer()
+        if not force and start < self._next:
+            self.skipped += 1
+            return False
+        self.plots = plots
+        for plot in plots:
+            plot.update_plot(time_history, blit=True, decimate=decimate)
+
+        # Grow the limits the data has left
+        full = self._background is None or not self._blit
+        if len(time_history):
+            ax = plots[0].ax
+            t0 = time_history[0]
+            t1 = time_history[-1]
+            if full or t1 > ax.get_xlim()[1]:
+                ax.set_xlim(t0, t1 + (t1 - t0 if t1 > t0 else 1.0))
+                full = True
+        for plot in plots:
+            lo, hi = plot.data_history.extent()
+            if lo > hi:
+                continue
+            y_lo, y_hi = plot.ax.get_ylim()
+            if full or lo < y_lo or hi > y_hi:
+                plot.ax.set_ylim(*paddedLimits(lo, hi, self.margin))
+                full = True
+
+        if full:
+            # Redraws the figure, and _onDraw caches it and draws the lines
+            self.canvas.draw()
+            self.full_draws += 1
+        else:
+            self.canvas.restore_region(self._background)
+            self._drawLines()
+        self.canvas.blit(self.fig.bbox)
+        self.canvas.flush_events()
+
+        elapsed = timer() - start
+        self.busy += elapsed
+        self.frames += 1
+        self._next = start + elapsed/self.plot_share
+        return True
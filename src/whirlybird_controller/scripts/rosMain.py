@@ -1,21 +1,42 @@
 #!/usr/bin/env python
-import rospy
-import numpy as np
-import matplotlib.pyplot as plt
-import lab11.param as P
-from whirlybird_msgs.msg import Command
-from whirlybird_msgs.msg import Whirlybird
-# from signal_generator import Signals
-from slider_input import Sliders
-from lab10.sim_plot import plotGenerator
-
-# from lab7.controllerPD import controllerPD as ctrl
-# from lab8.controllerPD import controllerPD as ctrl
-# from lab10.controllerPD import controllerPD as ctrl
-from lab11.controllerSS import controllerSS as ctrl
-# from lab12.controllerSSI import controllerSSI as ctrl
-# from lab13.controllerObs import controllerObs as ctrl
-# from lab14.controllerObsD import controllerObsD as ctrl
+import time
+from contextlib import contextmanager
+
+# Startup time of each import, logged once the node is up. matplotlib,
+# scipy and python-control are only imported by the code that needs
+# them, so the node subscribes and publishes before the slider window
+# or signal generators are loaded.
+_launch = time.time()
+_import_times = []
+
+@contextmanager
+def importTimer(name):
+    start = time.time()
+    yield
+    _import_times.append((name, time.time() - start))
+
+with importTimer('rospy'):
+    import rospy
+with importTimer('whirlybird_msgs'):
+    from whirlybird_msgs.msg import Command
+    from whirlybird_msgs.msg import Whirlybird
+with importTimer('controller'):
+    import lab11.param as P
+    # from lab7.controllerPD import controllerPD as ctrl
+    # from lab8.controllerPD import controllerPD as ctrl
+    # from lab10.controllerPD import controllerPD as ctrl
+    from lab11.controllerSS import controllerSS as ctrl
+    # from lab12.controllerSSI import controllerSSI as ctrl
+    # from lab13.controllerObs import controllerObs as ctrl
+    # from lab14.controllerObsD import controllerObsD as ctrl
+
+    # Unrolled scalar version of the SS controller for the gains in P,
+    # generated once and cached on disk
+    # from codegen import ssController; ctrl = ssController(P)
+
+    # Linear MPC of lab11 with the PWM limits as QP constraints, solved
+    # every P.mpc_divisor callbacks
+    # from lab11.controllerMPC import controllerMPC as ctrl
 
 # If SLIDERS is false, then the input will be generated from
 # from the signal generators.
@@ -62,8 +83,12 @@ def callback(data):
     global sim_time
     sim_time = round(sim_time+dt,6)
 
-    # Get referenced inputs from signal generators or sliders
-    ref_input = usr_input.getInputValues() if SLIDERS else usr_input.getRefInputs(sim_time)
+    # Get referenced inputs from signal generators or sliders. Until
+    # they are loaded the reference holds the initial pitch and yaw.
+    if usr_input is None:
+        ref_input = [P.theta0,P.psi0]
+    else:
+        ref_input = usr_input.getInputValues() if SLIDERS else usr_input.getRefInputs(sim_time)
     reference.pitch = ref_input[0]
     reference.yaw = ref_input[1]
     ref_input_pub.publish(reference)
@@ -78,18 +103,23 @@ def callback(data):
 
 
 
+# Logs the imports timed since the last call and the time since launch
+def logStartup(stage):
+    for name, seconds in _import_times:
+        rospy.loginfo('import %-16s %8.1f ms', name, 1000*seconds)
+    del _import_times[:]
+    rospy.loginfo('%s %.1f ms after launch', stage, 1000*(time.time() - _launch))
+
+
 if __name__ == '__main__':
 
-    usr_input = Sliders() if SLIDERS else Signals()
+    usr_input = None                      # Loaded once the node is up
 
     ctrl = ctrl()                         # Instantiate controllerPD class
 
     # Create the node
     rospy.init_node('whirlybird_controller', anonymous=False)
 
-    # Subscriber to topic 'whirlybird'
-    rospy.Subscriber('whirlybird', Whirlybird, callback)
-
     # Publisher to topic 'command'
     command_pub = rospy.Publisher('command',Command,queue_size=5)
     ref_input_pub = rospy.Publisher('input',Whirlybird,queue_size=5)
@@ -98,14 +128,29 @@ if __name__ == '__main__':
     command=Command()
     reference=Whirlybird()
 
-
-
     # Used to calculate the time between the callback function calls.
     global prev_time
     prev_time= rospy.Time.now()            # Gets the current time, time
     global sim_time
     sim_time = 0
 
+    # Subscriber to topic 'whirlybird'
+    rospy.Subscriber('whirlybird', Whirlybird, callback)
+    logStartup('subscribed')
+
+    # The sliders need matplotlib and the signal generators scipy
+    if SLIDERS:
+        with importTimer('matplotlib'):
+            import matplotlib.pyplot as plt
+        with importTimer('slider_input'):
+            from slider_input import Sliders
+        usr_input = Sliders()
+    else:
+        with importTimer('signal_generator'):
+            from signal_generator import Signals
+        usr_input = Signals()
+    logStartup('input ready')
+
     try:
 
         # Keep node alive until ROS is shutdown.
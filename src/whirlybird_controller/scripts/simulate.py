@@ -0,0 +1,173 @@
+# Headless closed loop simulation of any lab:
+#
+#   python simulate.py lab13 --duration 80 --record lab13.npz
+#
+# The lab directory supplies param.py, the controller and the signal
+# generator. The loop runs on an integer tick clock at full speed, with
+# no plotting, and reports the wall time per simulated second. The lab
+# main.py files run the same loop through simulate, with a
+# FrameRecorder for their plots.
+import argparse
+import glob
+import importlib
+import inspect
+import os
+import sys
+import time
+import numpy as np
+
+# Controller of a lab with more than one, unless --controller is given
+DEFAULT_CONTROLLER = 'controllerSS'
+
+
+class ArrayRecorder:
+    ''' Records every record_every-th tick into preallocated arrays:
+        t (n,), ref (n,2), states (n,6) and u (n,2).'''
+
+    def __init__(self, n_ticks, record_every=1):
+        self.record_every = record_every
+        n = n_ticks//record_every
+        self.t = np.empty(n)
+        self.ref = np.empty((n,2))
+        self.states = np.empty((n,6))
+        self.u = np.empty((n,2))
+        self.count = 0
+
+    def record(self, tick, t, ref_input, states, u):
+        if (tick + 1) % self.record_every == 0 and self.count < len(self.t):
+            i = self.count
+            self.t[i] = t
+            self.ref[i] = ref_input[0:2]
+            self.states[i] = states
+            self.u[i] = u[0:2]
+            self.count += 1
+
+    def save(self, path):
+        n = self.count
+        np.savez(path, t=self.t[:n], ref=self.ref[:n],
+                 states=self.states[:n], u=self.u[:n])
+
+
+class FrameRecorder:
+    ''' Calls frame(t, ref_input, states, u) every frame_period seconds
+        of simulated time, with the time at the end of the tick, e.g. to
+        update the plots and animation of a lab main.py.'''
+
+    def __init__(self, Ts, frame_period, frame):
+        self.Ts = Ts
+        self.every = max(1, int(round(frame_period/Ts)))
+        self.frame = frame
+
+    def record(self, tick, t, ref_input, states, u):
+        if (tick + 1) % self.every == 0:
+            self.frame((tick + 1)*self.Ts, ref_input, states, u)
+
+
+def simulate(controller, P, signals, duration, recorders=(), dynamics=None,
+             ref_period=0.1, convert=None):
+    # Runs the closed loop of the lab main.py files for duration seconds.
+    #   controller - controller class, e.g. controllerSS, or an instance
+    #   P          - the param module of the lab
+    #   signals    - signal generator class, e.g. Signals
+    #   recorders  - objects with record(tick, t, ref_input, states, u),
+    #                called after every tick
+    #   dynamics   - plant to simulate, WhirlybirdDynamics() by default
+    #   ref_period - the reference is sampled every ref_period seconds,
+    #                like t_elapse in main.py
+    #   convert    - optional function from the controller output to the
+    #                PWM commands, for the lab7 and lab8 controllers that
+    #                return force and torque
+    # Time is kept as an integer tick count, t = tick*P.Ts, so it does not
+    # drift or depend on rounding. Returns the wall time in seconds.
+    if dynamics is None:
+        # Imported here so the lab param.py is on the path first
+        from dynamics import WhirlybirdDynamics
+        dynamics = WhirlybirdDynamics()
+    ctrl = controller() if inspect.isclass(controller) else controller
+    sig_gen = signals()
+    n_ticks = int(round(duration/P.Ts))
+    ref_ticks = max(1, int(round(ref_period/P.Ts)))
+    km = P.km
+
+    start = time.time()
+    for tick in range(n_ticks):
+        t = tick*P.Ts
+        if tick % ref_ticks == 0:
+            ref_input = sig_gen.getRefInputs(t)
+        states = dynamics.Outputs()
+        u = ctrl.getForces(ref_input,states)
+        if convert is not None:
+            u = convert(u)
+        dynamics.propagateDynamics([x*km for x in u])
+        for recorder in recorders:
+            recorder.record(tick, t, ref_input, states, u)
+    return time.time() - start
+
+
+def _controllerModules(lab_dir):
+    return sorted(os.path.splitext(os.path.basename(f))[0]
+                  for f in glob.glob(os.path.join(lab_dir, 'controller*.py')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless whirlybird simulation')
+    parser.add_argument('lab', help='lab directory, e.g. lab13')
+    parser.add_argument('--controller', help='controller module in the lab, '
+                        'whose class has the same name (default: the only one, '
+                        'or controllerSS)')
+    parser.add_argument('--signals', default='signal_generator:Signals',
+                        help='signal generator as module:class')
+    parser.add_argument('--duration', type=float, default=40.0,
+                        help='simulated time, s')
+    parser.add_argument('--ref-period', type=float, default=0.1,
+                        help='time between reference updates, s')
+    parser.add_argument('--linear', action='store_true',
+                        help='simulate the linear surrogate model')
+    parser.add_argument('--record', metavar='FILE.npz',
+                        help='save t, ref, states and u')
+    parser.add_argument('--record-every', type=int, default=1,
+                        help='record every n-th tick')
+    args = parser.parse_args(argv)
+
+    # The lab supplies param.py, so it goes first on the path, and the
+    # shared modules are next to this file.
+    lab_dir = os.path.abspath(args.lab)
+    sys.path.insert(0, lab_dir)
+    sys.path.insert(1, os.path.dirname(os.path.abspath(__file__)))
+
+    if args.controller is None:
+        choices = _controllerModules(lab_dir)
+        if len(choices) == 1:
+            args.controller = choices[0]
+        elif DEFAULT_CONTROLLER in choices:
+            args.controller = DEFAULT_CONTROLLER
+        else:
+            parser.error('choose a controller with --controller: %s'
+                         % ', '.join(choices))
+    P = importlib.import_module('param')
+    controller = getattr(importlib.import_module(args.controller), args.controller)
+    module, name = args.signals.split(':')
+    signals = getattr(importlib.import_module(module), name)
+
+    if args.linear:
+        from linear_dynamics import LinearWhirlybirdDynamics
+        dynamics = LinearWhirlybirdDynamics(P)
+    else:
+        from dynamics import WhirlybirdDynamics
+        dynamics = WhirlybirdDynamics()
+
+    recorders = []
+    if args.record:
+        recorders.append(ArrayRecorder(int(round(args.duration/P.Ts)),
+                                       args.record_every))
+    wall = simulate(controller, P, signals, args.duration, recorders,
+                    dynamics, args.ref_period)
+    print('%s/%s: %g s simulated in %.3f s wall, %.2f ms per simulated second'
+          % (args.lab, args.controller, args.duration, wall,
+             1000*wall/args.duration))
+    if args.record:
+        recorders[0].save(args.record)
+
+
+if __name__ == '__main__':
+    main()
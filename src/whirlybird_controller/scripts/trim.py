@@ -0,0 +1,134 @@
+import numpy as np
+from caching import LRUCache, quantize
+from dynamics import PHYSICAL_PARAMETERS, physicalParameters, closedFormConstants, accelerations
+from linearize import complexStepJacobians
+
+# Operating points closer than RESOLUTION (rad, rad/s) share a cache entry
+RESOLUTION = 1e-9
+
+_trims = LRUCache(maxsize=4096)
+_tables = LRUCache(maxsize=16)
+
+
+def trim(theta, psidot=0.0, phi=0.0, params=None):
+    # Equilibrium of the full equations of motion at pitch theta and yaw
+    # rate psidot, with phidot = thetadot = 0.
+    #   phi given - solves the left and right forces that make phiddot
+    #               and thetaddot zero
+    #   phi None  - also solves the roll that makes psiddot zero
+    # params optionally overrides physical parameters of param.py.
+    # Returns (fl, fr, phi). Raises ValueError if there is no equilibrium.
+    p = physicalParameters(params)
+    key = (tuple(p[name] for name in PHYSICAL_PARAMETERS),
+           quantize([theta, psidot, 0.0 if phi is None else phi], RESOLUTION),
+           phi is None)
+    result = _trims.get(key)
+    if result is None:
+        result = _trims.put(key, _solveTrim(closedFormConstants(p),
+                                            theta, psidot, phi))
+    return result
+
+
+def trimForceTorque(theta, psidot=0.0, phi=0.0, params=None):
+    # Same as trim, but returns the total force and torque (F, tau)
+    fl, fr, phi = trim(theta, psidot, phi, params)
+    d = physicalParameters(params)['d']
+    return fl + fr, d*(fl - fr)
+
+
+def _solveTrim(k, theta, psidot, phi):
+    # Newton iteration on the accelerations. The accelerations are linear
+    # in the forces, so with phi given it converges in one step.
+    solve_phi = phi is None
+    fl = fr = k['grav']*np.cos(theta)/(2*k['l1'])
+    phi = 0.0 if solve_phi else phi
+    rows = [3,4,5] if solve_phi else [3,4]
+    for i in range(50):
+        xu = [phi, theta, 0.0, 0.0, 0.0, psidot, fl, fr]
+        residual = np.array(accelerations(k, np.cos(phi), np.sin(phi),
+                                          np.cos(theta), np.sin(theta),
+                                          0.0, 0.0, psidot, fl, fr))[:len(rows)]
+        if np.abs(residual).max() < 1e-12:
+            return fl, fr, phi
+        A, B = complexStepJacobians(k, xu)
+        J = np.asarray(B)[rows,:]
+        if solve_phi:
+            J = np.column_stack((J, np.asarray(A)[rows,0]))
+        try:
+            step = np.linalg.solve(J, -residual)
+        except np.linalg.LinAlgError:
+            break
+        fl += step[0]
+        fr += step[1]
+        if solve_phi:
+            phi += step[2]
+    raise ValueError('no equilibrium at theta=%g, psidot=%g' % (theta, psidot))
+
+
+class TrimTable:
+    ''' Trim forces on a uniform pitch grid. A lookup is one index
+        computation and a linear interpolation between two grid points,
+        so controllers can get their feedforward at every call.'''
+
+    def __init__(self, theta_min, theta_max, num, psidot=0.0, phi=0.0, params=None):
+        self.theta = np.linspace(theta_min, theta_max, num)
+        trims = np.array([trim(th, psidot, phi, params) for th in self.theta])
+        d = physicalParameters(params)['d']
+        self.fl = trims[:,0]
+        self.fr = trims[:,1]
+        self.phi = trims[:,2]
+        self.F = self.fl + self.fr
+        self.tau = d*(self.fl - self.fr)
+
+        # Scalar lookups are done on floats and lists
+        self._theta_min = float(theta_min)
+        self._inv_step = (num - 1)/float(theta_max - theta_min)
+        self._last = num - 1
+        self._F = self.F.tolist()
+        self._tau = self.tau.tolist()
+
+    def force(self, theta):
+        # Trim force F at pitch theta. theta can be a float or an array.
+        # Pitches outside the grid use the nearest end of the table.
+        if isinstance(theta, float):
+            return self._interp(self._F, theta)
+        if np.ndim(theta) == 0:
+            return self._interp(self._F, float(theta))
+        return np.interp(theta, self.theta, self.F)
+
+    def forceTorque(self, theta):
+        # Trim force and torque (F, tau) at pitch theta
+        if isinstance(theta, float) or np.ndim(theta) == 0:
+            theta = float(theta)
+            return self._interp(self._F, theta), self._interp(self._tau, theta)
+        return np.interp(theta, self.theta, self.F), np.interp(theta, self.theta, self.tau)
+
+    def _interp(self, values, theta):
+        s = (theta - self._theta_min)*self._inv_step
+        if s <= 0.0:
+            return values[0]
+        if s >= self._last:
+            return values[self._last]
+        i = int(s)
+        w = s - i
+        return values[i] + w*(values[i+1] - values[i])
+
+
+def labParameters(P):
+    # The physical parameters and theta_max of a lab's param module, as
+    # the params of trimTable
+    names = PHYSICAL_PARAMETERS + (('theta_max',) if hasattr(P,'theta_max') else ())
+    return dict((name, getattr(P,name)) for name in names)
+
+
+def trimTable(num=141, psidot=0.0, phi=0.0, params=None):
+    # Memoized TrimTable over the pitch envelope +-theta_max, in degrees,
+    # of params, which also holds the physical parameters as in trim.
+    # The envelope is +-70 degrees if params has no theta_max.
+    theta_lim = (params or {}).get('theta_max',70.0)*np.pi/180
+    p = physicalParameters(params)
+    key = (tuple(p[name] for name in PHYSICAL_PARAMETERS), theta_lim, num, psidot, phi)
+    table = _tables.get(key)
+    if table is None:
+        table = _tables.put(key, TrimTable(-theta_lim, theta_lim, num, psidot, phi, params))
+    return table
@@ -0,0 +1,176 @@
+import math
+import multiprocessing
+import numpy as np
+import param as P
+from dynamics import WhirlybirdDynamics, WhirlybirdDynamicsBatch
+
+# Physical parameters that are perturbed in a Monte Carlo run. g is known.
+UNCERTAIN_PARAMETERS = ('l1','l2','m1','m2','d','Jx','Jy','Jz')
+
+# Statistics recorded for every closed loop run
+METRICS = ('theta_rms','psi_rms','theta_max','psi_max','saturation')
+
+
+def sampleParameters(run, alpha=0.2, seed=0):
+    # Draws the physical parameters of one run. Every parameter of
+    # UNCERTAIN_PARAMETERS is scaled by a uniform factor in
+    # [1-alpha, 1+alpha], like the UNCERTAINTY_PARAMETERS block of
+    # lab13/param.py. Each run has its own RNG stream seeded with
+    # (seed, run), so a draw does not depend on the order the runs are
+    # made in or the process that makes it.
+    rng = np.random.RandomState([seed, run])
+    scale = 1 + alpha*(2*rng.rand(len(UNCERTAIN_PARAMETERS)) - 1)
+    return dict((name, float(getattr(P,name))*s)
+                for name, s in zip(UNCERTAIN_PARAMETERS, scale))
+
+
+def closedLoopRun(controller, signals, params, t_end, pwm_max=0.6):
+    # Runs controller against a WhirlybirdDynamics with params, like the
+    # lab main.py files without plotting. controller and signals are
+    # classes, e.g. controllerSS and Signals. A PWM command at 0 or
+    # pwm_max counts as saturated. Returns a dict of METRICS.
+    ctrl = controller()
+    sig_gen = signals()
+    dynam = WhirlybirdDynamics(params=params)
+    n_steps = int(round(t_end/P.Ts))
+    theta_sq = psi_sq = 0.0
+    theta_max = psi_max = 0.0
+    saturated = 0
+    for i in range(n_steps):
+        ref_input = sig_gen.getRefInputs(i*P.Ts)
+        states = dynam.Outputs()
+        u = ctrl.getForces(ref_input,states)
+        dynam.propagateDynamics([x*P.km for x in u])
+
+        e_theta = abs(ref_input[0] - states[1])
+        e_psi = abs(ref_input[1] - states[2])
+        theta_sq += e_theta*e_theta
+        psi_sq += e_psi*e_psi
+        theta_max = max(theta_max, e_theta)
+        psi_max = max(psi_max, e_psi)
+        if u[0] <= 0 or u[0] >= pwm_max or u[1] <= 0 or u[1] >= pwm_max:
+            saturated += 1
+    return {'theta_rms': math.sqrt(theta_sq/n_steps),
+            'psi_rms': math.sqrt(psi_sq/n_steps),
+            'theta_max': theta_max,
+            'psi_max': psi_max,
+            'saturation': float(saturated)/n_steps}
+
+
+class RunStatistics:
+    ''' Running mean, standard deviation, minimum and maximum of METRICS,
+        updated one run at a time (Welford's method), so results can be
+        aggregated as they come in. The worst run of each metric is kept
+        with its parameters.'''
+
+    def __init__(self):
+        self.count = 0
+        self.mean = dict((m, 0.0) for m in METRICS)
+        self._m2 = dict((m, 0.0) for m in METRICS)
+        self.min = dict((m, np.inf) for m in METRICS)
+        self.max = dict((m, -np.inf) for m in METRICS)
+        self.worst = dict((m, None) for m in METRICS)
+
+    def add(self, run, params, metrics):
+        self.count += 1
+        for m in METRICS:
+            value = metrics[m]
+            delta = value - self.mean[m]
+            self.mean[m] += delta/self.count
+            self._m2[m] += delta*(value - self.mean[m])
+            self.min[m] = min(self.min[m], value)
+            if value > self.max[m]:
+                self.max[m] = value
+                self.worst[m] = (run, params)
+
+    def std(self, m):
+        return math.sqrt(self._m2[m]/(self.count - 1)) if self.count > 1 else 0.0
+
+    def summary(self):
+        # One line per metric: mean, standard deviation, min and max
+        lines = ['%d runs' % self.count]
+        for m in METRICS:
+            lines.append('  %-10s mean %.4g  std %.4g  min %.4g  max %.4g'
+                         % (m, self.mean[m], self.std(m), self.min[m], self.max[m]))
+        return '\n'.join(lines)
+
+
+def _runOne(args):
+    # Pool worker. Module level so it can be pickled.
+    run, controller, signals, t_end, alpha, seed, pwm_max = args
+    params = sampleParameters(run, alpha, seed)
+    return run, params, closedLoopRun(controller, signals, params, t_end, pwm_max)
+
+
+def monteCarlo(controller, signals, num_runs, t_end, alpha=0.2, seed=0,
+               processes=None, pwm_max=0.6, callback=None):
+    # Runs num_runs closed loop simulations with parameters drawn by
+    # sampleParameters on a pool of processes (one per CPU by default,
+    # processes=1 runs in this process). Results are added to a
+    # RunStatistics in the order they finish, and callback(run, params,
+    # metrics) is called for each if given. Returns the RunStatistics.
+    stats = RunStatistics()
+    jobs = [(run, controller, signals, t_end, alpha, seed, pwm_max)
+            for run in range(num_runs)]
+    if processes == 1:
+        results = map(_runOne, jobs)
+        pool = None
+    else:
+        processes = processes or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes)
+        chunksize = max(1, num_runs//(4*processes))
+        results = pool.imap_unordered(_runOne, jobs, chunksize)
+    try:
+        for run, params, metrics in results:
+            stats.add(run, params, metrics)
+            if callback is not None:
+                callback(run, params, metrics)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return stats
+
+
+def monteCarloBatch(bank, signals, num_runs, t_end, alpha=0.2, seed=0,
+                    callback=None):
+    # Same runs as monteCarlo, but all of them in one process as array
+    # operations: the plants are one WhirlybirdDynamicsBatch with a
+    # parameter draw per row, and bank is a controller bank class from
+    # controller_bank, e.g. SSControllerBank. Returns the RunStatistics.
+    draws = [sampleParameters(run, alpha, seed) for run in range(num_runs)]
+    params = dict((name, np.array([p[name] for p in draws]))
+                  for name in UNCERTAIN_PARAMETERS)
+    dynam = WhirlybirdDynamicsBatch(num_runs, params=params)
+    ctrl = bank(num_runs)
+    sig_gen = signals()
+    n_steps = int(round(t_end/P.Ts))
+    theta_sq = np.zeros(num_runs)
+    psi_sq = np.zeros(num_runs)
+    theta_max = np.zeros(num_runs)
+    psi_max = np.zeros(num_runs)
+    saturated = np.zeros(num_runs)
+    for i in range(n_steps):
+        ref_input = sig_gen.getRefInputs(i*P.Ts)
+        states = dynam.States()
+        e_theta = np.abs(ref_input[0] - states[:,1])
+        e_psi = np.abs(ref_input[1] - states[:,2])
+        u = ctrl.getForces(ref_input,states)
+        theta_sq += e_theta*e_theta
+        psi_sq += e_psi*e_psi
+        np.maximum(theta_max, e_theta, out=theta_max)
+        np.maximum(psi_max, e_psi, out=psi_max)
+        saturated += ((u <= 0) | (u >= ctrl.pwm_max)).any(axis=1)
+        dynam.propagateDynamics(u*P.km)
+
+    stats = RunStatistics()
+    for run in range(num_runs):
+        metrics = {'theta_rms': math.sqrt(theta_sq[run]/n_steps),
+                   'psi_rms': math.sqrt(psi_sq[run]/n_steps),
+                   'theta_max': theta_max[run],
+                   'psi_max': psi_max[run],
+                   'saturation': saturated[run]/n_steps}
+        stats.add(run, draws[run], metrics)
+        if callback is not None:
+            callback(run, draws[run], metrics)
+    return stats